@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.endpoints import search, bodeguero, auth
+from app.api.endpoints import search, bodeguero, auth, admin, catalog
 
 api_router = APIRouter()
 
@@ -7,4 +7,6 @@ api_router = APIRouter()
 api_router.include_router(search.router, prefix="/search", tags=["Búsqueda (Vecinos)"])
 api_router.include_router(bodeguero.router, prefix="/bodega", tags=["Gestión (Bodegueros)"])
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
-api_router.include_router(bodeguero.router, prefix="/bodeguero", tags=["bodeguero"])
\ No newline at end of file
+api_router.include_router(bodeguero.router, prefix="/bodeguero", tags=["bodeguero"])
+api_router.include_router(catalog.router, prefix="/catalog", tags=["Catálogo (sincronización)"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
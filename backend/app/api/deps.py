@@ -0,0 +1,72 @@
+import threading
+import uuid
+from cachetools import TTLCache
+from fastapi import Depends, Header, HTTPException
+from sqlalchemy.orm import Session
+from app.db.session import get_db
+from app.core.security import decode_access_token
+from app.models.tables import User, Bodega
+
+# Identidad del bodeguero para los endpoints de /bodeguero.
+# - Con "Authorization: Bearer <token>" los claims ya traen role y bodega_id: cero consultas.
+# - Las apps viejas mandan ?user_id=...: se resuelve una vez y queda en un cache chico
+#   con TTL, que se invalida cuando cambia la bodega del usuario.
+
+_owner_cache = TTLCache(maxsize=10000, ttl=300)
+_owner_cache_lock = threading.Lock()
+
+
+class BodegaIdentity:
+    __slots__ = ("user_id", "bodega_id")
+
+    def __init__(self, user_id, bodega_id):
+        self.user_id = user_id
+        self.bodega_id = bodega_id
+
+
+def invalidate_owner(user_id):
+    """Llamar cuando se crea/cambia la bodega de un usuario."""
+    with _owner_cache_lock:
+        _owner_cache.pop(str(user_id), None)
+
+
+def _lookup_owner(db: Session, user_id: str):
+    with _owner_cache_lock:
+        cached = _owner_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    row = db.query(User.role, Bodega.id)\
+        .outerjoin(Bodega, Bodega.owner_id == User.id)\
+        .filter(User.id == user_id)\
+        .first()
+    found = (row[0], row[1]) if row else (None, None)
+    with _owner_cache_lock:
+        _owner_cache[user_id] = found
+    return found
+
+
+def get_current_bodega(
+    authorization: str | None = Header(default=None),
+    user_id: str | None = None,
+    db: Session = Depends(get_db),
+) -> BodegaIdentity:
+    if authorization and authorization.lower().startswith("bearer "):
+        claims = decode_access_token(authorization[7:].strip())
+        if claims is None:
+            raise HTTPException(status_code=401, detail="Token inválido o vencido")
+        role, bodega_id, owner = claims.get("role"), claims.get("bodega_id"), claims.get("sub")
+        bodega_id = uuid.UUID(bodega_id) if bodega_id else None
+    elif user_id:
+        role, bodega_id = _lookup_owner(db, user_id)
+        owner = user_id
+        if role is None:
+            raise HTTPException(status_code=403, detail="No eres bodeguero")
+    else:
+        raise HTTPException(status_code=401, detail="Falta el token de acceso")
+
+    if role != "BODEGUERO":
+        raise HTTPException(status_code=403, detail="No eres bodeguero")
+    if not bodega_id:
+        raise HTTPException(status_code=404, detail="No tienes una bodega asignada")
+    return BodegaIdentity(owner, bodega_id)
@@ -0,0 +1,84 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from app.core.config import settings
+from app.core.metrics import latency
+from app.core.profiling import profiler
+from app.services.admission import admission
+from app.services.gemini_service import gemini_client
+from app.services.catalog_tiles import catalog_tiles
+from app.services.change_feed import change_feed
+from app.services.demand_log import demand_log
+from app.services.term_planner import term_planner
+from app.services.admin_stats import iter_stats
+import hmac
+import threading
+import orjson
+
+router = APIRouter()
+
+# Los endpoints de admin piden el header X-Admin-Token. Sin ADMIN_TOKEN configurado quedan
+# cerrados (404): exponen SQL de los perfiles y corren consultas sobre tablas enteras
+def require_admin(x_admin_token: str | None = Header(default=None)):
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token.encode("utf-8"), settings.ADMIN_TOKEN.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="Token de admin inválido")
+
+@router.get("/metrics", dependencies=[Depends(require_admin)])
+def get_metrics():
+    """Métricas de este proceso (latencias, cola de Gemini, descartes, rate limit, hedging, bundles de catálogo, cambios en vivo, registro de demanda, planificador de términos) y cuotas del host."""
+    return {
+        "latency": latency.snapshot(),
+        "admission": admission.snapshot(),
+        "gemini_quota": gemini_client.quota.snapshot(),
+        "gemini_hedging": gemini_client.hedge.snapshot(),
+        "catalog_tiles": catalog_tiles.snapshot(),
+        "change_feed": change_feed.snapshot(),
+        "demand_log": demand_log.snapshot(),
+        "term_planner": term_planner.snapshot(),
+    }
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+def list_profiles():
+    """Últimos requests perfilados en este proceso (el más reciente primero), con sus SQL más lentos."""
+    return {"enabled": profiler.enabled, "profiles": list(reversed(profiler.recent))}
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+def download_profile(profile_id: str):
+    """Archivo speedscope del perfil: se abre arrastrándolo a https://www.speedscope.app"""
+    if profiler.get(profile_id) is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado (o ya se borró)")
+    return FileResponse(profiler.path_for(profile_id), media_type="application/json", filename=f"{profile_id}.speedscope.json")
+
+_stats_running = threading.Lock()
+
+@router.get("/stats", dependencies=[Depends(require_admin)])
+def db_stats(
+    sample_limit: int = Query(settings.ADMIN_STATS_SAMPLE_LIMIT, ge=0, le=100),
+    price_factor: float = Query(settings.ADMIN_STATS_PRICE_FACTOR, gt=1),
+    max_stock: float = Query(settings.ADMIN_STATS_MAX_STOCK, gt=0),
+):
+    """
+    Salud de la BD con SQL agregado: filas por tabla, bodegas sin inventario, productos sin
+    bodegas, precios y stock fuera de rango, filas huérfanas. NDJSON: una línea por sección
+    apenas termina (`curl -N` las va mostrando).
+    """
+    # Una corrida a la vez por proceso: son agregados sobre tablas enteras
+    if not _stats_running.acquire(blocking=False):
+        raise HTTPException(status_code=429, detail="Ya hay un /admin/stats en curso", headers={"Retry-After": "10"})
+
+    def lines():
+        try:
+            yield None
+            for entry in iter_stats(sample_limit, price_factor, max_stock):
+                yield orjson.dumps(entry) + b"\n"
+        finally:
+            _stats_running.release()
+
+    # Se arranca aquí: un generador sin arrancar no corre su finally al cerrarse, y si el
+    # cliente se va antes de leer el lock quedaría tomado
+    body = lines()
+    next(body)
+    # identity: el GZipMiddleware no toca respuestas con Content-Encoding y no se queda con las líneas
+    return StreamingResponse(body, media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "Content-Encoding": "identity"})
@@ -2,7 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.services.reniec_service import ReniecService # <--- Asegúrate que esto se importe bien
-from app.models.tables import User
+from app.models.tables import User, Bodega
+from app.core.security import create_access_token
+from app.api.deps import invalidate_owner
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -63,14 +65,35 @@ async def consult_dni(req: ConsultRequest, db: Session = Depends(get_db)): # <--
         }
 
 # ... (El resto de endpoints login y register siguen igual) ...
+def issue_token(user_id, role: str, bodega_id=None) -> str:
+    """Token con lo que los endpoints del bodeguero necesitan, así no consultan la BD."""
+    return create_access_token({
+        "sub": str(user_id),
+        "role": role,
+        "bodega_id": str(bodega_id) if bodega_id else None,
+    })
+
 @router.post("/login")
 def login(req: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.dni == req.dni).first()
-    if not user:
+    # Usuario y su bodega (si tiene) en una sola consulta
+    row = db.query(User, Bodega.id)\
+        .outerjoin(Bodega, Bodega.owner_id == User.id)\
+        .filter(User.dni == req.dni)\
+        .first()
+    if not row:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    user, bodega_id = row
     if user.password_hash != req.password:
         raise HTTPException(status_code=401, detail="Contraseña incorrecta")
-    return {"success": True, "user_id": str(user.id), "name": user.full_name, "role": user.role}
+    return {
+        "success": True,
+        "user_id": str(user.id),
+        "name": user.full_name,
+        "role": user.role,
+        "bodega_id": str(bodega_id) if bodega_id else None,
+        "access_token": issue_token(user.id, user.role, bodega_id),
+        "token_type": "bearer"
+    }
 
 @router.post("/register")
 async def register(req: RegisterRequest, db: Session = Depends(get_db)): # <--- 1. AHORA ES ASYNC
@@ -98,8 +121,8 @@ async def register(req: RegisterRequest, db: Session = Depends(get_db)): # <---
     db.refresh(new_user)
 
     # Lógica de Bodeguero (Igual que antes)
+    bodega_id = None
     if req.role == "BODEGUERO" and req.bodega_name:
-         from app.models.tables import Bodega 
          new_bodega = Bodega(
             owner_id=new_user.id,
             name=req.bodega_name,
@@ -110,11 +133,17 @@ async def register(req: RegisterRequest, db: Session = Depends(get_db)): # <---
         )
          db.add(new_bodega)
          db.commit()
+         bodega_id = new_bodega.id
+         # Por si alguien consultó este user_id antes de que tuviera bodega
+         invalidate_owner(new_user.id)
 
     return {
         "success": True, 
         "user_id": str(new_user.id),
-        "role": new_user.role  # <--- ¡ESTO FALTABA!
+        "role": new_user.role,  # <--- ¡ESTO FALTABA!
+        "bodega_id": str(bodega_id) if bodega_id else None,
+        "access_token": issue_token(new_user.id, new_user.role, bodega_id),
+        "token_type": "bearer"
     }
 
     if db.query(User).filter(User.dni == req.dni).first():
@@ -138,7 +167,6 @@ async def register(req: RegisterRequest, db: Session = Depends(get_db)): # <---
 
     # Lógica de Bodeguero (Opcional, la que tenías antes)
     if req.role == "BODEGUERO" and req.bodega_name:
-         from app.models.tables import Bodega # Import local para evitar ciclos
          new_bodega = Bodega(
             owner_id=new_user.id,
             name=req.bodega_name,
@@ -1,9 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.db.session import get_db
-from app.models.tables import User, Bodega, StoreInventory, MasterProduct
-from app.schemas.api_schemas import ProductCreateRequest
+from app.core.config import settings
+from app.models.tables import StoreInventory, MasterProduct, VoiceJob, Bodega
+from app.api.deps import BodegaIdentity, get_current_bodega
+from app.repositories.bodeguero_repo import BodegueroRepository
+from app.repositories.price_index_repo import PriceIndexRepository
+from app.repositories.demand_repo import DemandRepository
+from app.services.suggest_index import suggest_index
+from app.services.attribute_filters import attribute_vocabulary
+from app.services.voice_jobs import voice_jobs
+from app.services.change_feed import change_feed
+from app.services.term_planner import term_planner
+from app.schemas.api_schemas import ProductCreateRequest, BodegaStatusUpdate
 from pydantic import BaseModel
+from typing import Optional
+import contextlib
+import os
+import uuid
 
 router = APIRouter()
 
@@ -11,69 +26,67 @@ router = APIRouter()
 class StockUpdate(BaseModel):
     product_id: int
     in_stock: bool
+    # Versión que el cliente leyó en /my-inventory. Si otra persona cambió el producto
+    # después, respondemos 409 en vez de pisar su cambio. Opcional para apps viejas.
+    expected_version: Optional[int] = None
 
 @router.get("/my-inventory")
-def get_my_inventory(user_id: str, db: Session = Depends(get_db)):
-    # 1. Buscar al usuario y su bodega
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user or user.role != "BODEGUERO":
-        raise HTTPException(status_code=403, detail="No eres bodeguero")
-    
-    bodega = db.query(Bodega).filter(Bodega.owner_id == user.id).first()
-    if not bodega:
-        raise HTTPException(status_code=404, detail="No tienes una bodega asignada")
-
-    # 2. Traer su inventario
-    inventory = db.query(StoreInventory, MasterProduct)\
-        .join(MasterProduct, StoreInventory.product_id == MasterProduct.id)\
-        .filter(StoreInventory.bodega_id == bodega.id)\
-        .all()
+def get_my_inventory(identity: BodegaIdentity = Depends(get_current_bodega), db: Session = Depends(get_db)):
+    # 1. Traer su inventario (la bodega ya viene en el token)
+    inventory = BodegueroRepository.get_inventory_for_bodega(db, identity.bodega_id)
 
-    # 3. Formatear respuesta
+    # 2. Formatear respuesta
     results = []
-    for inv, prod in inventory:
+    for row in inventory:
+        stock = row.stock_quantity if row.stock_quantity is not None else 0
         results.append({
-            "product_id": prod.id,
-            "name": prod.name,
-            "price": float(inv.price),
-            "stock": inv.stock_quantity,
-            "in_stock": inv.stock_quantity > 0 # Si es mayor a 0, está disponible
+            "product_id": row.product_id,
+            "name": row.name,
+            "price": float(row.price),
+            "stock": stock,
+            "in_stock": stock > 0, # Si es mayor a 0, está disponible
+            "version": row.version
         })
     return results
 
 @router.post("/toggle-stock")
-def toggle_stock(user_id: str, update: StockUpdate, db: Session = Depends(get_db)):
-    # 1. Buscar bodega
-    bodega = db.query(Bodega).filter(Bodega.owner_id == user_id).first()
-    if not bodega:
-        raise HTTPException(status_code=404, detail="Bodega no encontrada")
+def toggle_stock(update: StockUpdate, identity: BodegaIdentity = Depends(get_current_bodega), db: Session = Depends(get_db)):
+    # Lógica simple: si es true -> ponemos 50, si es false -> ponemos 0.
+    # Un solo UPDATE ... RETURNING sobre la bodega del token
+    new_stock = 50 if update.in_stock else 0
+    row = BodegueroRepository.set_stock(db, identity.bodega_id, update.product_id, new_stock, update.expected_version)
 
-    # 2. Buscar el item en el inventario
-    item = db.query(StoreInventory).filter(
-        StoreInventory.bodega_id == bodega.id,
-        StoreInventory.product_id == update.product_id
-    ).first()
-
-    if not item:
+    if row is None:
+        # Camino raro: averiguamos si no existe o si alguien lo cambió antes
+        if update.expected_version is not None and BodegueroRepository.inventory_item_exists(db, identity.bodega_id, update.product_id):
+            raise HTTPException(status_code=409, detail="El producto cambió mientras lo editabas, recarga tu inventario")
         raise HTTPException(status_code=404, detail="Producto no encontrado en tu tienda")
 
-    # 3. Actualizar lógica (Si es true -> Ponemos 10, si es false -> Ponemos 0)
-    #    Así mantenemos la lógica simple por ahora.
-    item.stock_quantity = 50 if update.in_stock else 0
-    db.commit()
-    
-    return {"success": True, "new_stock": item.stock_quantity}
+    suggest_index.set_in_stock(identity.bodega_id, update.product_id, new_stock > 0)
+    change_feed.publish(identity.bodega_id, "stock", {"product_id": update.product_id, "stock": float(row.stock_quantity)}, row.version)
+    return {"success": True, "new_stock": row.stock_quantity, "version": row.version}
+
+@router.put("/status")
+def set_bodega_status(update: BodegaStatusUpdate, identity: BodegaIdentity = Depends(get_current_bodega), db: Session = Depends(get_db)):
+    # 'OPEN' / 'CLOSED' fuerzan el estado; null vuelve al horario automático
+    if update.manual_override not in ("OPEN", "CLOSED", None):
+        raise HTTPException(status_code=400, detail="Estado inválido: usa OPEN, CLOSED o null")
+
+    row = BodegueroRepository.set_status(db, identity.bodega_id, update.manual_override)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Bodega no encontrada")
+
+    change_feed.publish(identity.bodega_id, "status", {"status": row.manual_override or "AUTO"}, row.version)
+    return {"success": True, "manual_override": row.manual_override, "version": row.version}
 
 @router.post("/add-product")
 def add_custom_product(
-    user_id: str, 
     product_data: ProductCreateRequest, 
+    identity: BodegaIdentity = Depends(get_current_bodega),
     db: Session = Depends(get_db)
 ):
-    # 1. Validar Bodega
-    bodega = db.query(Bodega).filter(Bodega.owner_id == user_id).first()
-    if not bodega:
-        raise HTTPException(status_code=404, detail="No tienes bodega")
+    # 1. La bodega ya viene validada por el token (o el cache de dueños)
+    bodega_id = identity.bodega_id
 
     # 2. Crear (o buscar) el MasterProduct con los ATRIBUTOS JSON
     # NOTA: Aquí asumimos que cada combinación única de atributos crea un producto nuevo
@@ -86,18 +99,128 @@ def add_custom_product(
         default_unit="UND" # O lo que venga del front
     )
     db.add(new_master)
-    db.commit()
-    db.refresh(new_master)
+    db.flush() # Obtenemos el id sin cerrar la transacción
 
-    # 3. Agregarlo al inventario de la bodega
+    # 3. Agregarlo al inventario de la bodega (un solo commit para los dos inserts)
     new_inventory = StoreInventory(
-        bodega_id=bodega.id,
+        bodega_id=bodega_id,
+        # La región (partición) es la de la bodega; se resuelve dentro del mismo INSERT
+        region=BodegueroRepository.bodega_region(bodega_id),
         product_id=new_master.id,
         price=product_data.price,
         stock_quantity=product_data.stock,
         is_available=True
     )
     db.add(new_inventory)
+    db.flush()
+    PriceIndexRepository.refresh_for_bodega(db, bodega_id, [new_master.id])
     db.commit()
+    db.refresh(new_inventory, ["version"])
+
+    # Puede traer atributos que el vocabulario de filtros todavía no conoce
+    if product_data.attributes:
+        attribute_vocabulary.invalidate()
+
+    # El producto nuevo aparece en el autocompletado sin esperar el refresco
+    suggest_index.add_product(new_master.id, new_master.name, new_master.category)
+    suggest_index.set_in_stock(bodega_id, new_master.id, product_data.stock > 0)
+    term_planner.add_product(new_master.id, new_master.name, new_master.category, product_data.attributes)
+
+    # Los vecinos suscritos a la celda lo ven aparecer sin volver a buscar
+    change_feed.publish(bodega_id, "product", {
+        "product_id": new_master.id,
+        "name": new_master.name,
+        "category": new_master.category,
+        "attributes": product_data.attributes,
+        "price": float(product_data.price),
+        "stock": float(product_data.stock),
+    }, new_inventory.version)
+
+    return {"success": True, "product_id": new_master.id, "message": "Producto creado con detalles"}
+
+@router.post("/voice-update", status_code=202)
+async def voice_update(
+    request: Request,
+    identity: BodegaIdentity = Depends(get_current_bodega),
+    db: Session = Depends(get_db)
+):
+    """
+    Actualiza stock por voz. El cuerpo es el audio tal cual (Content-Type: audio/...).
+    Se guarda en disco por partes y se procesa en segundo plano: la respuesta trae el
+    job_id para consultar /voice-jobs/{job_id}, sin esperar a Gemini.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if not content_type.startswith("audio/"):
+        raise HTTPException(status_code=415, detail="Manda el audio con Content-Type audio/...")
+
+    job_id = uuid.uuid4()
+    path = os.path.join(settings.VOICE_SPOOL_DIR, f"{job_id.hex}.audio")
+
+    def _open_spool():
+        os.makedirs(settings.VOICE_SPOOL_DIR, exist_ok=True)
+        return open(path, "wb")
+
+    def _discard_spool(spool):
+        if spool is not None:
+            spool.close()
+        # Si open() falló el archivo no llegó a existir
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+    # El disco se toca solo desde el threadpool: el event loop sigue atendiendo mientras
+    # se escribe el audio
+    spool = None
+    size = 0
+    try:
+        spool = await run_in_threadpool(_open_spool)
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > settings.VOICE_MAX_BYTES:
+                raise HTTPException(status_code=413, detail="El audio es muy largo")
+            await run_in_threadpool(spool.write, chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="No llegó ningún audio")
+        await run_in_threadpool(spool.close)
+    except BaseException:
+        await run_in_threadpool(_discard_spool, spool)
+        raise
+
+    def _create_job():
+        db.add(VoiceJob(id=job_id, bodega_id=identity.bodega_id, status="PENDING", audio_path=path, content_type=content_type))
+        db.commit()
+
+    await run_in_threadpool(_create_job)
+    voice_jobs.enqueue(job_id)
+    return {"job_id": str(job_id), "status": "PENDING"}
+
+@router.get("/voice-jobs/{job_id}")
+def get_voice_job(job_id: uuid.UUID, identity: BodegaIdentity = Depends(get_current_bodega), db: Session = Depends(get_db)):
+    job = db.query(VoiceJob.status, VoiceJob.result, VoiceJob.error)\
+        .filter(VoiceJob.id == job_id, VoiceJob.bodega_id == identity.bodega_id)\
+        .first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return {"job_id": str(job_id), "status": job.status, "result": job.result, "error": job.error}
+
+@router.get("/unmet-demand")
+def get_unmet_demand(
+    days: int = Query(7, ge=1, le=90),
+    radius_km: float = Query(1.5, gt=0, le=5),
+    limit: int = Query(10, ge=1, le=50),
+    identity: BodegaIdentity = Depends(get_current_bodega),
+    db: Session = Depends(get_db)
+):
+    """Lo que más buscaron los vecinos cerca de la bodega y no encontraron en ninguna: ideas para reponer."""
+    bodega = db.query(Bodega.latitude, Bodega.longitude).filter(Bodega.id == identity.bodega_id).first()
+    if not bodega:
+        raise HTTPException(status_code=404, detail="Bodega no encontrada")
 
-    return {"success": True, "product_id": new_master.id, "message": "Producto creado con detalles"}
\ No newline at end of file
+    rows = DemandRepository.top_unmet_near(db, float(bodega.latitude), float(bodega.longitude), radius_km, days, limit)
+    return {
+        "days": days,
+        "radius_km": radius_km,
+        "items": [
+            {"term": row.term, "searches": row.searches, "last_seen": row.last_seen.isoformat()}
+            for row in rows
+        ],
+    }
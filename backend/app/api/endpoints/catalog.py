@@ -0,0 +1,99 @@
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from app.core.config import settings
+from app.core.geo import tiles_around
+from app.services.catalog_tiles import catalog_tiles
+from app.services.change_feed import change_feed, sse_frame
+from typing import List
+import gzip
+
+router = APIRouter()
+
+# Catálogo por celdas para buscar en el teléfono sin ir a /search/smart en cada consulta.
+# Flujo de la app:
+#   1. GET /catalog/tiles?lat=..&lon=..      -> celdas de su zona y su versión actual
+#   2. GET /catalog/tiles/{lat}/{lon}        -> snapshot completo (la primera vez)
+#   3. GET /catalog/tiles/{lat}/{lon}/delta?since=<version> -> solo lo que cambió
+#   4. GET /catalog/events?tile=<lat>:<lon>  -> cambios en vivo (SSE) mientras la app está abierta
+# Las filas se aplican por llave (bodega id, producto id, bodega+producto): nunca se borran.
+# Un delta puede repetir filas que el cliente ya tiene (la versión entregada es la última
+# segura, ver catalog_tiles): aplicarlas de nuevo no cambia nada.
+
+
+def _bundle_response(request: Request, tile: tuple, since: int) -> Response:
+    version, etag, body = catalog_tiles.bundle(tile, since)
+    etag = f'"{etag}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Catalog-Version": str(version)}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    # El bundle ya está comprimido: se manda tal cual (el GZipMiddleware no lo vuelve a tocar)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+        return Response(content=body, media_type="application/json", headers=headers)
+    return Response(content=gzip.decompress(body), media_type="application/json", headers=headers)
+
+
+@router.get("/tiles")
+def list_tiles(lat: float, lon: float, radius_km: float = Query(1.5, gt=0, le=5)):
+    """Celdas que cubren el radio alrededor del usuario, con su versión para saber si hay que sincronizar."""
+    tiles = tiles_around(lat, lon, radius_km, catalog_tiles.tile_deg)
+    return ORJSONResponse(content={
+        "tile_deg": catalog_tiles.tile_deg,
+        "tiles": [{"tile_lat": t[0], "tile_lon": t[1], "version": catalog_tiles.tile_version(t)} for t in tiles],
+    })
+
+
+@router.get("/tiles/{tile_lat}/{tile_lon}")
+def tile_snapshot(tile_lat: int, tile_lon: int, request: Request):
+    """Snapshot comprimido de la celda: bodegas, productos, precios y stock."""
+    return _bundle_response(request, (tile_lat, tile_lon), 0)
+
+
+@router.get("/tiles/{tile_lat}/{tile_lon}/delta")
+def tile_delta(tile_lat: int, tile_lon: int, request: Request, since: int = Query(..., ge=0)):
+    """Filas de la celda con versión mayor a `since`. Si `since` no es válido llega el snapshot (full=true)."""
+    return _bundle_response(request, (tile_lat, tile_lon), since)
+
+
+@router.get("/events")
+async def tile_events(request: Request, tile: List[str] = Query(..., description="Celdas como tile_lat:tile_lon")):
+    """
+    Server-Sent Events de las celdas: "stock", "product" y "status", cada uno con su versión
+    (id del evento). Un "resync" significa que se perdieron eventos: pedir el delta desde la
+    última versión aplicada. Sin eventos llega un "heartbeat" con {"tiles": {"lat:lon": versión}}:
+    si una versión es mayor que la última aplicada hubo cambios que no llegaron por aquí
+    (otro worker), también toca pedir el delta.
+    """
+    try:
+        tiles = sorted({tuple(int(part) for part in t.split(":")) for t in tile})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Celda inválida, usa tile_lat:tile_lon")
+    if any(len(t) != 2 for t in tiles) or len(tiles) > settings.CHANGE_FEED_MAX_TILES:
+        raise HTTPException(status_code=400, detail=f"Entre 1 y {settings.CHANGE_FEED_MAX_TILES} celdas tile_lat:tile_lon")
+
+    sub = change_feed.subscribe(tiles)
+    if sub is None:
+        raise HTTPException(status_code=503, detail="Demasiados clientes conectados, reintenta luego", headers={"Retry-After": "30"})
+
+    def tile_versions() -> dict:
+        return {f"{t[0]}:{t[1]}": catalog_tiles.tile_version(t) for t in tiles}
+
+    async def stream():
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                frame = await sub.next_frame(settings.CHANGE_FEED_HEARTBEAT_SECONDS)
+                if frame is None:
+                    if await request.is_disconnected():
+                        break
+                    # La versión de cada celda se cachea unos segundos: pocas consultas aunque haya muchos clientes
+                    yield sse_frame("heartbeat", {"tiles": await run_in_threadpool(tile_versions)})
+                    continue
+                yield frame
+        finally:
+            change_feed.unsubscribe(sub)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
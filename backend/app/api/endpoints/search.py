@@ -1,181 +1,428 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
 from app.db.session import get_db
-from app.schemas.api_schemas import SearchRequest, BodegaSearchResult, ProductItem, SmartSearchResponse
+from app.core.config import settings
+from app.core.text_utils import normalize_text, humanize_attributes, product_search_texts
+from app.schemas.api_schemas import SearchRequest, SmartSearchResponse, BatchSearchRequest
 from app.services.gemini_service import gemini_client
+from app.services.admission import admission, Overloaded
 from app.repositories.inventory_repo import InventoryRepository
+from app.repositories.price_index_repo import PriceIndexRepository
+from app.services.session_store import session_store, new_session_id, empty_session, append_turn
+from app.services.suggest_index import suggest_index
+from app.services.attribute_filters import attribute_vocabulary, compile_intent, matches_attributes, sql_filters
+from app.services.search_ranking import rank_key, top_k_bodegas, encode_cursor, decode_cursor
+from app.services.demand_log import demand_log, intent_label
+from app.services.term_planner import term_planner
+from collections import defaultdict
+import asyncio
 import json
-import unicodedata
+import re
+from typing import Optional
 
 router = APIRouter()
 
 # --- UTILITARIOS ---
 
-def normalize_text(text: str) -> str:
-    """Elimina tildes y pasa a minúsculas."""
-    if not text: return ""
-    return ''.join(
-        c for c in unicodedata.normalize('NFD', text.lower())
-        if unicodedata.category(c) != 'Mn'
-    )
+# Modo degradado (sin LLM): palabras que indican cantidad o que no aportan a la búsqueda
+QUANTITY_WORDS = {"un": 1, "una": 1, "uno": 1, "dos": 2, "tres": 3, "cuatro": 4, "cinco": 5, "seis": 6}
+FILLER_WORDS = {"quiero", "necesito", "busco", "dame", "me", "por", "favor", "hay", "tienes", "tiene",
+                "vecino", "de", "del", "la", "el", "los", "las", "unos", "unas", "algo", "para"}
+
+def parse_query_locally(query: str) -> list:
+    """
+    Intención aproximada sin Gemini: separa por comas / "y", detecta cantidades
+    y convierte "con X" / "sin X" en filtros. Se usa cuando hay sobrecarga.
+    """
+    intents = []
+    for chunk in re.split(r",| y | e ", normalize_text(query)):
+        words = [w for w in re.findall(r"[a-z0-9.]+", chunk) if w not in FILLER_WORDS]
+        qty = 1
+        if words and (words[0] in QUANTITY_WORDS or words[0].isdigit()):
+            qty = QUANTITY_WORDS.get(words[0]) or int(words[0])
+            words = words[1:]
+
+        must_contain = []
+        for i, w in enumerate(words):
+            if w in ("con", "sin") and i > 0:
+                must_contain.append(" ".join(words[i:]))
+                words = words[:i]
+                break
+
+        if words:
+            intents.append({"product_name": " ".join(words), "quantity": qty, "must_contain": must_contain, "must_not_contain": []})
+    return intents
+
+# -------------------
+
+def build_bodega_results(filtered_results, n_keywords: int, user_lat: float, user_lon: float, compact: bool = False,
+                         intent_labels: list = None, matched_by_bodega: dict = None):
+    """
+    Agrupa las filas filtradas por bodega y arma la respuesta como dicts listos para JSON.
+    En modo compacto los atributos se devuelven una sola vez por producto (product_attributes).
+    Con intent_labels y matched_by_bodega ({bodega_id: índices de intents encontrados})
+    llena missing_items con lo que esa bodega no tiene.
+    Devuelve (resultados ordenados, detalles para el bot, product_attributes).
+    """
+    bodegas_map = {}
+    product_attributes = {}
+    found_details = []
+
+    # Desempaquetamos la nueva variable qty
+    for inv, prod, bodega, qty in filtered_results:
+        if bodega.id not in bodegas_map:
+            bodegas_map[bodega.id] = {"bodega": bodega, "items": [], "total": 0.0}
+
+        attributes = prod.attributes or {}
+        item = {
+            "product_id": prod.id,
+            "name": prod.name,
+            "price": float(inv.price),
+            "stock": float(inv.stock_quantity or 0),
+            "unit": prod.default_unit or "UND",
+            "requested_quantity": qty, # <--- ENVIAMOS AL FRONTEND
+        }
+        if compact:
+            product_attributes[prod.id] = attributes
+        else:
+            item["attributes"] = attributes
+        bodegas_map[bodega.id]["items"].append(item)
+        # Opcional: Podrías multiplicar precio * qty para el total estimado
+        bodegas_map[bodega.id]["total"] += (float(inv.price) * qty)
+
+        # Agregamos la cantidad al resumen del bot también
+        qty_str = f"x{qty}" if qty > 1 else ""
+        found_details.append(f"{prod.name} {humanize_attributes(attributes)} {qty_str}")
+
+    response_list = []
+    for bid, data in bodegas_map.items():
+        bodega = data["bodega"]
+        found = data["items"]
+        completeness = len(found) / n_keywords if n_keywords else 0
+        lat, lon = float(bodega.latitude), float(bodega.longitude)
+        dist_km = InventoryRepository.haversine(user_lon, user_lat, lon, lat)
+        missing = []
+        if intent_labels:
+            matched = matched_by_bodega.get(bid, ()) if matched_by_bodega else ()
+            missing = [label for i, label in enumerate(intent_labels) if i not in matched]
+
+        response_list.append({
+            "bodega_id": bodega.id,
+            "name": bodega.name,
+            "latitude": lat,
+            "longitude": lon,
+            "distance_meters": int(dist_km * 1000),
+            "is_open": True,
+            "completeness_score": completeness * 100,
+            "total_price": data["total"],
+            "found_items": found,
+            "missing_items": missing,
+        })
+
+    response_list.sort(key=lambda x: rank_key(x["completeness_score"], x["total_price"], x["bodega_id"]))
+    return response_list, found_details, product_attributes
+
+def _match_intent(prod, product_texts: dict, intent_items: list, compiled_intents: list, base_names: list):
+    """Primer intent que cumple el producto: (índice, cantidad pedida), o None."""
+    texts = product_texts.get(prod.id)
+    if texts is None:
+        # Normalizamos textos
+        texts = product_texts[prod.id] = product_search_texts(prod.name, prod.category, prod.attributes, prod.synonyms)
+    prod_name_norm, prod_cat_norm, prod_attrs_text, synonyms_norm, full_product_text = texts
+
+    for intent_idx, (intent, compiled, base_name) in enumerate(zip(intent_items, compiled_intents, base_names)):
+        # Coincidencia Básica
+        is_match_base = (
+            base_name in prod_name_norm or 
+            base_name in prod_cat_norm or 
+            base_name in prod_attrs_text or 
+            any(base_name in s for s in synonyms_norm)
+        )
+        if not is_match_base:
+            continue
+
+        # Atributos estructurados (ya filtrados en SQL, aquí solo para asignar el intent)
+        if not matches_attributes(prod.attributes, compiled):
+            continue
+
+        # Filtros POSITIVOS (residuo de texto libre)
+        if any(term not in full_product_text for term in compiled["must_residue"]):
+            continue
+
+        # Filtros NEGATIVOS (residuo de texto libre)
+        if any(term in full_product_text for term in compiled["must_not_residue"]):
+            continue
 
-def humanize_attributes(attrs: dict) -> str:
-    """Convierte atributos a texto natural (con gas, sin gas, etc)."""
-    if not attrs: return ""
-    text_parts = []
-    for k, v in attrs.items():
-        key_norm = normalize_text(k)
-        val_norm = normalize_text(str(v))
-        text_parts.append(key_norm) 
-        text_parts.append(val_norm) 
-        
-        if isinstance(v, bool):
-            if v is True:
-                text_parts.extend([f"con {key_norm}", "si"])
-            else:
-                text_parts.extend([f"sin {key_norm}", "no"])
-                
-    return " ".join(text_parts)
+        # ¡COINCIDENCIA TOTAL! Capturamos la cantidad
+        return intent_idx, intent.get("quantity", 1) # <--- AQUÍ CAPTURAMOS EL 2 o 3
+    return None
+
+def filter_intent_rows(raw_results, intent_items: list, compiled_intents: list, product_texts: dict = None):
+    """
+    Se queda con las filas que cumplen algún intent (texto, atributos y residuos) y les asigna
+    la cantidad pedida. product_texts se puede compartir entre búsquedas (textos normalizados
+    por producto). Devuelve ([(inv, prod, bodega, qty)], {bodega_id: índices de intents encontrados}).
+    """
+    filtered_results = []
+    # Qué intents encontró cada bodega (para missing_items y el registro de demanda)
+    matched_by_bodega = defaultdict(set)
+    
+    # Un mismo producto aparece en muchas bodegas: sus textos se normalizan una sola vez
+    # y la decisión (qué intent cumple) se toma una vez por producto
+    if product_texts is None:
+        product_texts = {}
+    base_names = [normalize_text(intent.get("product_name", "")) for intent in intent_items]
+    decisions = {}  # product_id -> (intent_idx, cantidad) o None si no cumple ninguno
+    for inv, prod, bodega in raw_results:
+        if prod.id in decisions:
+            decision = decisions[prod.id]
+        else:
+            decision = decisions[prod.id] = _match_intent(prod, product_texts, intent_items, compiled_intents, base_names)
+        if decision is not None:
+            intent_idx, matched_qty = decision
+            # Guardamos la tupla con la cantidad: (inv, prod, bodega, QTY)
+            filtered_results.append((inv, prod, bodega, matched_qty))
+            matched_by_bodega[bodega.id].add(intent_idx)
+
+    return filtered_results, matched_by_bodega
+
+async def remember_turn(session_id: str, session: dict, query: str, answer: str):
+    """Guarda la pregunta del vecino y la respuesta del bot en la sesión."""
+    append_turn(session, "user", query)
+    append_turn(session, "assistant", answer)
+    # Con SESSION_STORE_BACKEND=database es un upsert síncrono: fuera del event loop
+    await run_in_threadpool(session_store.save, session_id, session)
+
+def rate_limit_key(http_request: Request) -> str:
+    """
+    Llave del límite de búsquedas: la IP que ve el servidor. El session_id lo elige el cliente
+    (basta cambiarlo para tener un bucket nuevo), así que no sirve para limitar.
+    """
+    return http_request.client.host if http_request.client else "anon"
 
 # -------------------
 
 @router.post("/smart", response_model=SmartSearchResponse)
-async def search_smart(request: SearchRequest, db: Session = Depends(get_db)):
+async def search_smart(request: SearchRequest, http_request: Request, db: Session = Depends(get_db)):
     
     print(f"\n📍 [DEBUG] Ubicación: {request.user_lat}, {request.user_lon}")
 
+    # Límite por IP antes de gastar BD o Gemini
+    client_key = rate_limit_key(http_request)
+    if not admission.allow_search(client_key):
+        raise HTTPException(status_code=429, detail="Demasiadas búsquedas, espera un momento vecino.", headers={"Retry-After": "5"})
+
+    # "Cargar más": el cursor ya trae los intents interpretados, no llamamos a Gemini
+    after_key = None
+    intent_items = None
+    if request.cursor:
+        decoded = decode_cursor(request.cursor)
+        if decoded is None:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+        after_key, intent_items = decoded
+
+    # Historial del lado del servidor: si la sesión existe, el cliente solo manda `query`
+    session_id = request.session_id or new_session_id()
+    session = await run_in_threadpool(session_store.get, session_id)
+    if session is None:
+        session = empty_session()
+        for msg in request.conversation_history[-settings.SESSION_MAX_MESSAGES:]:
+            append_turn(session, msg.get("role", "user"), msg.get("content", ""))
+
     # 1. Interpretar intención (Gemini devuelve cantidades)
-    intent_items = await gemini_client.interpret_search_intent(
-        request.query, 
-        request.conversation_history
-    )
+    # Si Gemini está saturado respondemos en modo degradado: intención local y sin bot
+    degraded = False
+    if intent_items is None:
+        try:
+            intent_items = await gemini_client.interpret_search_intent(
+                request.query, 
+                session["messages"],
+                session["summary"]
+            )
+        except Overloaded:
+            degraded = True
+            intent_items = parse_query_locally(request.query)
     
     # Extraemos keywords
     keywords = [item.get("product_name", "") for item in intent_items]
     print(f"🤖 [DEBUG] Keywords base: {keywords}")
 
     if not keywords:
-        msg = await gemini_client.generate_shopkeeper_response(request.query, "Sin intención clara.")
-        return SmartSearchResponse(message=msg, results=[])
+        if degraded:
+            msg = "Ahorita estoy con muchos pedidos, vecino. ¿Me dices qué producto buscas?"
+        else:
+            msg = await gemini_client.generate_shopkeeper_response(request.query, "Sin intención clara.")
+        await remember_turn(session_id, session, request.query, msg)
+        return ORJSONResponse(content={"message": msg, "results": [], "session_id": session_id})
+
+    # Los "con gas" / "sin azúcar" que son atributos del catálogo se filtran en SQL;
+    # en Python solo queda el residuo de texto libre
+    vocabulary = attribute_vocabulary.ensure_loaded(db)
+    compiled_intents = [compile_intent(intent, vocabulary) for intent in intent_items]
 
-    # 2. Buscar en BD
+    # 2. Buscar en BD (el planificador de términos resuelve cada keyword a sus productos candidatos)
     raw_results = InventoryRepository.search_products_smart(
-        db, keywords, request.user_lat, request.user_lon
+        db, keywords, request.user_lat, request.user_lon, attribute_filters=compiled_intents,
+        term_plans=[term_planner.plan(k) for k in keywords]
     )
 
     # 3. FILTRADO INTELIGENTE + ASIGNACIÓN DE CANTIDAD
-    filtered_results = []
-    
-    for inv, prod, bodega in raw_results:
-        # Normalizamos textos
-        prod_name_norm = normalize_text(prod.name)
-        prod_cat_norm = normalize_text(prod.category)
-        prod_attrs_text = humanize_attributes(prod.attributes)
-        
-        synonyms_list = prod.synonyms or []
-        synonyms_norm = [normalize_text(s) for s in synonyms_list]
-        synonyms_text = " ".join(synonyms_norm)
-
-        full_product_text = f"{prod_name_norm} {prod_cat_norm} {prod_attrs_text} {synonyms_text}"
-        
-        matches_any_intent = False 
-        matched_qty = 1 # Por defecto es 1
-        
-        for intent in intent_items:
-            base_name = normalize_text(intent.get("product_name", ""))
-            
-            # Coincidencia Básica
-            is_match_base = (
-                base_name in prod_name_norm or 
-                base_name in prod_cat_norm or 
-                base_name in prod_attrs_text or 
-                any(base_name in s for s in synonyms_norm)
+    filtered_results, matched_by_bodega = filter_intent_rows(raw_results, intent_items, compiled_intents)
+
+    print(f"✨ [DEBUG] Resultados finales: {len(filtered_results)}")
+
+    # Demanda: qué se buscó y qué no tenía ninguna bodega del radio (se escribe en segundo
+    # plano; "cargar más" es la misma búsqueda y no se vuelve a contar)
+    if not request.cursor:
+        matched_anywhere = set().union(*matched_by_bodega.values())
+        demand_log.record(intent_items, request.user_lat, request.user_lon, matched_anywhere, len(matched_by_bodega), degraded)
+
+    # 4. Ranking top-k: solo armamos los items de las bodegas de esta página
+    page_rows, last_key = top_k_bodegas(filtered_results, len(keywords), request.limit, after_key)
+    next_cursor = encode_cursor(last_key, intent_items) if last_key else None
+    suggest_index.record_hits({prod.id for _, prod, _, _ in page_rows})
+
+    # 5. Agrupar resultados (dicts planos: no re-validamos con Pydantic en el camino caliente)
+    response_list, found_details, product_attributes = build_bodega_results(
+        page_rows, len(keywords), request.user_lat, request.user_lon, compact=request.compact,
+        intent_labels=[intent_label(intent) for intent in intent_items], matched_by_bodega=matched_by_bodega
+    )
+
+    if request.cursor:
+        bot_message = "Aquí tienes más bodegas, vecino."
+    elif degraded:
+        bot_message = f"Encontré {len(response_list)} bodegas con lo que buscas, vecino." if response_list else "No encontré eso cerca, vecino."
+        await remember_turn(session_id, session, request.query, bot_message)
+    else:
+        summary_products = ", ".join(list(set(found_details))[:10]) 
+        context_str = f"Se encontraron {len(response_list)} bodegas. Productos: {summary_products}." if response_list else "No se encontraron coincidencias."
+        bot_message = await gemini_client.generate_shopkeeper_response(request.query, context_str)
+        await remember_turn(session_id, session, request.query, bot_message)
+
+    payload = {"message": bot_message, "results": response_list, "next_cursor": next_cursor, "session_id": session_id}
+    if degraded:
+        payload["degraded"] = True
+    if request.compact:
+        payload["product_attributes"] = product_attributes
+    return ORJSONResponse(content=payload)
+
+def run_search_batch(db: Session, searches: list, resolved: list, compact: bool = False) -> list:
+    """
+    Parte de BD y armado de /search/batch (sin Gemini): junta los keywords de todas las
+    búsquedas en una sola consulta y reparte las filas. resolved: [(intents, degraded)] por búsqueda.
+    """
+    vocabulary = attribute_vocabulary.ensure_loaded(db)
+
+    # Keywords iguales (con los mismos filtros de atributos) se consultan una sola vez
+    spec_index, keyword_specs, prepared = {}, [], []
+    for intent_items, degraded in resolved:
+        compiled_intents = [compile_intent(intent, vocabulary) for intent in intent_items]
+        keywords = [intent.get("product_name", "") for intent in intent_items]
+        specs = set()
+        for keyword, compiled in zip(keywords, compiled_intents):
+            filters = sql_filters(compiled)
+            key = (keyword, json.dumps(filters, sort_keys=True, ensure_ascii=False))
+            if key not in spec_index:
+                spec_index[key] = len(keyword_specs)
+                keyword_specs.append((keyword, filters))
+            specs.add(spec_index[key])
+        prepared.append((intent_items, compiled_intents, keywords, specs, degraded))
+
+    rows_by_search = InventoryRepository.search_products_batch(
+        db, keyword_specs, [(item.user_lat, item.user_lon) for item in searches],
+        term_plans=[term_planner.plan(keyword) for keyword, _ in keyword_specs]
+    )
+
+    product_texts = {}
+    hits = set()
+    results = []
+    for item, (intent_items, compiled_intents, keywords, specs, degraded), rows in zip(searches, prepared, rows_by_search):
+        entry = {"intents": intent_items, "results": [], "next_cursor": None}
+        if keywords:
+            raw_results = [(inv, prod, bodega) for inv, prod, bodega, matched in rows if not matched.isdisjoint(specs)]
+            filtered_results, matched_by_bodega = filter_intent_rows(raw_results, intent_items, compiled_intents, product_texts)
+            page_rows, last_key = top_k_bodegas(filtered_results, len(keywords), item.limit)
+            hits.update(prod.id for _, prod, _, _ in page_rows)
+            response_list, _, product_attributes = build_bodega_results(
+                page_rows, len(keywords), item.user_lat, item.user_lon, compact=compact,
+                intent_labels=[intent_label(intent) for intent in intent_items], matched_by_bodega=matched_by_bodega
             )
+            entry["results"] = response_list
+            # El cursor sirve tal cual en /search/smart para "cargar más"
+            entry["next_cursor"] = encode_cursor(last_key, intent_items) if last_key else None
+            if compact:
+                entry["product_attributes"] = product_attributes
+        if degraded:
+            entry["degraded"] = True
+        results.append(entry)
 
-            if is_match_base:
-                matches_this_intent = True 
-                
-                # Filtros POSITIVOS
-                must_list = intent.get("must_contain", [])
-                for term in must_list:
-                    if normalize_text(term) not in full_product_text:
-                        matches_this_intent = False
-                        break
-                
-                if not matches_this_intent: continue
-
-                # Filtros NEGATIVOS
-                must_not_list = intent.get("must_not_contain", [])
-                for term in must_not_list:
-                    if normalize_text(term) in full_product_text:
-                        matches_this_intent = False
-                        break
-                
-                if not matches_this_intent: continue
-
-                # ¡COINCIDENCIA TOTAL! Capturamos la cantidad
-                matches_any_intent = True
-                matched_qty = intent.get("quantity", 1) # <--- AQUÍ CAPTURAMOS EL 2 o 3
-                break 
-        
-        if matches_any_intent:
-            # Guardamos la tupla con la cantidad: (inv, prod, bodega, QTY)
-            filtered_results.append((inv, prod, bodega, matched_qty))
+    suggest_index.record_hits(hits)
+    return results
 
-    print(f"✨ [DEBUG] Resultados finales: {len(filtered_results)}")
+@router.post("/batch")
+async def search_batch(request: BatchSearchRequest, http_request: Request, db: Session = Depends(get_db)):
+    """
+    Varias búsquedas de una vez (lista de compras guardada, "lo de siempre"): una sola consulta
+    a la BD para todas. Cada búsqueda trae `query` (se interpreta con Gemini) o `intents` ya
+    interpretados. No genera mensaje del bot ni toca la sesión de conversación.
+    """
+    if not request.searches or len(request.searches) > settings.SEARCH_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Manda entre 1 y {settings.SEARCH_BATCH_MAX_ITEMS} búsquedas")
+    if any(item.intents is None and not item.query for item in request.searches):
+        raise HTTPException(status_code=400, detail="Cada búsqueda necesita query o intents")
 
-    # 4. Agrupar resultados
-    bodegas_map = {}
-    # Desempaquetamos la nueva variable qty
-    for inv, prod, bodega, qty in filtered_results:
-        if bodega.id not in bodegas_map:
-            bodegas_map[bodega.id] = {"bodega": bodega, "items": [], "total": 0.0}
-        
-        bodegas_map[bodega.id]["items"].append(ProductItem(
-            product_id=prod.id, 
-            name=prod.name, 
-            price=inv.price, 
-            stock=inv.stock_quantity, 
-            unit=prod.default_unit or "UND",
-            attributes=prod.attributes,
-            requested_quantity=qty # <--- ENVIAMOS AL FRONTEND
-        ))
-        # Opcional: Podrías multiplicar precio * qty para el total estimado
-        bodegas_map[bodega.id]["total"] += (float(inv.price) * qty)
+    # Cada búsqueda del lote cuenta para el límite por IP (se cobran todas juntas: si no
+    # alcanza no se gasta nada)
+    client_key = rate_limit_key(http_request)
+    if not admission.allow_search(client_key, len(request.searches)):
+        raise HTTPException(status_code=429, detail="Demasiadas búsquedas, espera un momento vecino.", headers={"Retry-After": "5"})
 
-    response_list = []
-    found_details = []
+    async def resolve(item):
+        if item.intents is not None:
+            return [intent.model_dump() for intent in item.intents], False
+        try:
+            return await gemini_client.interpret_search_intent(item.query, [], ""), False
+        except Overloaded:
+            return parse_query_locally(item.query), True
 
-    for bid, data in bodegas_map.items():
-        found = data["items"]
-        completeness = len(found) / len(keywords) if keywords else 0
-        
-        for item in found:
-            attrs_str = humanize_attributes(item.attributes)
-            # Agregamos la cantidad al resumen del bot también
-            qty_str = f"x{item.requested_quantity}" if item.requested_quantity > 1 else ""
-            found_details.append(f"{item.name} {attrs_str} {qty_str}")
-
-        dist_km = InventoryRepository.haversine(request.user_lat, request.user_lon, float(data["bodega"].latitude), float(data["bodega"].longitude))
-        
-        response_list.append(BodegaSearchResult(
-            bodega_id=data["bodega"].id,
-            name=data["bodega"].name,
-            latitude=float(data["bodega"].latitude),
-            longitude=float(data["bodega"].longitude),
-            distance_meters=int(dist_km * 1000),
-            is_open=True,
-            completeness_score=completeness * 100,
-            total_price=data["total"],
-            found_items=found,
-            missing_items=[]
-        ))
-
-    response_list.sort(key=lambda x: (-x.completeness_score, x.total_price))
-    
-    summary_products = ", ".join(list(set(found_details))[:10]) 
-    context_str = f"Se encontraron {len(response_list)} bodegas. Productos: {summary_products}." if response_list else "No se encontraron coincidencias."
-    
-    bot_message = await gemini_client.generate_shopkeeper_response(request.query, context_str)
+    # Las que necesitan Gemini se interpretan en paralelo
+    resolved = await asyncio.gather(*(resolve(item) for item in request.searches))
+    # Consulta y armado son síncronos: en el threadpool, no en el event loop
+    results = await run_in_threadpool(run_search_batch, db, request.searches, resolved, request.compact)
+    return ORJSONResponse(content={"results": results})
+
+@router.get("/suggest")
+def suggest_products(
+    q: str,
+    user_lat: Optional[float] = None,
+    user_lon: Optional[float] = None,
+    limit: int = Query(8, ge=1, le=20)
+):
+    """Autocompletado por tecla: sale del índice en memoria, nunca de la BD ni de Gemini."""
+    return ORJSONResponse(content={"query": q, "suggestions": suggest_index.suggest(q, user_lat, user_lon, limit)})
 
-    return SmartSearchResponse(message=bot_message, results=response_list)
\ No newline at end of file
+@router.get("/cheapest")
+def cheapest_near_me(
+    product_id: int,
+    user_lat: float,
+    user_lon: float,
+    limit: int = Query(5, ge=1, le=20),
+    db: Session = Depends(get_db)
+):
+    """¿Dónde está más barato este producto cerca de mí? Sale del índice de precios, sin el JOIN grande."""
+    offers = PriceIndexRepository.cheapest_near(db, product_id, user_lat, user_lon, limit=limit)
+    results = [
+        {
+            "bodega_id": row.bodega_id,
+            "name": row.name,
+            "latitude": float(row.latitude),
+            "longitude": float(row.longitude),
+            "distance_meters": int(dist_km * 1000),
+            "price": float(row.price),
+            "stock": float(row.stock_quantity or 0),
+        }
+        for row, dist_km in offers
+    ]
+    return ORJSONResponse(content={"product_id": product_id, "results": results})
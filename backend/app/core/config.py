@@ -1,4 +1,7 @@
+from pydantic import Field
 from pydantic_settings import BaseSettings
+import os
+import tempfile
 
 class Settings(BaseSettings):
     # 1. Definimos qué variables esperamos (Python validará que existan)
@@ -14,6 +17,122 @@ class Settings(BaseSettings):
     # Inteligencia Artificial
     GEMINI_API_KEY: str
 
+    # Respuestas: comprime con gzip las respuestas más grandes que este tamaño (bytes).
+    # 0 desactiva la compresión.
+    GZIP_MIN_SIZE: int = 1000
+
+    # Sesiones de conversación: "memory" (LRU por proceso) o "database" (compartida)
+    SESSION_STORE_BACKEND: str = "memory"
+    SESSION_TTL_SECONDS: int = 1800
+    SESSION_MAX_SESSIONS: int = 10000
+    SESSION_MAX_MESSAGES: int = 6
+    SESSION_SUMMARY_MAX_CHARS: int = 400
+
+    # Control de admisión de Gemini (por modelo) y límite de búsquedas por IP
+    GEMINI_MAX_CONCURRENCY_PER_MODEL: int = 4
+    GEMINI_MAX_QUEUE_PER_MODEL: int = 16
+    GEMINI_QUEUE_TIMEOUT_SECONDS: float = 2.0
+    SEARCH_RATE_LIMIT_PER_MINUTE: int = 30
+    SEARCH_RATE_LIMIT_BURST: int = 10
+    # /search/batch: búsquedas máximas por llamada (cada una cuenta para el límite por IP)
+    SEARCH_BATCH_MAX_ITEMS: int = 20
+
+    # Libro de cuotas de Gemini compartido por los workers del host (SQLite)
+    GEMINI_QUOTA_LEDGER_PATH: str = os.path.join(tempfile.gettempdir(), "qaipe_gemini_quota.sqlite3")
+    GEMINI_DEFAULT_RPM: int = 15
+    GEMINI_MODEL_RPM: dict[str, int] = {}  # Ej: {"gemini-2.5-pro": 5}
+    GEMINI_EXHAUSTED_COOLDOWN_SECONDS: float = 60.0
+
+    # Deadlines y hedging de Gemini: si la interpretación no llega en el percentil p90
+    # de las latencias recientes (acotado entre MIN y MAX) se lanza a un segundo modelo.
+    # Pasado el tope duro se responde en modo degradado.
+    GEMINI_HEDGE_PERCENTILE: float = 90.0
+    GEMINI_HEDGE_DEFAULT_SECONDS: float = 1.5
+    GEMINI_HEDGE_MIN_SECONDS: float = 0.3
+    GEMINI_HEDGE_MAX_SECONDS: float = 3.0
+    GEMINI_HARD_TIMEOUT_SECONDS: float = 8.0
+
+    # Tokens de acceso (HMAC). AUTH_SECRET_KEY es obligatoria: una llave aleatoria propia
+    # (ej. `python -c "import secrets; print(secrets.token_urlsafe(48))"`), igual en todos los workers
+    AUTH_SECRET_KEY: str = Field(min_length=32)
+    AUTH_TOKEN_TTL_SECONDS: int = 7 * 24 * 3600
+
+    # Índice "lo más barato cerca": tamaño de celda (grados) y ofertas guardadas por celda
+    PRICE_INDEX_TILE_DEG: float = 0.015
+    PRICE_INDEX_TOP_N: int = 10
+
+    # Regiones (ciudades) de store_inventory, particionada por LIST (region):
+    # nombre -> [lat_min, lat_max, lon_min, lon_max]. Cada bodega toma la primera región que
+    # contiene su ubicación y el resto va a REGION_DEFAULT (partición DEFAULT). Al iniciar la app
+    # se crean las particiones que falten y se re-etiquetan las bodegas si cambió el mapa.
+    # Nombres en minúsculas, sin espacios (van en el nombre de la partición).
+    REGIONS: dict[str, list[float]] = {"trujillo": [-8.25, -7.95, -79.20, -78.90]}
+    REGION_DEFAULT: str = "otros"
+
+    # Autocompletado (/search/suggest): cada cuánto se recarga el índice en memoria desde la BD
+    # y cuántos candidatos por prefijo se rankean como máximo
+    SUGGEST_REFRESH_SECONDS: int = 300
+    SUGGEST_MAX_CANDIDATES: int = 200
+
+    # Vocabulario de atributos del catálogo para compilar "con gas"/"sin azúcar" a SQL
+    ATTRIBUTE_VOCAB_TTL_SECONDS: int = 300
+
+    # Planificador de términos de búsqueda (índice invertido del catálogo en memoria):
+    # refresco, fracción del catálogo a partir de la cual un token no se usa para acotar
+    # ("sin", "de") y máximo de candidatos antes de volver al ILIKE en SQL
+    TERM_PLANNER_REFRESH_SECONDS: int = 300
+    TERM_PLANNER_MAX_DF: float = 0.2
+    TERM_PLANNER_MAX_CANDIDATES: int = 1000
+
+    # Estadísticas de salud de la BD (/admin/stats y check_db.py): tiempo máximo por sección,
+    # filas de muestra por hallazgo y umbrales de precio (veces la mediana) y stock
+    ADMIN_STATS_STATEMENT_TIMEOUT_MS: int = 30000
+    ADMIN_STATS_SAMPLE_LIMIT: int = 10
+    ADMIN_STATS_PRICE_FACTOR: float = 5.0
+    ADMIN_STATS_MAX_STOCK: float = 10000
+
+    # Actualización de stock por voz: carpeta donde se guardan los audios hasta procesarlos,
+    # tamaño máximo, workers en segundo plano y reintentos si Gemini está saturado (cada
+    # cuánto y cuántos intentos en total antes de marcar el trabajo FAILED)
+    VOICE_SPOOL_DIR: str = os.path.join(tempfile.gettempdir(), "qaipe_voice")
+    VOICE_MAX_BYTES: int = 10 * 1024 * 1024
+    VOICE_WORKERS: int = 2
+    VOICE_RETRY_SECONDS: float = 15.0
+    VOICE_MAX_ATTEMPTS: int = 5
+    VOICE_STALE_SECONDS: float = 600.0
+
+    # Bundles de catálogo por celda (/catalog): tamaño de celda, cada cuánto se vuelve a
+    # consultar la versión de una celda y cuántos bundles comprimidos se guardan en memoria
+    # (hasta este número de snapshots, uno por celda, y otro tanto de deltas)
+    CATALOG_TILE_DEG: float = 0.015
+    CATALOG_VERSION_TTL_SECONDS: float = 2.0
+    CATALOG_CACHE_MAX_BUNDLES: int = 512
+
+    # Cambios en vivo por celda (/catalog/events): eventos recientes que guarda cada celda (un
+    # cliente más atrasado recibe "resync"), tope de clientes por proceso, celdas por conexión y heartbeat
+    CHANGE_FEED_BUFFER_SIZE: int = 100
+    CHANGE_FEED_MAX_SUBSCRIBERS: int = 10000
+    CHANGE_FEED_MAX_TILES: int = 25
+    CHANGE_FEED_HEARTBEAT_SECONDS: float = 15.0
+
+    # Registro de demanda (write-behind): tamaño de lote, cada cuánto se escribe aunque el lote
+    # no esté lleno y cuántas búsquedas pueden esperar en memoria antes de descartar
+    DEMAND_LOG_BATCH_SIZE: int = 200
+    DEMAND_LOG_FLUSH_SECONDS: float = 2.0
+    DEMAND_LOG_MAX_PENDING: int = 10000
+
+    # Perfilado bajo demanda: requests con X-Profile-Token == PROFILE_TOKEN, o una fracción
+    # sorteada de PROFILE_PATHS. Con token vacío y tasa 0 el middleware no se instala.
+    PROFILE_TOKEN: str = ""
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_PATHS: list[str] = ["/api/v1/search/smart"]
+    PROFILE_INTERVAL_MS: float = 5.0
+    PROFILE_DIR: str = os.path.join(tempfile.gettempdir(), "qaipe_profiles")
+    PROFILE_MAX_FILES: int = 50
+
+    # Endpoints /admin (header X-Admin-Token): si está vacío quedan cerrados
+    ADMIN_TOKEN: str = ""
+
     # Configuración para leer el archivo .env automáticamente
     class Config:
         env_file = ".env"
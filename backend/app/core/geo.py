@@ -0,0 +1,29 @@
+import math
+from app.core.config import settings
+
+# Grilla fija de "tiles" (celdas de TILE_DEG grados) para los índices geográficos.
+# Con 0.015° una celda mide ~1.6 km de lado en Trujillo, así que un radio de búsqueda
+# de 1.5 km cabe en la celda del vecino y sus 8 vecinas.
+
+KM_PER_DEG_LAT = 111.32
+
+
+def tile_of(lat, lon, tile_deg: float = None) -> tuple:
+    """Celda (tile_lat, tile_lon) que contiene el punto. Igual que floor(lat / deg) en SQL."""
+    deg = tile_deg or settings.PRICE_INDEX_TILE_DEG
+    return math.floor(float(lat) / deg), math.floor(float(lon) / deg)
+
+
+def tiles_around(lat, lon, radius_km: float, tile_deg: float = None) -> list:
+    """Celdas que pueden tener puntos a menos de radius_km (la propia y sus vecinas)."""
+    deg = tile_deg or settings.PRICE_INDEX_TILE_DEG
+    tile_lat, tile_lon = tile_of(lat, lon, deg)
+    span_lat = math.ceil(radius_km / (deg * KM_PER_DEG_LAT))
+    # Los grados de longitud se achican lejos del ecuador
+    km_per_deg_lon = KM_PER_DEG_LAT * max(math.cos(math.radians(float(lat))), 0.01)
+    span_lon = math.ceil(radius_km / (deg * km_per_deg_lon))
+    return [
+        (tile_lat + d_lat, tile_lon + d_lon)
+        for d_lat in range(-span_lat, span_lat + 1)
+        for d_lon in range(-span_lon, span_lon + 1)
+    ]
@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import deque
+
+# Métricas de latencia por endpoint (en memoria, por proceso).
+# Guardamos una ventana de las últimas muestras por ruta para sacar p50/p95/p99.
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class LatencyRecorder:
+    WINDOW = 512
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float):
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = {"count": 0, "samples": deque(maxlen=self.WINDOW)}
+            stats["count"] += 1
+            stats["samples"].append(seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routes = {key: (stats["count"], sorted(stats["samples"])) for key, stats in self._routes.items()}
+        return {
+            key: {
+                "count": count,
+                "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 95) * 1000, 2),
+                "p99_ms": round(percentile(samples, 99) * 1000, 2),
+                "max_ms": round(samples[-1] * 1000, 2) if samples else 0.0,
+            }
+            for key, (count, samples) in routes.items()
+        }
+
+
+latency = LatencyRecorder()
+
+
+class LatencyMiddleware:
+    """Middleware ASGI que mide cada request y la agrupa por ruta ("POST /api/v1/bodeguero/toggle-stock")."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get("route")
+            path = route.path if route is not None else "sin_ruta"
+            latency.record(f"{scope['method']} {path}", time.perf_counter() - start)
@@ -0,0 +1,327 @@
+import asyncio
+import contextvars
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+import orjson
+from sqlalchemy import event
+from app.core.config import settings
+from app.db.session import engine
+
+# Perfilado bajo demanda de requests puntuales (ej. un /search/smart lento en producción).
+# Un request se perfila si trae X-Profile-Token == PROFILE_TOKEN, o por sorteo
+# (PROFILE_SAMPLE_RATE) en las rutas de PROFILE_PATHS. Mientras dura:
+#   - un hilo muestrea la pila cada PROFILE_INTERVAL_MS: la del event loop si está corriendo
+#     la corrutina del request, y si no la cadena de awaits (dónde está esperando) más la pila
+#     de los hilos que están ejecutando código de la app (to_thread / threadpool)
+#   - los hooks de SQLAlchemy anotan cada statement con su duración
+# El resultado es un archivo speedscope (https://www.speedscope.app) que se baja de
+# /admin/profiles/{id}; la respuesta trae el id en X-Profile-Id.
+# Desactivado (sin token ni sorteo) el middleware ni se instala y los hooks de SQL solo se
+# enganchan mientras hay un perfil activo: costo cero.
+# Es estadístico y por proceso: se perfila un request a la vez, y si hay otros requests
+# usando hilos al mismo tiempo pueden colarse algunas de sus muestras.
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT_DIR = os.path.dirname(APP_DIR)
+
+_active_profile = contextvars.ContextVar("qaipe_active_profile", default=None)
+
+
+class ProfileSession:
+    def __init__(self, method: str, path: str, loop_thread: int, task, interval_ms: float):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.loop_thread = loop_thread
+        self.task = task
+        self.interval = interval_ms / 1000
+        self.started_at = datetime.utcnow()
+        self.start = time.perf_counter()
+        self.end = None
+        self.frames = []          # frames de speedscope: {"name", "file", "line"}
+        self._frame_ids = {}
+        self.samples = []         # [[frame ids raíz -> hoja]]
+        self.weights = []         # ms de cada muestra
+        self.sql = []             # [(inicio_ms, fin_ms, statement, filas)]
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="qaipe-profiler", daemon=True)
+
+    # --- Frames ---
+
+    def _frame_id(self, name: str, file: str, line: int) -> int:
+        key = (name, file, line)
+        frame_id = self._frame_ids.get(key)
+        if frame_id is None:
+            frame_id = self._frame_ids[key] = len(self.frames)
+            self.frames.append({"name": name, "file": file, "line": line})
+        return frame_id
+
+    def _code_id(self, code) -> int:
+        file = code.co_filename
+        if file.startswith(ROOT_DIR):
+            file = os.path.relpath(file, ROOT_DIR)
+        return self._frame_id(getattr(code, "co_qualname", code.co_name), file, code.co_firstlineno)
+
+    @staticmethod
+    def _walk(frame) -> list:
+        """Frames de la pila, de la raíz a la hoja."""
+        stack = []
+        while frame is not None and len(stack) < 256:
+            stack.append(frame)
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def _await_chain(self):
+        """Corrutinas del request suspendidas (raíz -> hoja) y en qué quedó esperando la última."""
+        codes, coro, leaf = [], self.task.get_coro(), None
+        while coro is not None and len(codes) < 256:
+            frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+            if frame is None:
+                break
+            codes.append(frame.f_code)
+            awaited = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+            if isinstance(awaited, asyncio.Task):
+                awaited = awaited.get_coro()
+            if awaited is None or not (hasattr(awaited, "cr_frame") or hasattr(awaited, "gi_frame")):
+                leaf = awaited
+                break
+            coro = awaited
+        return codes, leaf
+
+    # --- Muestreo ---
+
+    def _sample(self, weight_ms: float):
+        current = sys._current_frames()
+        root = self.task.get_coro()
+
+        if getattr(root, "cr_running", False) and self.loop_thread in current:
+            # El loop está ejecutando nuestra corrutina: la pila real, desde la corrutina raíz
+            stack = self._walk(current[self.loop_thread])
+            root_code = root.cr_code
+            start = next((i for i, f in enumerate(stack) if f.f_code is root_code), 0)
+            self.samples.append([self._code_id(f.f_code) for f in stack[start:]])
+            self.weights.append(weight_ms)
+            return
+
+        codes, leaf = self._await_chain()
+        prefix = [self._code_id(code) for code in codes]
+        workers = []
+        for ident, frame in current.items():
+            if ident in (self.loop_thread, threading.get_ident()):
+                continue
+            stack = self._walk(frame)
+            first_app = next((i for i, f in enumerate(stack) if f.f_code.co_filename.startswith(APP_DIR)), None)
+            if first_app is not None:
+                workers.append(stack[first_app:])
+
+        if workers:
+            # El request espera a un hilo: su pila va colgada de la cadena de awaits
+            for stack in workers:
+                self.samples.append(prefix + [self._code_id(f.f_code) for f in stack])
+                self.weights.append(weight_ms / len(workers))
+        else:
+            waiting = f"(esperando {type(leaf).__name__})" if leaf is not None else "(esperando)"
+            self.samples.append(prefix + [self._frame_id(waiting, "", 0)])
+            self.weights.append(weight_ms)
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            try:
+                self._sample((now - last) * 1000)
+            except Exception:
+                # Una pila que cambia mientras se lee no debe tumbar el request
+                pass
+            last = now
+
+    def begin(self):
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        self.end = time.perf_counter()
+
+    # --- Salida ---
+
+    def duration_ms(self) -> float:
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+    def speedscope(self) -> dict:
+        """Dos perfiles: el muestreo de pilas y una línea de tiempo de los statements SQL."""
+        duration = self.duration_ms()
+        sql_events, last_close = [], 0.0
+        for start_ms, end_ms, statement, _ in sorted(self.sql):
+            # speedscope pide eventos anidados: si dos statements se pisan (hilos) se recorta
+            start_ms = max(start_ms, last_close)
+            end_ms = max(end_ms, start_ms)
+            frame_id = self._frame_id("SQL " + statement[:120], "", 0)
+            sql_events.append({"type": "O", "frame": frame_id, "at": start_ms})
+            sql_events.append({"type": "C", "frame": frame_id, "at": end_ms})
+            last_close = end_ms
+        name = f"{self.method} {self.path}"
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{name} {self.started_at.isoformat()}",
+            "exporter": "qaipe-profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": self.frames},
+            "profiles": [
+                {
+                    "type": "sampled", "name": f"{name} (pilas)", "unit": "milliseconds",
+                    "startValue": 0, "endValue": duration,
+                    "samples": self.samples, "weights": self.weights,
+                },
+                {
+                    "type": "evented", "name": f"{name} (SQL)", "unit": "milliseconds",
+                    "startValue": 0, "endValue": max(duration, last_close), "events": sql_events,
+                },
+            ],
+        }
+
+    def summary(self, status) -> dict:
+        statements = sorted(self.sql, key=lambda s: s[1] - s[0], reverse=True)
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms(), 1),
+            "samples": len(self.samples),
+            "sql_count": len(self.sql),
+            "sql_ms": round(sum(end - start for start, end, _, _ in self.sql), 1),
+            "slowest_sql": [
+                {"ms": round(end - start, 2), "rows": rows, "statement": statement[:300]}
+                for start, end, statement, rows in statements[:5]
+            ],
+        }
+
+
+# --- Hooks de SQL (solo enganchados mientras hay un perfil activo) ---
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active_profile.get() is not None:
+        context._qaipe_profile_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    session = _active_profile.get()
+    start = getattr(context, "_qaipe_profile_start", None)
+    if session is not None and start is not None:
+        end = time.perf_counter()
+        session.sql.append((
+            (start - session.start) * 1000, (end - session.start) * 1000,
+            " ".join(statement.split()), cursor.rowcount,
+        ))
+
+
+class Profiler:
+    def __init__(self, token: str, sample_rate: float, paths: list, interval_ms: float, out_dir: str, max_files: int):
+        self.token = token
+        self.sample_rate = sample_rate
+        self.paths = set(paths)
+        self.interval_ms = interval_ms
+        self.out_dir = out_dir
+        self.max_files = max_files
+        self.recent = deque()     # resúmenes de los últimos perfiles (el más nuevo al final)
+        self._busy = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) or self.sample_rate > 0
+
+    def wants(self, scope) -> bool:
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == b"x-profile-token":
+                    return hmac.compare_digest(value, self.token.encode())
+        return self.sample_rate > 0 and scope["path"] in self.paths and random.random() < self.sample_rate
+
+    def begin(self, scope):
+        """Arranca un perfil, o None si ya hay otro corriendo en este proceso."""
+        if not self._busy.acquire(blocking=False):
+            return None
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        session = ProfileSession(scope["method"], scope["path"], threading.get_ident(), asyncio.current_task(), self.interval_ms)
+        session.begin()
+        return session
+
+    def finish(self, session: ProfileSession, status):
+        try:
+            session.stop()
+        finally:
+            event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+            event.remove(engine, "after_cursor_execute", _after_cursor_execute)
+            self._busy.release()
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        with open(self.path_for(session.id), "wb") as f:
+            f.write(orjson.dumps(session.speedscope()))
+        summary = session.summary(status)
+        self.recent.append(summary)
+        while len(self.recent) > self.max_files:
+            old = self.recent.popleft()
+            try:
+                os.remove(self.path_for(old["id"]))
+            except FileNotFoundError:
+                pass
+        print(f"🔬 [PROFILE] {summary['method']} {summary['path']} {summary['duration_ms']} ms, "
+              f"{summary['samples']} muestras, {summary['sql_count']} SQL -> {summary['id']}")
+        return summary
+
+    def path_for(self, profile_id: str) -> str:
+        return os.path.join(self.out_dir, f"{profile_id}.speedscope.json")
+
+    def get(self, profile_id: str):
+        """Resumen del perfil si todavía existe (ids que no generó este proceso no se sirven)."""
+        return next((s for s in self.recent if s["id"] == profile_id), None)
+
+
+profiler = Profiler(
+    token=settings.PROFILE_TOKEN,
+    sample_rate=settings.PROFILE_SAMPLE_RATE,
+    paths=settings.PROFILE_PATHS,
+    interval_ms=settings.PROFILE_INTERVAL_MS,
+    out_dir=settings.PROFILE_DIR,
+    max_files=settings.PROFILE_MAX_FILES,
+)
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI: solo se instala si el perfilado está configurado (ver main.py)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiler.wants(scope):
+            return await self.app(scope, receive, send)
+        session = profiler.begin(scope)
+        if session is None:
+            return await self.app(scope, receive, send)
+
+        status = {"code": None}
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", session.id.encode())]
+            await send(message)
+
+        token = _active_profile.set(session)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _active_profile.reset(token)
+            await asyncio.to_thread(profiler.finish, session, status["code"])
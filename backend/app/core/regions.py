@@ -0,0 +1,50 @@
+import re
+from app.core.config import settings
+
+# Regiones (ciudades) de settings.REGIONS: cajas de coordenadas con nombre.
+# Las bodegas guardan su región y store_inventory está particionada por ella, así que una
+# búsqueda solo lee la partición de su ciudad: el costo no crece al sumar ciudades.
+
+_NAME_RE = re.compile(r"^[a-z][a-z0-9_]*$")
+
+
+def configured_regions() -> dict:
+    """{nombre: (lat_min, lat_max, lon_min, lon_max)} validado, en el orden de la config."""
+    regions = {}
+    for name, box in settings.REGIONS.items():
+        if not _NAME_RE.match(name) or name == settings.REGION_DEFAULT:
+            raise ValueError(f"Nombre de región inválido: {name!r}")
+        lat_min, lat_max, lon_min, lon_max = (float(v) for v in box)
+        regions[name] = (min(lat_min, lat_max), max(lat_min, lat_max), min(lon_min, lon_max), max(lon_min, lon_max))
+    return regions
+
+
+def all_regions() -> list:
+    """Todas las regiones, incluida la de por defecto (al final)."""
+    return [*configured_regions(), settings.REGION_DEFAULT]
+
+
+def region_of(lat, lon) -> str:
+    """Región de un punto: la primera caja que lo contiene, o REGION_DEFAULT."""
+    lat, lon = float(lat), float(lon)
+    for name, (lat_min, lat_max, lon_min, lon_max) in configured_regions().items():
+        if lat_min <= lat <= lat_max and lon_min <= lon <= lon_max:
+            return name
+    return settings.REGION_DEFAULT
+
+
+def regions_in_box(lat_min: float, lat_max: float, lon_min: float, lon_max: float) -> list:
+    """
+    Regiones que pueden tener bodegas dentro de la caja. La de por defecto entra salvo que la
+    caja quede completa dentro de una sola región (fuera de las cajas todo es REGION_DEFAULT).
+    """
+    found, covered = [], False
+    for name, (r_lat_min, r_lat_max, r_lon_min, r_lon_max) in configured_regions().items():
+        if lat_max < r_lat_min or lat_min > r_lat_max or lon_max < r_lon_min or lon_min > r_lon_max:
+            continue
+        found.append(name)
+        if r_lat_min <= lat_min and lat_max <= r_lat_max and r_lon_min <= lon_min and lon_max <= r_lon_max:
+            covered = True
+    if not covered:
+        found.append(settings.REGION_DEFAULT)
+    return found
@@ -0,0 +1,45 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+from app.core.config import settings
+
+# Tokens firmados (HMAC-SHA256) con los datos que los endpoints necesitan:
+# sub (user_id), role y bodega_id. Validarlos no toca la BD.
+# Formato: base64url(payload_json).base64url(firma)
+
+
+def _secret() -> bytes:
+    return settings.AUTH_SECRET_KEY.encode("utf-8")
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def create_access_token(claims: dict, expires_seconds: int = None) -> str:
+    now = int(time.time())
+    payload = dict(claims, iat=now, exp=now + (expires_seconds or settings.AUTH_TOKEN_TTL_SECONDS))
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    signature = hmac.new(_secret(), body.encode("ascii"), hashlib.sha256).digest()
+    return f"{body}.{_b64encode(signature)}"
+
+
+def decode_access_token(token: str):
+    """Devuelve los claims si la firma es válida y no venció; si no, None."""
+    try:
+        body, signature = token.split(".")
+        expected = hmac.new(_secret(), body.encode("ascii"), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            return None
+        claims = json.loads(_b64decode(body))
+    except Exception:
+        return None
+    if claims.get("exp", 0) < time.time():
+        return None
+    return claims
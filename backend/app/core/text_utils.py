@@ -0,0 +1,43 @@
+import unicodedata
+
+
+def normalize_text(text: str) -> str:
+    """Elimina tildes y pasa a minúsculas."""
+    if not text: return ""
+    return ''.join(
+        c for c in unicodedata.normalize('NFD', text.lower())
+        if unicodedata.category(c) != 'Mn'
+    )
+
+
+def humanize_attributes(attrs: dict) -> str:
+    """Convierte atributos a texto natural (con gas, sin gas, etc)."""
+    if not attrs: return ""
+    text_parts = []
+    for k, v in attrs.items():
+        key_norm = normalize_text(k)
+        val_norm = normalize_text(str(v))
+        text_parts.append(key_norm) 
+        text_parts.append(val_norm) 
+        
+        if isinstance(v, bool):
+            if v is True:
+                text_parts.extend([f"con {key_norm}", "si"])
+            else:
+                text_parts.extend([f"sin {key_norm}", "no"])
+                
+    return " ".join(text_parts)
+
+
+def product_search_texts(name: str, category: str, attributes: dict, synonyms: list) -> tuple:
+    """
+    Textos normalizados de un producto contra los que se compara un keyword:
+    (nombre, categoría, atributos, [sinónimos], texto completo). Los usan el filtro de
+    /search/smart y el planificador de términos, así los dos deciden igual.
+    """
+    name_norm = normalize_text(name)
+    category_norm = normalize_text(category)
+    attrs_text = humanize_attributes(attributes)
+    synonyms_norm = [normalize_text(s) for s in synonyms or []]
+    full_text = f"{name_norm} {category_norm} {attrs_text} {' '.join(synonyms_norm)}"
+    return name_norm, category_norm, attrs_text, synonyms_norm, full_text
@@ -0,0 +1,284 @@
+import csv
+import io
+import json
+import random
+import time
+import uuid
+from sqlalchemy import text
+from app.models.tables import User, Bodega, BodegaSchedule, MasterProduct, StoreInventory
+from app.core.regions import region_of
+from app.repositories.price_index_repo import PriceIndexRepository
+
+# Formato de fixtures (archivo JSON o generado):
+# {
+#   "users":     [{"ref": "lucho", "dni": "11111111", "full_name": ..., "role": "BODEGUERO", ...}],
+#   "bodegas":   [{"ref": "b_lucho", "owner": "lucho", "name": ..., "latitude": ..., "longitude": ...}],
+#   "schedules": [{"bodega": "b_lucho", "day_of_week": 0, "open_time": "08:00", "close_time": "22:00"}],
+#   "products":  [{"ref": "arroz", "name": ..., "category": ..., "synonyms": [...], "attributes": {...}}],
+#   "inventory": [{"bodega": "b_lucho", "product": "arroz", "price": 4.5, "stock_quantity": 20}]
+# }
+# Los "ref" son alias locales del archivo: los UUID se asignan aquí en Python y los IDs
+# de productos se reservan de la secuencia en un solo viaje, así no dependemos de
+# refrescos del ORM para enlazar las tablas.
+
+# Orden de carga (respeta las llaves foráneas) y columnas que escribimos en cada tabla
+LOAD_PLAN = [
+    ("users", User.__table__, ["id", "dni", "full_name", "phone_number", "email", "password_hash", "role", "is_active", "is_verified"]),
+    ("bodegas", Bodega.__table__, ["id", "owner_id", "name", "address", "photo_url", "latitude", "longitude", "manual_override", "rating", "region"]),
+    ("schedules", BodegaSchedule.__table__, ["bodega_id", "day_of_week", "open_time", "close_time"]),
+    ("products", MasterProduct.__table__, ["id", "name", "category", "synonyms", "image_url", "default_unit", "attributes"]),
+    ("inventory", StoreInventory.__table__, ["bodega_id", "region", "product_id", "price", "stock_quantity", "is_available"]),
+]
+
+
+def read_fixture_file(path: str) -> dict:
+    """Lee un archivo de fixtures en JSON."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def resolve_fixtures(db, fixtures: dict) -> dict:
+    """
+    Convierte los "ref" en IDs reales y devuelve filas listas para COPY (dicts por tabla).
+    Los productos reservan sus IDs de la secuencia con una sola consulta.
+    """
+    user_ids = {}
+    rows = {"users": [], "bodegas": [], "schedules": [], "products": [], "inventory": []}
+
+    for u in fixtures.get("users", []):
+        uid = uuid.UUID(u["id"]) if u.get("id") else uuid.uuid4()
+        user_ids[u.get("ref", str(uid))] = uid
+        rows["users"].append({
+            "id": uid,
+            "dni": u.get("dni"),
+            "full_name": u.get("full_name"),
+            "phone_number": u.get("phone_number"),
+            "email": u.get("email"),
+            "password_hash": u.get("password_hash"),
+            "role": u.get("role", "CLIENT"),
+            "is_active": u.get("is_active", True),
+            "is_verified": u.get("is_verified", False),
+        })
+
+    bodega_ids = {}
+    bodega_regions = {}  # COPY no pasa por los defaults de SQLAlchemy: la región va explícita
+    for b in fixtures.get("bodegas", []):
+        bid = uuid.UUID(b["id"]) if b.get("id") else uuid.uuid4()
+        bodega_ids[b.get("ref", str(bid))] = bid
+        bodega_regions[bid] = region_of(b["latitude"], b["longitude"])
+        rows["bodegas"].append({
+            "id": bid,
+            "owner_id": user_ids.get(b.get("owner")),
+            "name": b["name"],
+            "address": b.get("address"),
+            "photo_url": b.get("photo_url"),
+            "latitude": b["latitude"],
+            "longitude": b["longitude"],
+            "manual_override": b.get("manual_override"),
+            "rating": b.get("rating", 5.0),
+            "region": bodega_regions[bid],
+        })
+
+    for s in fixtures.get("schedules", []):
+        rows["schedules"].append({
+            "bodega_id": bodega_ids[s["bodega"]],
+            "day_of_week": s["day_of_week"],
+            "open_time": s["open_time"],
+            "close_time": s["close_time"],
+        })
+
+    products = fixtures.get("products", [])
+    reserved = []
+    if products:
+        reserved = db.execute(
+            text("SELECT nextval(pg_get_serial_sequence('master_products', 'id')) FROM generate_series(1, :n)"),
+            {"n": len(products)}
+        ).scalars().all()
+
+    product_ids = {}
+    for p, pid in zip(products, reserved):
+        product_ids[p.get("ref", p["name"])] = pid
+        rows["products"].append({
+            "id": pid,
+            "name": p["name"],
+            "category": p.get("category"),
+            "synonyms": p.get("synonyms"),
+            "image_url": p.get("image_url"),
+            "default_unit": p.get("default_unit", "UND"),
+            "attributes": p.get("attributes", {}),
+        })
+
+    for i in fixtures.get("inventory", []):
+        bid = bodega_ids[i["bodega"]]
+        rows["inventory"].append({
+            "bodega_id": bid,
+            "region": bodega_regions[bid],
+            "product_id": product_ids[i["product"]],
+            "price": i["price"],
+            "stock_quantity": i.get("stock_quantity", 0),
+            "is_available": i.get("is_available", True),
+        })
+
+    return rows
+
+
+def _pg_array(values) -> str:
+    """Lista de Python -> literal de arreglo de PostgreSQL ({"a","b"})."""
+    escaped = ['"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"' for v in values]
+    return "{" + ",".join(escaped) + "}"
+
+
+def _to_csv_value(value):
+    if value is None:
+        return None  # csv.writer lo escribe vacío y COPY lo toma como NULL
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, (list, tuple)):
+        return _pg_array(value)
+    return value
+
+
+def _copy_rows(cursor, table, columns, rows):
+    """Vuelca las filas con COPY ... FROM STDIN (un solo viaje por tabla)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_to_csv_value(row[c]) for c in columns])
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def load_rows(db, rows: dict, method: str = "copy") -> list:
+    """
+    Inserta las filas ya resueltas dentro de la transacción de `db` (sin commit).
+    method="copy" usa COPY de psycopg2; method="insert" usa INSERT en lotes (executemany).
+    Devuelve un reporte [(tabla, filas, segundos)].
+    """
+    report = []
+    if method == "copy":
+        cursor = db.connection().connection.cursor()
+    for key, table, columns in LOAD_PLAN:
+        table_rows = rows.get(key) or []
+        if not table_rows:
+            continue
+        start = time.perf_counter()
+        if method == "copy":
+            _copy_rows(cursor, table, columns, table_rows)
+        else:
+            db.execute(table.insert(), table_rows)
+        report.append((table.name, len(table_rows), time.perf_counter() - start))
+    return report
+
+
+def load_fixtures(db, fixtures: dict, method: str = "copy") -> list:
+    """Resuelve y carga un set de fixtures en una sola transacción."""
+    rows = resolve_fixtures(db, fixtures)
+    report = load_rows(db, rows, method=method)
+    # Con todo el inventario cargado, el índice de precios se arma de una sola vez
+    start = time.perf_counter()
+    indexed = PriceIndexRepository.rebuild(db)
+    report.append(("price_index", indexed, time.perf_counter() - start))
+    db.commit()
+    return report
+
+
+# --- GENERADOR DE DATOS SINTÉTICOS ---
+
+# Catálogo base: (nombre, categoría, unidad, precio referencial, sinónimos)
+BASE_PRODUCTS = [
+    ("Arroz", "Abarrotes", "kg", 4.50, ["arroz"]),
+    ("Azúcar Rubia", "Abarrotes", "kg", 4.20, ["azucar"]),
+    ("Aceite Vegetal", "Abarrotes", "botella", 9.80, ["aceite"]),
+    ("Fideos Tallarín", "Abarrotes", "paquete", 3.20, ["fideos", "tallarin"]),
+    ("Leche Evaporada", "Lácteos", "lata", 4.10, ["leche", "tarro"]),
+    ("Yogurt", "Lácteos", "botella", 6.50, ["yogur"]),
+    ("Pan Francés", "Panadería", "UND", 0.30, ["pan"]),
+    ("Huevos", "Abarrotes", "UND", 0.60, ["huevo"]),
+    ("Agua de Mesa", "Bebidas", "botella", 2.00, ["agua"]),
+    ("Gaseosa", "Bebidas", "botella", 6.50, ["gaseosa", "refresco"]),
+    ("Cerveza", "Licores", "botella", 7.50, ["chela", "birra"]),
+    ("Detergente", "Limpieza", "bolsa", 8.90, ["detergente", "jabon en polvo"]),
+    ("Papel Higiénico", "Limpieza", "paquete", 12.50, ["papel"]),
+    ("Galletas", "Snacks", "paquete", 1.20, ["galleta"]),
+    ("Atún", "Conservas", "lata", 5.90, ["atun", "conserva"]),
+]
+BRANDS = ["Costeño", "Paisana", "Gloria", "Laive", "Don Vittorio", "Cielo", "San Luis", "Coca Cola",
+          "Inca Kola", "Pilsen", "Cusqueña", "Bolívar", "Elite", "Field", "Florida", "Primor"]
+SIZES = ["250ml", "500ml", "1L", "1.5L", "2L", "3L", "1kg", "5kg", "x6", "x12"]
+
+DEFAULT_CENTER = (-8.0783, -79.1180)  # Huanchaco
+
+
+def generate_fixtures(n_bodegas: int = 100, n_products: int = 500, per_bodega: int = 50,
+                      center: tuple = DEFAULT_CENTER, spread_km: float = 3.0, seed: int = 42,
+                      centers: list = None) -> dict:
+    """
+    Genera un barrio sintético: un bodeguero por bodega, horarios de lunes a domingo,
+    un catálogo de variantes (marca x tamaño x atributos) e inventario aleatorio.
+    Con `centers` ([(lat, lon)], varias ciudades) las bodegas se reparten por turnos entre
+    los centros y el catálogo es el mismo para todas.
+    """
+    centers = centers or [center]
+    rng = random.Random(seed)
+    per_bodega = min(per_bodega, n_products)
+    fixtures = {"users": [], "bodegas": [], "schedules": [], "products": [], "inventory": []}
+
+    products = []
+    for i in range(n_products):
+        name, category, unit, base_price, synonyms = BASE_PRODUCTS[i % len(BASE_PRODUCTS)]
+        brand = rng.choice(BRANDS)
+        size = rng.choice(SIZES)
+        attributes = {"marca": brand, "tamaño": size}
+        if category == "Bebidas":
+            attributes["gas"] = rng.random() < 0.5
+        if rng.random() < 0.2:
+            attributes["light"] = True
+        products.append((f"p{i}", base_price))
+        fixtures["products"].append({
+            "ref": f"p{i}",
+            "name": f"{name} {brand} {size}",
+            "category": category,
+            "synonyms": synonyms,
+            "default_unit": unit,
+            "attributes": attributes,
+        })
+
+    # ~0.009 grados por km en latitud; suficiente para datos de prueba
+    spread_deg = spread_km * 0.009
+    for b in range(n_bodegas):
+        user_ref, bodega_ref = f"u{b}", f"b{b}"
+        fixtures["users"].append({
+            "ref": user_ref,
+            "dni": f"{70000000 + b}",
+            "full_name": f"BODEGUERO SINTETICO {b}",
+            "phone_number": f"9{b:08d}",
+            "password_hash": "123",
+            "role": "BODEGUERO",
+            "is_verified": True,
+        })
+        fixtures["bodegas"].append({
+            "ref": bodega_ref,
+            "owner": user_ref,
+            "name": f"Bodega Sintética {b}",
+            "address": f"Calle {rng.randint(1, 300)} #{rng.randint(100, 999)}",
+            "latitude": round(centers[b % len(centers)][0] + rng.uniform(-spread_deg, spread_deg), 8),
+            "longitude": round(centers[b % len(centers)][1] + rng.uniform(-spread_deg, spread_deg), 8),
+            "manual_override": rng.choice(["OPEN", "OPEN", "OPEN", None, "CLOSED"]),
+            "rating": round(rng.uniform(3.5, 5.0), 1),
+        })
+        for day in range(7):
+            fixtures["schedules"].append({
+                "bodega": bodega_ref, "day_of_week": day,
+                "open_time": "07:00", "close_time": "22:00",
+            })
+        for ref, base_price in rng.sample(products, per_bodega):
+            fixtures["inventory"].append({
+                "bodega": bodega_ref,
+                "product": ref,
+                "price": round(base_price * rng.uniform(0.85, 1.25), 2),
+                "stock_quantity": 0 if rng.random() < 0.15 else rng.randint(1, 60),
+            })
+
+    return fixtures
@@ -0,0 +1,33 @@
+from sqlalchemy import text
+from app.db.partitions import sync_regions
+
+# Migraciones idempotentes que create_all no cubre (columnas nuevas en tablas existentes,
+# índices especiales). Se corren al iniciar la app, después de create_all.
+MIGRATIONS = [
+    # Versión de fila para concurrencia optimista en store_inventory (secuencia global)
+    "CREATE SEQUENCE IF NOT EXISTS catalog_version_seq",
+    "ALTER TABLE store_inventory ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT nextval('catalog_version_seq')",
+    # El índice de precios recalcula por producto: sin esto cada refresh recorre todo el inventario
+    "CREATE INDEX IF NOT EXISTS ix_store_inventory_product_id ON store_inventory (product_id)",
+    # Filtros de atributos ("sin gas") evaluados en SQL con @>
+    "CREATE INDEX IF NOT EXISTS ix_master_products_attributes ON master_products USING gin (attributes jsonb_path_ops)",
+    # Bundles por celda de /catalog: versión en bodegas y productos (misma secuencia) y
+    # búsqueda de las bodegas de una celda por rango de coordenadas
+    "ALTER TABLE bodegas ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT nextval('catalog_version_seq')",
+    "ALTER TABLE master_products ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT nextval('catalog_version_seq')",
+    "CREATE INDEX IF NOT EXISTS ix_bodegas_lat_lon ON bodegas (latitude, longitude)",
+    # Voz: intentos por trabajo (tope de reintentos si Gemini sigue saturado)
+    "ALTER TABLE voice_jobs ADD COLUMN IF NOT EXISTS attempts INTEGER NOT NULL DEFAULT 0",
+]
+
+
+def run_migrations(engine):
+    with engine.begin() as conn:
+        for statement in MIGRATIONS:
+            conn.execute(text(statement))
+        # Regiones: dependen de settings.REGIONS, no son un SQL fijo
+        result = sync_regions(conn)
+        if result["created"] or result["retagged"]:
+            print(f"🗺️ Regiones: particiones nuevas {result['created']}, bodegas re-etiquetadas {result['retagged']}")
+        if not result["partitioned"]:
+            print("⚠️ store_inventory no está particionada por región: corre python migrate_regions.py")
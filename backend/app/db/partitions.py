@@ -0,0 +1,114 @@
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.regions import configured_regions
+
+# Particiones por región de store_inventory (PARTITION BY LIST (region)).
+#   - Una partición por región de settings.REGIONS (store_inventory_<region>) y una DEFAULT
+#     (store_inventory_<REGION_DEFAULT>) para las bodegas fuera de todas las cajas.
+#   - La región de cada fila de inventario es la de su bodega: llave foránea compuesta
+#     (bodega_id, region) -> bodegas (id, region) con ON UPDATE CASCADE, así re-etiquetar una
+#     bodega mueve su inventario de partición en la misma sentencia.
+# Las usan create_all (after_create de la tabla), run_migrations y migrate_regions.py.
+
+# Lock de sync_regions: con varios workers arrancando a la vez, uno sincroniza y los demás
+# esperan y encuentran todo hecho (sin carreras al crear particiones)
+_SYNC_LOCK_ID = 4801
+
+
+def partition_name(region: str) -> str:
+    return f"store_inventory_{region}"
+
+
+def region_case_sql(lat_col: str = "latitude", lon_col: str = "longitude") -> str:
+    """CASE de SQL equivalente a regions.region_of (para backfills y re-etiquetado)."""
+    whens = [
+        f"WHEN {lat_col} BETWEEN {lat_min!r} AND {lat_max!r} AND {lon_col} BETWEEN {lon_min!r} AND {lon_max!r} THEN '{name}'"
+        for name, (lat_min, lat_max, lon_min, lon_max) in configured_regions().items()
+    ]
+    return f"CASE {' '.join(whens)} ELSE '{settings.REGION_DEFAULT}' END"
+
+
+def is_partitioned(conn, table: str = "store_inventory") -> bool:
+    return conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table)"),
+        {"table": table},
+    ).scalar()
+
+
+def create_region_partitions(conn) -> list:
+    """Crea las particiones que falten (idempotente). Devuelve los nombres creados."""
+    existing = set(conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'store_inventory'"
+    )).scalars())
+    created = []
+    # La DEFAULT primero: al crear una región nueva PostgreSQL verifica que la DEFAULT no
+    # tenga filas de esa región (no las tiene: se etiquetan después, al re-etiquetar)
+    default_name = partition_name(settings.REGION_DEFAULT)
+    if default_name not in existing:
+        conn.execute(text(f"CREATE TABLE {default_name} PARTITION OF store_inventory DEFAULT"))
+        created.append(default_name)
+    for region in configured_regions():
+        name = partition_name(region)
+        if name not in existing:
+            conn.execute(text(f"CREATE TABLE {name} PARTITION OF store_inventory FOR VALUES IN ('{region}')"))
+            created.append(name)
+    return created
+
+
+def _column_nullable(conn, table: str, column: str):
+    """True/False según la columna acepte NULL, o None si no existe."""
+    nullable = conn.execute(
+        text("SELECT is_nullable FROM information_schema.columns "
+             "WHERE table_schema = current_schema() AND table_name = :table AND column_name = :column"),
+        {"table": table, "column": column},
+    ).scalar()
+    return None if nullable is None else nullable == "YES"
+
+
+def sync_regions(conn) -> dict:
+    """
+    Deja la BD de acuerdo con settings.REGIONS (se corre al iniciar, después de las migraciones):
+    columna region en bodegas, particiones que falten y bodegas re-etiquetadas si cambió el mapa.
+    Si store_inventory todavía no está particionada (BD anterior) se mantiene su columna region
+    al día; la conversión la hace migrate_regions.py.
+    Con la BD ya al día no toma locks de tabla: los ALTER solo corren si falta algo.
+    """
+    conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": _SYNC_LOCK_ID})
+
+    if _column_nullable(conn, "bodegas", "region") is None:
+        conn.execute(text("ALTER TABLE bodegas ADD COLUMN region VARCHAR"))
+    if conn.execute(text("SELECT to_regclass('ux_bodegas_id_region')")).scalar() is None:
+        conn.execute(text("CREATE UNIQUE INDEX ux_bodegas_id_region ON bodegas (id, region)"))
+
+    partitioned = is_partitioned(conn)
+    created = create_region_partitions(conn) if partitioned else []
+
+    # Solo toca las bodegas cuya región cambió (o que no tenían); con la llave compuesta su
+    # inventario cambia de partición en la misma sentencia
+    case = region_case_sql()
+    retagged = conn.execute(text(f"UPDATE bodegas SET region = {case} WHERE region IS DISTINCT FROM {case}")).rowcount
+    # SET NOT NULL toma ACCESS EXCLUSIVE y recorre la tabla: solo la primera vez
+    if _column_nullable(conn, "bodegas", "region"):
+        conn.execute(text("ALTER TABLE bodegas ALTER COLUMN region SET NOT NULL"))
+
+    if not partitioned:
+        if _column_nullable(conn, "store_inventory", "region") is None:
+            conn.execute(text("ALTER TABLE store_inventory ADD COLUMN region VARCHAR"))
+        conn.execute(text(
+            "UPDATE store_inventory si SET region = b.region FROM bodegas b "
+            "WHERE b.id = si.bodega_id AND si.region IS DISTINCT FROM b.region"
+        ))
+        if _column_nullable(conn, "store_inventory", "region"):
+            conn.execute(text("ALTER TABLE store_inventory ALTER COLUMN region SET NOT NULL"))
+
+    return {"partitioned": partitioned, "created": created, "retagged": retagged}
+
+
+def partition_counts(conn) -> list:
+    """[(partición, filas estimadas por pg_class)] de store_inventory."""
+    return conn.execute(text(
+        "SELECT c.relname, greatest(c.reltuples, 0)::bigint FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = 'store_inventory' ORDER BY c.relname"
+    )).all()
@@ -1,16 +1,43 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware  # <--- IMPORTANTE: Importar Middleware
+from fastapi.middleware.gzip import GZipMiddleware
 from app.core.config import settings
 from app.api.api import api_router
 from app.db.base import Base
 from app.db.session import engine
+from app.db.migrations import run_migrations
+from app.core.metrics import LatencyMiddleware
+from app.core.profiling import ProfilingMiddleware, profiler
+from app.services.voice_jobs import voice_jobs
+from app.services.change_feed import change_feed
+from app.services.demand_log import demand_log
+from app.services.suggest_index import suggest_index
+from app.services.term_planner import term_planner
 
 # Crear tablas automáticamente al iniciar (Solo para MVP)
 Base.metadata.create_all(bind=engine)
+# Columnas/índices nuevos sobre tablas que ya existían
+run_migrations(engine)
+
+# Tareas en segundo plano que viven lo mismo que el proceso
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    change_feed.start()
+    await voice_jobs.start()
+    await demand_log.start()
+    # Índices en memoria: se arman en un hilo, el primer request no los espera
+    suggest_index.start_rebuild()
+    term_planner.start_rebuild()
+    yield
+    await demand_log.stop()
+    await voice_jobs.stop()
+    change_feed.stop()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 # --- CONFIGURACIÓN DE CORS (SOLUCIÓN AL ERROR) ---
@@ -28,6 +55,17 @@ app.add_middleware(
 )
 # ------------------------------------------------
 
+# Compresión opcional: las búsquedas con muchos productos bajan bastante con gzip
+if settings.GZIP_MIN_SIZE > 0:
+    app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MIN_SIZE)
+
+# Perfilado bajo demanda (X-Profile-Token o sorteo); si no está configurado no se instala
+if profiler.enabled:
+    app.add_middleware(ProfilingMiddleware)
+
+# Latencia por endpoint (se ve en /admin/metrics)
+app.add_middleware(LatencyMiddleware)
+
 # Conectar rutas
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Numeric, TIME, TIMESTAMP, text
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, ForeignKey, ForeignKeyConstraint, Numeric, TIME, TIMESTAMP, Sequence, Index, text, event
 from sqlalchemy.dialects.postgresql import UUID, ARRAY, JSONB
 from sqlalchemy.orm import relationship
 from app.db.base import Base
+from app.db.partitions import create_region_partitions
+from app.core.regions import region_of
 import uuid
 
+# Secuencia global de versiones del catálogo: cada cambio de una fila de inventario, bodega
+# o producto toma el siguiente número (concurrencia optimista y sincronización por deltas)
+catalog_version_seq = Sequence("catalog_version_seq", metadata=Base.metadata)
+
 # 1. USUARIOS (Ahora blindada 🛡️)
 class User(Base):
     __tablename__ = "users"
@@ -31,6 +37,12 @@ class User(Base):
     bodegas = relationship("Bodega", back_populates="owner")
 
 
+def _bodega_region(context):
+    """Región por defecto de una bodega nueva, según sus coordenadas."""
+    params = context.get_current_parameters()
+    return region_of(params["latitude"], params["longitude"])
+
+
 # 2. BODEGAS (Sin cambios mayores, solo asegurando tipos)
 class Bodega(Base):
     __tablename__ = "bodegas"
@@ -49,6 +61,17 @@ class Bodega(Base):
     # Estado: 'OPEN', 'CLOSED', o NULL (Auto)
     manual_override = Column(String, nullable=True) 
     rating = Column(Numeric(2, 1), default=5.0)
+    # Se renueva cuando cambia algo que ven los clientes (estado, datos); la usa /catalog
+    version = Column(BigInteger, nullable=False, server_default=catalog_version_seq.next_value())
+    # Ciudad (settings.REGIONS); decide la partición de su inventario
+    region = Column(String, nullable=False, default=_bodega_region)
+
+    # Bodegas de una celda de /catalog por rango de coordenadas.
+    # (id, region) único para la llave foránea compuesta de store_inventory
+    __table_args__ = (
+        Index("ix_bodegas_lat_lon", "latitude", "longitude"),
+        Index("ux_bodegas_id_region", "id", "region", unique=True),
+    )
 
     # Relaciones
     owner = relationship("User", back_populates="bodegas")
@@ -81,18 +104,102 @@ class MasterProduct(Base):
     default_unit = Column(String) # "UND", "KG", "LT"
     # NUEVO CAMPO: Aquí se guardará {"marca": "Cielo", "gas": false}
     attributes = Column(JSONB, default={})
+    version = Column(BigInteger, nullable=False, server_default=catalog_version_seq.next_value())
+
+    # GIN para filtrar variantes en SQL con attributes @> {"gas": false}
+    __table_args__ = (
+        Index("ix_master_products_attributes", "attributes", postgresql_using="gin", postgresql_ops={"attributes": "jsonb_path_ops"}),
+    )
 
 
-# 5. INVENTARIO
+# 5. INVENTARIO (particionado por región: una partición por ciudad, ver app/db/partitions.py)
 class StoreInventory(Base):
     __tablename__ = "store_inventory"
 
-    bodega_id = Column(UUID(as_uuid=True), ForeignKey("bodegas.id"), primary_key=True)
-    product_id = Column(Integer, ForeignKey("master_products.id"), primary_key=True)
+    bodega_id = Column(UUID(as_uuid=True), primary_key=True)
+    product_id = Column(Integer, ForeignKey("master_products.id"), primary_key=True, index=True)
+    # La de su bodega (llave foránea compuesta); la llave de partición tiene que estar en la PK
+    region = Column(String, primary_key=True)
     
     price = Column(Numeric(10, 2), nullable=False)
     stock_quantity = Column(Numeric(10, 2), default=0)
     is_available = Column(Boolean, default=True)
+    # Se renueva en cada escritura; el cliente la manda para no pisar cambios ajenos
+    version = Column(BigInteger, nullable=False, server_default=catalog_version_seq.next_value())
 
     bodega = relationship("Bodega", back_populates="inventory")
-    product = relationship("MasterProduct")
\ No newline at end of file
+    product = relationship("MasterProduct")
+
+    __table_args__ = (
+        # Re-etiquetar una bodega mueve su inventario de partición (ON UPDATE CASCADE)
+        ForeignKeyConstraint(["bodega_id", "region"], ["bodegas.id", "bodegas.region"], onupdate="CASCADE"),
+        {"postgresql_partition_by": "LIST (region)"},
+    )
+
+
+# Las particiones se crean junto con la tabla (create_all); run_migrations agrega las que falten
+event.listen(StoreInventory.__table__, "after_create", lambda target, connection, **kw: create_region_partitions(connection))
+
+
+# 6. SESIONES DE CONVERSACIÓN (historial del chat guardado en el servidor)
+class ConversationSession(Base):
+    __tablename__ = "conversation_sessions"
+
+    session_id = Column(String(64), primary_key=True)
+    summary = Column(String, default="")  # Resumen corto de lo que ya salió del historial
+    messages = Column(JSONB, default=[])  # Últimos mensajes [{"role": ..., "content": ...}]
+    updated_at = Column(TIMESTAMP, nullable=False, index=True)  # Para el TTL
+
+
+# 7. ÍNDICE DE PRECIOS (las N ofertas más baratas con stock, por producto y celda geográfica)
+# Lo mantiene la app (PriceIndexRepository) cada vez que cambia el inventario.
+class PriceIndexEntry(Base):
+    __tablename__ = "price_index"
+
+    product_id = Column(Integer, ForeignKey("master_products.id", ondelete="CASCADE"), primary_key=True)
+    tile_lat = Column(Integer, primary_key=True)  # floor(latitude / PRICE_INDEX_TILE_DEG)
+    tile_lon = Column(Integer, primary_key=True)
+    bodega_id = Column(UUID(as_uuid=True), ForeignKey("bodegas.id", ondelete="CASCADE"), primary_key=True)
+
+    price = Column(Numeric(10, 2), nullable=False)
+    stock_quantity = Column(Numeric(10, 2))
+
+
+# 8. TRABAJOS DE VOZ (actualización de stock por audio, procesados en segundo plano)
+class VoiceJob(Base):
+    __tablename__ = "voice_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    bodega_id = Column(UUID(as_uuid=True), ForeignKey("bodegas.id"), nullable=False, index=True)
+
+    status = Column(String, nullable=False, default="PENDING", index=True)  # PENDING, PROCESSING, DONE, FAILED
+    audio_path = Column(String, nullable=True)  # Archivo en disco mientras no se procese
+    content_type = Column(String, nullable=True)
+    result = Column(JSONB, nullable=True)  # {"applied": [...], "unmatched": [...]}
+    error = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, server_default=text("0"))  # Veces que se tomó para procesar
+
+    created_at = Column(TIMESTAMP, server_default=text("now()"))
+    updated_at = Column(TIMESTAMP, server_default=text("now()"), onupdate=text("now()"))
+
+
+# 9. DEMANDA (qué buscaron los vecinos y qué no encontraron). Solo se inserta, en lotes,
+# desde DemandLog; la leen los reportes de "demanda insatisfecha" para los bodegueros.
+class DemandEvent(Base):
+    __tablename__ = "demand_events"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    created_at = Column(TIMESTAMP, nullable=False, server_default=text("now()"))
+    tile_lat = Column(Integer, nullable=False)  # Celda del vecino (geo.tile_of)
+    tile_lon = Column(Integer, nullable=False)
+
+    intents = Column(JSONB, nullable=False)        # [{"product_name", "quantity", "must_contain", ...}]
+    found = Column(ARRAY(String), nullable=False)   # Intents con al menos una bodega (normalizados)
+    missing = Column(ARRAY(String), nullable=False) # Intents que ninguna bodega del radio tenía
+    bodegas_found = Column(Integer, nullable=False, default=0)
+    degraded = Column(Boolean, nullable=False, default=False)
+
+    # "Demanda cerca de mi bodega": por celdas vecinas y ventana de días
+    __table_args__ = (
+        Index("ix_demand_events_tile_created", "tile_lat", "tile_lon", "created_at"),
+    )
@@ -0,0 +1,123 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update, values, column, Integer, Numeric
+from app.models.tables import StoreInventory, MasterProduct, Bodega, catalog_version_seq
+from app.repositories.price_index_repo import PriceIndexRepository
+
+class BodegueroRepository:
+    """
+    Consultas del panel del bodeguero, pensadas para un solo viaje a la BD por request
+    (el bodeguero trabaja desde el celular, cada round-trip se siente).
+    El bodega_id ya viene resuelto (token o cache), así que no buscamos usuario ni bodega.
+    """
+
+    @staticmethod
+    def bodega_region(bodega_id):
+        """
+        Región (partición de store_inventory) de la bodega como subconsulta: va en el mismo
+        statement y PostgreSQL descarta las demás particiones al ejecutar.
+        """
+        return select(Bodega.region).where(Bodega.id == bodega_id).scalar_subquery()
+
+    @staticmethod
+    def get_inventory_for_bodega(db: Session, bodega_id):
+        """Inventario de la bodega con el nombre del producto, en una sola consulta."""
+        stmt = select(
+            MasterProduct.id.label("product_id"),
+            MasterProduct.name,
+            StoreInventory.price,
+            StoreInventory.stock_quantity,
+            StoreInventory.version,
+        ).join(MasterProduct, MasterProduct.id == StoreInventory.product_id)\
+            .where(
+                StoreInventory.region == BodegueroRepository.bodega_region(bodega_id),
+                StoreInventory.bodega_id == bodega_id,
+            )
+        return db.execute(stmt).all()
+
+    @staticmethod
+    def set_stock(db: Session, bodega_id, product_id: int, new_stock, expected_version: int = None):
+        """
+        UPDATE ... RETURNING en un solo statement: escribe y devuelve el nuevo stock y versión
+        (y refresca el índice de precios de ese producto en la zona).
+        Con expected_version solo escribe si nadie cambió la fila desde que el cliente la leyó.
+        Devuelve la fila (stock_quantity, version) o None si no se actualizó nada.
+        """
+        stmt = update(StoreInventory)\
+            .where(
+                StoreInventory.region == BodegueroRepository.bodega_region(bodega_id),
+                StoreInventory.bodega_id == bodega_id,
+                StoreInventory.product_id == product_id,
+            )\
+            .values(stock_quantity=new_stock, version=catalog_version_seq.next_value())\
+            .returning(StoreInventory.stock_quantity, StoreInventory.version)
+        if expected_version is not None:
+            stmt = stmt.where(StoreInventory.version == expected_version)
+
+        row = db.execute(stmt).first()
+        if row is not None:
+            # El índice de precios cambia en la misma transacción que el stock
+            PriceIndexRepository.refresh_for_bodega(db, bodega_id, [product_id])
+        db.commit()
+        return row
+
+    @staticmethod
+    def inventory_item_exists(db: Session, bodega_id, product_id: int) -> bool:
+        """Solo para el camino raro de conflicto: ¿la fila existe (y cambió) o no existe?"""
+        stmt = select(StoreInventory.product_id)\
+            .where(
+                StoreInventory.region == BodegueroRepository.bodega_region(bodega_id),
+                StoreInventory.bodega_id == bodega_id,
+                StoreInventory.product_id == product_id,
+            )
+        return db.execute(stmt).first() is not None
+
+    @staticmethod
+    def set_stock_many(db: Session, bodega_id, changes: dict):
+        """
+        Varios cambios de stock {product_id: nuevo_stock} en un solo UPDATE ... FROM (VALUES ...)
+        con RETURNING, más el refresh del índice de precios, en una sola transacción.
+        Devuelve las filas (product_id, stock_quantity, version) que sí existían.
+        """
+        if not changes:
+            return []
+        new_values = values(
+            column("product_id", Integer), column("stock", Numeric(10, 2)), name="new_values"
+        ).data(list(changes.items()))
+        stmt = update(StoreInventory)\
+            .where(
+                StoreInventory.region == BodegueroRepository.bodega_region(bodega_id),
+                StoreInventory.bodega_id == bodega_id,
+                StoreInventory.product_id == new_values.c.product_id,
+            )\
+            .values(stock_quantity=new_values.c.stock, version=catalog_version_seq.next_value())\
+            .returning(StoreInventory.product_id, StoreInventory.stock_quantity, StoreInventory.version)
+
+        rows = db.execute(stmt).all()
+        if rows:
+            PriceIndexRepository.refresh_for_bodega(db, bodega_id, [row.product_id for row in rows])
+        db.commit()
+        return rows
+
+    @staticmethod
+    def set_status(db: Session, bodega_id, manual_override):
+        """
+        Abre/cierra la bodega ('OPEN', 'CLOSED' o None = automático) y renueva su versión.
+        El índice de precios solo guarda bodegas abiertas: se recalculan sus productos en la zona.
+        Devuelve la fila (manual_override, version).
+        """
+        row = db.execute(
+            update(Bodega)
+            .where(Bodega.id == bodega_id)
+            .values(manual_override=manual_override, version=catalog_version_seq.next_value())
+            .returning(Bodega.manual_override, Bodega.version)
+        ).first()
+        if row is not None:
+            product_ids = db.execute(
+                select(StoreInventory.product_id).where(
+                    StoreInventory.region == BodegueroRepository.bodega_region(bodega_id),
+                    StoreInventory.bodega_id == bodega_id,
+                )
+            ).scalars().all()
+            PriceIndexRepository.refresh_for_bodega(db, bodega_id, product_ids)
+        db.commit()
+        return row
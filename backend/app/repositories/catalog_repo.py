@@ -0,0 +1,109 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, and_, text
+from app.models.tables import StoreInventory, MasterProduct, Bodega
+from app.core.regions import regions_in_box
+
+# Columnas que viajan en los bundles de /catalog, en este orden (el cliente arma sus
+# tablas con "fields" + "rows", sin repetir los nombres en cada fila)
+BODEGA_FIELDS = ["id", "name", "address", "latitude", "longitude", "status", "rating", "version"]
+PRODUCT_FIELDS = ["id", "name", "category", "synonyms", "attributes", "default_unit", "image_url", "version"]
+INVENTORY_FIELDS = ["bodega_id", "product_id", "price", "stock", "is_available", "version"]
+
+
+class CatalogRepository:
+    """Lecturas por celda (tile_lat, tile_lon) de la grilla de CATALOG_TILE_DEG grados."""
+
+    @staticmethod
+    def _in_tile(tile: tuple, deg: float):
+        """
+        Bodegas de la celda como rango semiabierto [borde, borde siguiente): usa ix_bodegas_lat_lon
+        y las celdas vecinas comparten el mismo borde, así cada bodega cae en una sola.
+        """
+        tile_lat, tile_lon = tile
+        return (
+            Bodega.latitude >= tile_lat * deg, Bodega.latitude < (tile_lat + 1) * deg,
+            Bodega.longitude >= tile_lon * deg, Bodega.longitude < (tile_lon + 1) * deg,
+        )
+
+    @staticmethod
+    def _tile_regions(tile: tuple, deg: float) -> list:
+        """Particiones de store_inventory que pueden tener inventario de la celda."""
+        tile_lat, tile_lon = tile
+        return regions_in_box(tile_lat * deg, (tile_lat + 1) * deg, tile_lon * deg, (tile_lon + 1) * deg)
+
+    @staticmethod
+    def tile_version(db: Session, tile: tuple, deg: float) -> int:
+        """Mayor versión entre las bodegas de la celda, su inventario y sus productos (0 si está vacía)."""
+        version = db.execute(
+            select(func.max(func.greatest(Bodega.version, StoreInventory.version, MasterProduct.version)))
+            .select_from(Bodega)
+            .outerjoin(StoreInventory, and_(
+                StoreInventory.bodega_id == Bodega.id,
+                StoreInventory.region.in_(CatalogRepository._tile_regions(tile, deg)),
+            ))
+            .outerjoin(MasterProduct, MasterProduct.id == StoreInventory.product_id)
+            .where(*CatalogRepository._in_tile(tile, deg))
+        ).scalar()
+        return version or 0
+
+    @staticmethod
+    def version_clock(db: Session) -> tuple:
+        """
+        (último valor de catalog_version_seq, xmin, xmax del snapshot actual). Cuando el xmin de
+        una lectura posterior pasa este xmax, terminaron todas las transacciones que podían tener
+        una versión menor o igual a ese valor sin haber hecho commit todavía.
+        """
+        return tuple(db.execute(text(
+            "SELECT last_value, pg_snapshot_xmin(s)::text::bigint, pg_snapshot_xmax(s)::text::bigint "
+            "FROM catalog_version_seq, pg_current_snapshot() AS s"
+        )).one())
+
+    @staticmethod
+    def tile_rows(db: Session, tile: tuple, deg: float, since: int = 0) -> dict:
+        """
+        Filas de la celda con versión mayor a `since` (0 = todo), como listas en el orden de *_FIELDS.
+        Los productos van si cambiaron o si algún inventario que viaja los referencia
+        (el cliente podría no tenerlos si el producto es nuevo en la celda).
+        """
+        in_tile = CatalogRepository._in_tile(tile, deg)
+
+        bodega_ids = select(Bodega.id).where(*in_tile)
+        bodegas = db.execute(
+            select(Bodega.id, Bodega.name, Bodega.address, Bodega.latitude, Bodega.longitude,
+                   Bodega.manual_override, Bodega.rating, Bodega.version)
+            .where(*in_tile, Bodega.version > since)
+            .order_by(Bodega.id)
+        ).all()
+
+        inventory = db.execute(
+            select(StoreInventory.bodega_id, StoreInventory.product_id, StoreInventory.price,
+                   StoreInventory.stock_quantity, StoreInventory.is_available, StoreInventory.version,
+                   MasterProduct.version)
+            .join(MasterProduct, MasterProduct.id == StoreInventory.product_id)
+            .where(StoreInventory.region.in_(CatalogRepository._tile_regions(tile, deg)))
+            .where(StoreInventory.bodega_id.in_(bodega_ids))
+            .where((StoreInventory.version > since) | (MasterProduct.version > since))
+            .order_by(StoreInventory.bodega_id, StoreInventory.product_id)
+        ).all()
+
+        product_ids = sorted({row[1] for row in inventory})
+        products = db.execute(
+            select(MasterProduct.id, MasterProduct.name, MasterProduct.category, MasterProduct.synonyms,
+                   MasterProduct.attributes, MasterProduct.default_unit, MasterProduct.image_url, MasterProduct.version)
+            .where(MasterProduct.id.in_(product_ids))
+            .order_by(MasterProduct.id)
+        ).all() if product_ids else []
+
+        return {
+            "bodegas": [
+                [str(b_id), name, address, float(lat), float(lon), status or "AUTO",
+                 float(rating) if rating is not None else None, version]
+                for b_id, name, address, lat, lon, status, rating, version in bodegas
+            ],
+            "products": [list(row) for row in products],
+            "inventory": [
+                [str(b_id), p_id, float(price), float(stock) if stock is not None else 0.0,
+                 is_available is not False, version]
+                for b_id, p_id, price, stock, is_available, version, _ in inventory
+            ],
+        }
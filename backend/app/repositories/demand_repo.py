@@ -0,0 +1,37 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, func, tuple_, insert
+from datetime import timedelta
+from app.core.geo import tiles_around
+from app.models.tables import DemandEvent
+
+
+class DemandRepository:
+
+    @staticmethod
+    def insert_batch(db: Session, rows: list):
+        """Un solo INSERT multi-fila para todo el lote (append-only, sin RETURNING)."""
+        if rows:
+            db.execute(insert(DemandEvent), rows)
+            db.commit()
+
+    @staticmethod
+    def top_unmet_near(db: Session, lat: float, lon: float, radius_km: float = 1.5, days: int = 7, limit: int = 10):
+        """
+        Lo que más buscaron los vecinos de la zona sin encontrarlo en ninguna bodega cercana.
+        Devuelve filas (term, searches, last_seen) ordenadas por búsquedas.
+        """
+        tiles = tiles_around(lat, lon, radius_km)
+        term = func.unnest(DemandEvent.missing).label("term")
+        missing_terms = select(term, DemandEvent.created_at)\
+            .where(
+                tuple_(DemandEvent.tile_lat, DemandEvent.tile_lon).in_(tiles),
+                DemandEvent.created_at >= func.now() - timedelta(days=days),
+            ).subquery()
+        stmt = select(
+            missing_terms.c.term,
+            func.count().label("searches"),
+            func.max(missing_terms.c.created_at).label("last_seen"),
+        ).group_by(missing_terms.c.term)\
+            .order_by(func.count().desc(), missing_terms.c.term)\
+            .limit(limit)
+        return db.execute(stmt).all()
@@ -1,35 +1,131 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, cast, String, func
+from sqlalchemy import select, and_, or_, cast, String, func
 from app.models.tables import StoreInventory, MasterProduct, Bodega
+from app.core.regions import regions_in_box
 from math import radians, cos, sin, asin, sqrt
+from typing import NamedTuple, Optional
+
+# Filas livianas para el camino de búsqueda: solo las columnas que se usan, sin pasar por
+# el identity map del ORM. Mantienen los nombres de atributos de los modelos (inv.price,
+# prod.name, bodega.latitude), así el resto del código no cambia.
+
+class InventoryRow(NamedTuple):
+    price: float
+    stock_quantity: Optional[float]
+
+class ProductRow(NamedTuple):
+    id: int
+    name: str
+    category: Optional[str]
+    synonyms: Optional[list]
+    attributes: Optional[dict]
+    default_unit: Optional[str]
+
+class BodegaRow(NamedTuple):
+    id: object
+    name: str
+    latitude: float
+    longitude: float
 
 class InventoryRepository:
 
     @staticmethod
-    def search_products_smart(db: Session, keywords: list[str], user_lat: float, user_lon: float, max_dist_km: float = 1.5): # <--- CAMBIO AQUÍ: 1.5
+    def search_products_smart(db: Session, keywords: list[str], user_lat: float, user_lon: float, max_dist_km: float = 1.5, attribute_filters: list = None, term_plans: list = None, regions: list = None): # <--- CAMBIO AQUÍ: 1.5
         """
         Busca productos por coincidencia en nombre, categoría, sinónimos O ATRIBUTOS.
         Filtra estrictamente en un radio de 1.5 km por defecto.
+        attribute_filters (opcional, uno por keyword): {"contains": [dict], "not_contains": [dict],
+        "contains_or_text": [[dict, término]]} se aplican en SQL con `attributes @> ...` (índice GIN)
+        solo a las filas de ese keyword; contains_or_text acepta también el término en el texto.
+        term_plans (opcional, uno por keyword, None = ILIKE): candidatos del planificador de términos.
+        regions (opcional): particiones de inventario a leer; por defecto las que toca el radio.
+        Devuelve [(InventoryRow, ProductRow, BodegaRow)]; producto y bodega se comparten entre filas.
         """
         if not keywords:
             return []
 
-        search_terms = set()
-        for k in keywords:
-            search_terms.add(k) 
-            for word in k.split():
-                if len(word) > 2: 
-                    search_terms.add(word)
-        
-        # Consulta base: Bodegas abiertas o en automático (NULL)
-        query = db.query(StoreInventory, MasterProduct, Bodega)\
-            .join(MasterProduct, StoreInventory.product_id == MasterProduct.id)\
+        # Consulta base: Bodegas abiertas o en automático (NULL). Solo columnas, sin entidades.
+        query = select(
+            StoreInventory.price, StoreInventory.stock_quantity,
+            MasterProduct.id, MasterProduct.name, MasterProduct.category,
+            MasterProduct.synonyms, MasterProduct.attributes, MasterProduct.default_unit,
+            Bodega.id, Bodega.name, Bodega.latitude, Bodega.longitude,
+        ).join(MasterProduct, StoreInventory.product_id == MasterProduct.id)\
             .join(Bodega, StoreInventory.bodega_id == Bodega.id)\
-            .filter(or_(
+            .where(or_(
                 Bodega.manual_override == 'OPEN',
                 Bodega.manual_override.is_(None)
+            ))\
+            .where(StoreInventory.region.in_(
+                regions if regions is not None else InventoryRepository.regions_near(user_lat, user_lon, max_dist_km)
             ))
 
+        # Una condición por keyword: (coincide el texto) AND (cumple sus atributos)
+        intent_conditions = [
+            InventoryRepository._keyword_condition(
+                k,
+                attribute_filters[i] if attribute_filters else None,
+                term_plans[i] if term_plans else None,
+            )
+            for i, k in enumerate(keywords)
+        ]
+
+        query = query.where(or_(*intent_conditions))
+
+        final_results = []
+        products = {}
+        bodegas = {}  # bodega_id -> BodegaRow, o None si queda fuera del radio
+        for (price, stock, prod_id, prod_name, category, synonyms, attributes, unit,
+             bodega_id, bodega_name, lat, lon) in db.execute(query):
+            if bodega_id in bodegas:
+                bodega = bodegas[bodega_id]
+            else:
+                # Filtro estricto de distancia, una vez por bodega
+                lat, lon = float(lat), float(lon)
+                dist = InventoryRepository.haversine(user_lon, user_lat, lon, lat)
+                bodega = bodegas[bodega_id] = BodegaRow(bodega_id, bodega_name, lat, lon) if dist <= max_dist_km else None
+            if bodega is None:
+                continue
+
+            prod = products.get(prod_id)
+            if prod is None:
+                prod = products[prod_id] = ProductRow(prod_id, prod_name, category, synonyms, attributes, unit)
+            inv = InventoryRow(float(price), float(stock) if stock is not None else None)
+            final_results.append((inv, prod, bodega))
+
+        return final_results
+
+    @staticmethod
+    def _keyword_condition(keyword: str, filters: dict = None, plan=None):
+        """
+        (coincide el texto del keyword o alguna de sus palabras) AND (cumple sus atributos).
+        Con plan (TermPlan del planificador de términos) el texto se resuelve por product_id y
+        el ILIKE queda solo para productos más nuevos que el índice.
+        """
+        text_condition = InventoryRepository._text_condition(keyword)
+        if plan is not None:
+            text_condition = or_(
+                MasterProduct.id.in_(plan.product_ids),
+                and_(MasterProduct.version > plan.watermark, text_condition),
+            )
+
+        if filters:
+            predicates = [MasterProduct.attributes.contains(p) for p in filters.get("contains", [])]
+            predicates += [~MasterProduct.attributes.contains(p) for p in filters.get("not_contains", [])]
+            predicates += [
+                or_(MasterProduct.attributes.contains(p), InventoryRepository._text_condition(term))
+                for p, term in filters.get("contains_or_text", [])
+            ]
+            return and_(text_condition, *predicates)
+        return text_condition
+
+    @staticmethod
+    def _text_condition(keyword: str):
+        search_terms = {keyword}
+        for word in keyword.split():
+            if len(word) > 2: 
+                search_terms.add(word)
+
         conditions = []
         for term in search_terms:
             pattern = f"%{term}%" 
@@ -38,20 +134,126 @@ class InventoryRepository:
             conditions.append(cast(MasterProduct.synonyms, String).ilike(pattern))
             # Búsqueda en JSON (importante para encontrar "gas", "litro")
             conditions.append(cast(MasterProduct.attributes, String).ilike(pattern))
+        return or_(*conditions)
+
+    @staticmethod
+    def search_products_batch(db: Session, keyword_specs: list, locations: list, max_dist_km: float = 1.5, term_plans: list = None):
+        """
+        Varias búsquedas de una vez (POST /search/batch).
+        keyword_specs: [(keyword, attribute_filters)] sin repetir, de todas las búsquedas juntas.
+        term_plans: como en search_products_smart, uno por spec.
+        locations: [(lat, lon)] de cada búsqueda.
+        Dos consultas para todo el lote en vez de una por búsqueda:
+          1. productos que cumplen algún keyword, cada keyword como columna booleana (el ILIKE y
+             el JSON de atributos se procesan una vez por producto, no por fila de inventario)
+          2. inventario de esos productos en bodegas abiertas dentro de la caja de alguna
+             ubicación (ix_bodegas_lat_lon), solo en las particiones de las regiones que tocan
+             esas cajas; la distancia se calcula una vez por (bodega, ubicación).
+        Devuelve, por ubicación, [(InventoryRow, ProductRow, BodegaRow, specs que cumple)].
+        """
+        if not keyword_specs or not locations:
+            return [[] for _ in locations]
 
-        if conditions:
-            query = query.filter(or_(*conditions))
+        conditions = [
+            InventoryRepository._keyword_condition(k, f, term_plans[j] if term_plans else None)
+            for j, (k, f) in enumerate(keyword_specs)
+        ]
+        product_query = select(
+            MasterProduct.id, MasterProduct.name, MasterProduct.category,
+            MasterProduct.synonyms, MasterProduct.attributes, MasterProduct.default_unit,
+            *[condition.label(f"k{j}") for j, condition in enumerate(conditions)],
+        ).where(or_(*conditions))
 
-        raw_results = query.all()
-        
-        final_results = []
-        for inv, prod, bodega in raw_results:
-            dist = InventoryRepository.haversine(user_lat, user_lon, bodega.latitude, bodega.longitude)
-            # Filtro estricto de distancia
-            if dist <= max_dist_km:
-                final_results.append((inv, prod, bodega))
+        products = {}  # product_id -> (ProductRow, specs que cumple)
+        for row in db.execute(product_query):
+            prod = ProductRow(*row[:6])
+            products[prod.id] = (prod, frozenset(j for j, flag in enumerate(row[6:]) if flag))
+        if not products:
+            return [[] for _ in locations]
 
-        return final_results
+        # Ubicaciones iguales (al metro) comparten cálculo de distancia
+        unique_locations, location_index = [], []
+        seen = {}
+        for lat, lon in locations:
+            key = (round(float(lat), 5), round(float(lon), 5))
+            if key not in seen:
+                seen[key] = len(unique_locations)
+                unique_locations.append(key)
+            location_index.append(seen[key])
+
+        # Caja que contiene el radio de cada ubicación (el haversine decide después)
+        # y particiones (regiones) que tocan esas cajas
+        boxes, regions = [], []
+        for lat, lon in unique_locations:
+            d_lat, d_lon = InventoryRepository._radius_box(lat, lon, max_dist_km)
+            boxes.append(and_(
+                Bodega.latitude.between(lat - d_lat, lat + d_lat),
+                Bodega.longitude.between(lon - d_lon, lon + d_lon),
+            ))
+            for region in InventoryRepository.regions_near(lat, lon, max_dist_km):
+                if region not in regions:
+                    regions.append(region)
+
+        inventory_query = select(
+            StoreInventory.price, StoreInventory.stock_quantity, StoreInventory.product_id,
+            Bodega.id, Bodega.name, Bodega.latitude, Bodega.longitude,
+        ).join(Bodega, StoreInventory.bodega_id == Bodega.id)\
+            .where(or_(
+                Bodega.manual_override == 'OPEN',
+                Bodega.manual_override.is_(None)
+            ))\
+            .where(StoreInventory.region.in_(regions))\
+            .where(StoreInventory.product_id.in_(list(products)))\
+            .where(or_(*boxes))
+
+        per_unique = [[] for _ in unique_locations]
+        bodegas = {}  # bodega_id -> (BodegaRow, índices de ubicaciones en radio)
+        for price, stock, prod_id, bodega_id, bodega_name, lat, lon in db.execute(inventory_query):
+            entry = bodegas.get(bodega_id)
+            if entry is None:
+                lat, lon = float(lat), float(lon)
+                in_range = [
+                    i for i, (u_lat, u_lon) in enumerate(unique_locations)
+                    if InventoryRepository.haversine(u_lon, u_lat, lon, lat) <= max_dist_km
+                ]
+                entry = bodegas[bodega_id] = (BodegaRow(bodega_id, bodega_name, lat, lon), in_range)
+            bodega, in_range = entry
+            if not in_range:
+                continue
+
+            prod, matched = products[prod_id]
+            row = (InventoryRow(float(price), float(stock) if stock is not None else None), prod, bodega, matched)
+            for i in in_range:
+                per_unique[i].append(row)
+
+        return [per_unique[i] for i in location_index]
+
+    @staticmethod
+    def regions_near(lat: float, lon: float, max_dist_km: float = 1.5) -> list:
+        """
+        Regiones (particiones de store_inventory) que pueden tener bodegas a <= max_dist_km.
+        Usa la misma caja que /search/batch (_radius_box), medida con el mismo haversine que el
+        filtro de distancia.
+        """
+        lat, lon = float(lat), float(lon)
+        d_lat, d_lon = InventoryRepository._radius_box(lat, lon, max_dist_km)
+        return regions_in_box(lat - d_lat, lat + d_lat, lon - d_lon, lon + d_lon)
+
+    @staticmethod
+    def _radius_box(lat: float, lon: float, max_dist_km: float) -> tuple:
+        """
+        Medio ancho (grados de lat, grados de lon) de una caja que contiene todo lo que está a
+        <= max_dist_km de (lat, lon). Se mide con el mismo haversine que el filtro de distancia,
+        así la caja nunca deja afuera una bodega que /search/smart sí devolvería. 1% de holgura.
+        """
+        step = 1e-3
+        lat, lon = float(lat), float(lon)
+        km_per_deg_lat = InventoryRepository.haversine(lon, lat, lon, lat + step) / step
+        km_per_deg_lon = InventoryRepository.haversine(lon, lat, lon + step, lat) / step
+        return (
+            max_dist_km / max(km_per_deg_lat, 1e-6) * 1.01,
+            max_dist_km / max(km_per_deg_lon, 1e-6) * 1.01,
+        )
 
     @staticmethod
     def haversine(lon1, lat1, lon2, lat2):
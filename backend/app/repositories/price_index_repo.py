@@ -0,0 +1,132 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import select, text, tuple_
+from app.core.config import settings
+from app.core.geo import tiles_around
+from app.models.tables import PriceIndexEntry, Bodega
+from app.repositories.inventory_repo import InventoryRepository
+
+# Ofertas válidas para el índice: con stock, disponibles y en bodegas abiertas o en automático.
+# Se rankean por precio dentro de cada (producto, celda) y se guardan las PRICE_INDEX_TOP_N primeras.
+# El join también por región (siempre coincide, es la llave foránea) deja que PostgreSQL lea
+# solo la partición de cada bodega.
+_INSERT_RANKED_OFFERS = """
+INSERT INTO price_index (product_id, tile_lat, tile_lon, bodega_id, price, stock_quantity)
+SELECT product_id, tile_lat, tile_lon, bodega_id, price, stock_quantity FROM (
+    SELECT si.product_id,
+           floor(b.latitude / :deg)::int AS tile_lat,
+           floor(b.longitude / :deg)::int AS tile_lon,
+           si.bodega_id, si.price, si.stock_quantity,
+           row_number() OVER (
+               PARTITION BY si.product_id, floor(b.latitude / :deg), floor(b.longitude / :deg)
+               ORDER BY si.price, si.bodega_id
+           ) AS rn
+    FROM store_inventory si
+    JOIN bodegas b ON b.id = si.bodega_id AND b.region = si.region
+    WHERE si.stock_quantity > 0
+      AND si.is_available IS NOT FALSE
+      AND (b.manual_override IS NULL OR b.manual_override = 'OPEN')
+      {extra}
+) ranked
+WHERE rn <= :top_n
+"""
+
+# Solo los productos indicados, en la celda de la bodega que cambió
+_SAME_TILE_AS_BODEGA = """
+      AND si.product_id = ANY(:product_ids)
+      AND (floor(b.latitude / :deg), floor(b.longitude / :deg)) =
+          (SELECT floor(latitude / :deg), floor(longitude / :deg) FROM bodegas WHERE id = :bodega_id)
+"""
+
+# Dos transacciones que refrescan el mismo (producto, celda) a la vez (dos bodegas de la misma
+# celda) borrarían las mismas filas e insertarían cada una su top-N: choque de llave primaria.
+# Un lock por (producto, celda) que se suelta con el commit las pone en fila; con READ COMMITTED
+# la segunda, al entrar, ya ve lo que escribió la primera. Se toman ordenados (sin deadlocks).
+_PRICE_INDEX_LOCK_NS = 3401
+
+_LOCK_BODEGA_TILE = """
+SELECT pg_advisory_xact_lock(:lock_ns, k) FROM (
+    SELECT DISTINCT hashtext(p || ':' || t.tile_lat || ':' || t.tile_lon) AS k
+    FROM (SELECT floor(latitude / :deg)::int AS tile_lat, floor(longitude / :deg)::int AS tile_lon
+          FROM bodegas WHERE id = :bodega_id) t,
+         unnest(CAST(:product_ids AS int[])) AS p
+    ORDER BY k
+) keys
+"""
+
+_DELETE_BODEGA_TILE = """
+DELETE FROM price_index p
+USING bodegas b
+WHERE b.id = :bodega_id
+  AND p.tile_lat = floor(b.latitude / :deg)::int
+  AND p.tile_lon = floor(b.longitude / :deg)::int
+  AND p.product_id = ANY(:product_ids)
+"""
+
+
+class PriceIndexRepository:
+    """
+    Índice "lo más barato cerca de mí" (tabla price_index).
+    Un cambio de precio o stock solo afecta a su (producto, celda), así que el refresh
+    incremental recalcula esas pocas filas dentro de la misma transacción del cambio.
+    """
+
+    @staticmethod
+    def _params(**extra) -> dict:
+        return {"deg": settings.PRICE_INDEX_TILE_DEG, "top_n": settings.PRICE_INDEX_TOP_N, **extra}
+
+    @staticmethod
+    def refresh_for_bodega(db: Session, bodega_id, product_ids: list):
+        """
+        Recalcula las celdas de estos productos en la zona de la bodega.
+        No hace commit: va en la misma transacción que el cambio de inventario (y los locks de
+        sus celdas se mantienen hasta ese commit).
+        """
+        if not product_ids:
+            return
+        params = PriceIndexRepository._params(
+            bodega_id=bodega_id, product_ids=list(product_ids), lock_ns=_PRICE_INDEX_LOCK_NS
+        )
+        db.execute(text(_LOCK_BODEGA_TILE), params)
+        db.execute(text(_DELETE_BODEGA_TILE), params)
+        db.execute(text(_INSERT_RANKED_OFFERS.format(extra=_SAME_TILE_AS_BODEGA)), params)
+
+    @staticmethod
+    def rebuild(db: Session) -> int:
+        """Reconstruye todo el índice (después de una carga masiva). No hace commit."""
+        # Espera a los refresh en curso y los frena hasta el commit (ellos toman ROW EXCLUSIVE)
+        db.execute(text("LOCK TABLE price_index IN SHARE ROW EXCLUSIVE MODE"))
+        db.execute(text("DELETE FROM price_index"))
+        result = db.execute(text(_INSERT_RANKED_OFFERS.format(extra="")), PriceIndexRepository._params())
+        return result.rowcount
+
+    @staticmethod
+    def cheapest_near(db: Session, product_id: int, user_lat: float, user_lon: float, max_dist_km: float = 1.5, limit: int = 5):
+        """
+        Ofertas más baratas de un producto alrededor del vecino: una sola consulta por la
+        llave primaria (producto + celdas vecinas). Devuelve [(fila, distancia_km)] por precio.
+        Es aproximado a propósito: cada celda guarda solo sus PRICE_INDEX_TOP_N mejores ofertas.
+        """
+        tiles = tiles_around(user_lat, user_lon, max_dist_km)
+        stmt = select(
+            PriceIndexEntry.bodega_id,
+            PriceIndexEntry.price,
+            PriceIndexEntry.stock_quantity,
+            Bodega.name,
+            Bodega.latitude,
+            Bodega.longitude,
+        ).join(Bodega, Bodega.id == PriceIndexEntry.bodega_id)\
+            .where(
+                PriceIndexEntry.product_id == product_id,
+                tuple_(PriceIndexEntry.tile_lat, PriceIndexEntry.tile_lon).in_(tiles),
+            )\
+            .order_by(PriceIndexEntry.price, PriceIndexEntry.bodega_id)
+
+        results = []
+        for row in db.execute(stmt):
+            dist = InventoryRepository.haversine(user_lon, user_lat, row.longitude, row.latitude)
+            # Las celdas vecinas cubren un cuadrado: filtramos el círculo real
+            if dist <= max_dist_km:
+                results.append((row, dist))
+                if len(results) >= limit:
+                    break
+        return results
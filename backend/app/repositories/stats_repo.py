@@ -0,0 +1,135 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+
+# Estadísticas de salud de la BD para admin (GET /admin/stats y check_db.py).
+# Todo es SQL agregado: una consulta por sección, sin traer filas a Python salvo una muestra
+# acotada (LIMIT) para poder ir a revisar los casos. Las anti-joins (NOT EXISTS) van por
+# llaves primarias o índices, así que escalan a millones de filas de inventario.
+
+_TABLES = [
+    "users", "bodegas", "bodega_schedules", "master_products", "store_inventory",
+    "price_index", "demand_events", "voice_jobs", "conversation_sessions",
+]
+
+_BODEGAS_WITHOUT_INVENTORY = """
+SELECT b.id, b.name, b.manual_override, count(*) OVER () AS total
+FROM bodegas b
+WHERE NOT EXISTS (SELECT 1 FROM store_inventory si WHERE si.bodega_id = b.id)
+ORDER BY b.name, b.id
+LIMIT :limit
+"""
+
+_PRODUCTS_WITHOUT_STORES = """
+SELECT p.id, p.name, p.category, count(*) OVER () AS total
+FROM master_products p
+WHERE NOT EXISTS (SELECT 1 FROM store_inventory si WHERE si.product_id = p.id)
+ORDER BY p.id
+LIMIT :limit
+"""
+
+# Precio fuera de [mediana / factor, mediana * factor] del mismo producto en las demás bodegas.
+# MATERIALIZED: sin él cada worker paralelo recalcula las medianas (x3 en 1M de filas)
+_PRICE_OUTLIERS = """
+WITH med AS MATERIALIZED (
+    SELECT product_id, percentile_cont(0.5) WITHIN GROUP (ORDER BY price) AS median, count(*) AS stores
+    FROM store_inventory
+    WHERE price > 0
+    GROUP BY product_id
+    HAVING count(*) >= :min_stores
+), flagged AS (
+    SELECT si.bodega_id, si.product_id, si.price::float8 AS price, med.median, med.stores,
+           greatest(si.price / med.median, med.median / si.price) AS ratio,
+           count(*) OVER () AS total
+    FROM store_inventory si
+    JOIN med ON med.product_id = si.product_id
+    WHERE si.price > 0
+      AND (si.price > med.median * :factor OR si.price < med.median / :factor)
+    ORDER BY ratio DESC, si.bodega_id, si.product_id
+    LIMIT :limit
+)
+SELECT f.bodega_id, b.name AS bodega, f.product_id, p.name AS product,
+       f.price, f.median, f.stores, f.ratio, f.total
+FROM flagged f
+JOIN bodegas b ON b.id = f.bodega_id
+JOIN master_products p ON p.id = f.product_id
+ORDER BY f.ratio DESC, f.bodega_id, f.product_id
+"""
+
+_INVENTORY_ANOMALIES = """
+SELECT count(*) FILTER (WHERE price IS NULL OR price <= 0) AS non_positive_price,
+       count(*) FILTER (WHERE stock_quantity < 0) AS negative_stock,
+       count(*) FILTER (WHERE stock_quantity IS NULL) AS missing_stock,
+       count(*) FILTER (WHERE stock_quantity > :max_stock) AS huge_stock,
+       count(*) FILTER (WHERE is_available AND stock_quantity = 0) AS available_without_stock
+FROM store_inventory
+"""
+
+_STOCK_OUTLIERS = """
+SELECT si.bodega_id, b.name AS bodega, si.product_id, p.name AS product,
+       si.stock_quantity::float8 AS stock, si.price::float8 AS price
+FROM store_inventory si
+JOIN bodegas b ON b.id = si.bodega_id
+JOIN master_products p ON p.id = si.product_id
+WHERE si.stock_quantity < 0 OR si.stock_quantity > :max_stock OR si.price <= 0
+ORDER BY abs(si.stock_quantity) DESC NULLS LAST, si.bodega_id, si.product_id
+LIMIT :limit
+"""
+
+# Filas que apuntan a algo que ya no existe (o a nada). Las llaves foráneas evitan la mayoría,
+# pero price_index es derivado y owner_id / bodega_id de horarios aceptan NULL.
+_ORPHANS = """
+SELECT
+    (SELECT count(*) FROM store_inventory si
+      WHERE NOT EXISTS (SELECT 1 FROM bodegas b WHERE b.id = si.bodega_id)) AS inventory_without_bodega,
+    (SELECT count(*) FROM store_inventory si
+      WHERE NOT EXISTS (SELECT 1 FROM master_products p WHERE p.id = si.product_id)) AS inventory_without_product,
+    (SELECT count(*) FROM price_index pi
+      WHERE NOT EXISTS (SELECT 1 FROM store_inventory si
+                         WHERE si.bodega_id = pi.bodega_id AND si.product_id = pi.product_id)) AS price_index_without_inventory,
+    (SELECT count(*) FROM bodegas b
+      WHERE b.owner_id IS NULL OR NOT EXISTS (SELECT 1 FROM users u WHERE u.id = b.owner_id)) AS bodegas_without_owner,
+    (SELECT count(*) FROM bodega_schedules s
+      WHERE s.bodega_id IS NULL OR NOT EXISTS (SELECT 1 FROM bodegas b WHERE b.id = s.bodega_id)) AS schedules_without_bodega
+"""
+
+
+def _sample(rows, limit: int, drop=("total",)) -> list:
+    return [{k: v for k, v in row._mapping.items() if k not in drop} for row in rows[:limit]]
+
+
+class StatsRepository:
+
+    @staticmethod
+    def table_counts(db: Session) -> dict:
+        """Filas por tabla (count exacto, una sola consulta)."""
+        columns = ", ".join(f"(SELECT count(*) FROM {table}) AS {table}" for table in _TABLES)
+        return dict(db.execute(text(f"SELECT {columns}")).one()._mapping)
+
+    @staticmethod
+    def bodegas_without_inventory(db: Session, limit: int = 10) -> dict:
+        # Al menos una fila para leer el total aunque no se pida muestra
+        rows = db.execute(text(_BODEGAS_WITHOUT_INVENTORY), {"limit": max(limit, 1)}).all()
+        return {"total": rows[0].total if rows else 0, "sample": _sample(rows, limit)}
+
+    @staticmethod
+    def products_without_stores(db: Session, limit: int = 10) -> dict:
+        rows = db.execute(text(_PRODUCTS_WITHOUT_STORES), {"limit": max(limit, 1)}).all()
+        return {"total": rows[0].total if rows else 0, "sample": _sample(rows, limit)}
+
+    @staticmethod
+    def price_outliers(db: Session, factor: float = 5.0, min_stores: int = 3, limit: int = 10) -> dict:
+        """Ofertas con precio `factor` veces por encima o por debajo de la mediana del producto."""
+        rows = db.execute(text(_PRICE_OUTLIERS), {"factor": factor, "min_stores": min_stores, "limit": max(limit, 1)}).all()
+        return {"factor": factor, "total": rows[0].total if rows else 0, "sample": _sample(rows, limit)}
+
+    @staticmethod
+    def inventory_anomalies(db: Session, max_stock: float = 10000, limit: int = 10) -> dict:
+        """Precios <= 0 y stock negativo, vacío o absurdo, en una pasada sobre store_inventory."""
+        params = {"max_stock": max_stock, "limit": limit}
+        counts = dict(db.execute(text(_INVENTORY_ANOMALIES), params).one()._mapping)
+        rows = db.execute(text(_STOCK_OUTLIERS), params).all()
+        return {**counts, "max_stock": max_stock, "sample": _sample(rows, limit)}
+
+    @staticmethod
+    def orphans(db: Session) -> dict:
+        return dict(db.execute(text(_ORPHANS)).one()._mapping)
@@ -1,15 +1,46 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from uuid import UUID
 
 # --- 1. SCHEMAS DE ENTRADA (REQUESTS) ---
 # Lo que Flutter le envía a Python
 
+class Intent(BaseModel):
+    # Un producto pedido, ya interpretado (lo que devuelve Gemini, viaja en el cursor
+    # o lo manda el cliente en /search/batch)
+    product_name: str
+    quantity: int = Field(default=1, ge=1)
+    must_contain: List[str] = []
+    must_not_contain: List[str] = []
+
 class SearchRequest(BaseModel):
     query: str              # Ej: "Una gorda y arroz"
     user_lat: float         # Ej: -8.0783
     user_lon: float         # Ej: -79.1180
+    # Legacy: historial completo. Con session_id el servidor guarda el historial
+    # y basta con mandar el mensaje nuevo en `query`.
     conversation_history: List[Dict[str, str]] = []
+    session_id: Optional[str] = Field(default=None, max_length=64)  # = ConversationSession.session_id
+    # Modo compacto: los atributos de cada producto van una sola vez en
+    # SmartSearchResponse.product_attributes y los items solo llevan el product_id
+    compact: bool = False
+    # Paginación: cuántas bodegas por página y el cursor de "cargar más"
+    limit: int = Field(default=10, ge=1, le=50)
+    cursor: Optional[str] = None
+
+class BatchSearchItem(BaseModel):
+    # Texto libre (se interpreta con Gemini) o intents ya interpretados, ej. de una lista
+    # guardada: [{"product_name": "Agua", "quantity": 2, "must_contain": ["sin gas"]}]
+    query: Optional[str] = None
+    intents: Optional[List[Intent]] = None
+    user_lat: float
+    user_lon: float
+    limit: int = Field(default=10, ge=1, le=50)
+
+class BatchSearchRequest(BaseModel):
+    searches: List[BatchSearchItem]
+    compact: bool = False
+    session_id: Optional[str] = Field(default=None, max_length=64)  # Se acepta por compatibilidad, el límite va por IP
 
 class BodegaStatusUpdate(BaseModel):
     manual_override: Optional[str] = None # 'OPEN', 'CLOSED' o None (null)
@@ -57,6 +88,14 @@ class BodegaSearchResult(BaseModel):
 class SmartSearchResponse(BaseModel):
     message: str
     results: List[BodegaSearchResult]
+    # Solo en modo compacto: {product_id: attributes}
+    product_attributes: Optional[Dict[int, Dict[str, Any]]] = None
+    # Cursor para pedir la siguiente página (None si no hay más)
+    next_cursor: Optional[str] = None
+    # Sesión de conversación a reutilizar en el siguiente mensaje
+    session_id: Optional[str] = None
+    # True si Gemini estaba saturado y la respuesta se armó sin LLM
+    degraded: bool = False
 
 class VoiceUpdateResponse(BaseModel):
     message: str
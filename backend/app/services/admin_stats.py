@@ -0,0 +1,47 @@
+import time
+from sqlalchemy import text
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.repositories.stats_repo import StatsRepository
+
+# Recorre las secciones de StatsRepository y las entrega apenas termina cada una, para que
+# GET /admin/stats (NDJSON) y check_db.py vayan mostrando resultados sin esperar al final.
+# Cada sección corre en su propia transacción con statement_timeout: si una se pasa en una
+# BD enorme se reporta el error y se sigue con la siguiente.
+
+
+def stats_sections(sample_limit: int, price_factor: float, max_stock: float) -> list:
+    return [
+        ("tables", lambda db: StatsRepository.table_counts(db)),
+        ("bodegas_without_inventory", lambda db: StatsRepository.bodegas_without_inventory(db, sample_limit)),
+        ("products_without_stores", lambda db: StatsRepository.products_without_stores(db, sample_limit)),
+        ("price_outliers", lambda db: StatsRepository.price_outliers(db, price_factor, limit=sample_limit)),
+        ("inventory_anomalies", lambda db: StatsRepository.inventory_anomalies(db, max_stock, sample_limit)),
+        ("orphans", lambda db: StatsRepository.orphans(db)),
+    ]
+
+
+def iter_stats(sample_limit: int = None, price_factor: float = None, max_stock: float = None, timeout_ms: int = None):
+    """Genera {"section", "ms", "data"} (o "error") por sección, en orden."""
+    sections = stats_sections(
+        sample_limit if sample_limit is not None else settings.ADMIN_STATS_SAMPLE_LIMIT,
+        price_factor if price_factor is not None else settings.ADMIN_STATS_PRICE_FACTOR,
+        max_stock if max_stock is not None else settings.ADMIN_STATS_MAX_STOCK,
+    )
+    timeout_ms = timeout_ms if timeout_ms is not None else settings.ADMIN_STATS_STATEMENT_TIMEOUT_MS
+    db = SessionLocal()
+    try:
+        for name, run in sections:
+            start = time.perf_counter()
+            try:
+                # Solo para esta transacción (set_config acepta parámetros, SET no)
+                db.execute(text("SELECT set_config('statement_timeout', :ms, true)"), {"ms": str(timeout_ms)})
+                entry = {"section": name, "data": run(db)}
+            except Exception as e:
+                entry = {"section": name, "error": str(e).splitlines()[0]}
+            finally:
+                db.rollback()
+            entry["ms"] = round((time.perf_counter() - start) * 1000, 1)
+            yield entry
+    finally:
+        db.close()
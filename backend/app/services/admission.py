@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from app.core.config import settings
+
+# Control de admisión para las llamadas a Gemini y límite por IP en /search/smart.
+# - Cada modelo tiene un semáforo (máximo de llamadas en vuelo) y una cola corta.
+# - Si la cola está llena o la espera pasa el deadline, se rechaza con Overloaded y el
+#   endpoint responde en modo degradado (sin LLM) en lugar de quedarse esperando.
+
+
+class Overloaded(Exception):
+    """La llamada fue rechazada por falta de capacidad (load shedding)."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Sobrecarga: {reason}")
+        self.reason = reason
+
+
+class ModelGate:
+    """Semáforo + cola acotada con deadline para un modelo."""
+
+    def __init__(self, max_concurrency: int, max_queue: int):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+
+    @asynccontextmanager
+    async def slot(self, timeout: float):
+        if not self.semaphore.locked():
+            # Hay lugar libre: no pasa por la cola
+            await self.semaphore.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                raise Overloaded("queue_full")
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), timeout=timeout)
+            except asyncio.TimeoutError:
+                raise Overloaded("queue_timeout")
+            finally:
+                self.waiting -= 1
+
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+
+
+class TokenBucketLimiter:
+    """Token bucket por llave (usuario/sesión/IP)."""
+
+    # Máximo de llaves recordadas; las más viejas se limpian
+    MAX_KEYS = 50000
+
+    def __init__(self, rate_per_minute: int, burst: int):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def allow(self, key: str, n: int = 1) -> bool:
+        """
+        Toma `n` tokens de una vez (todos o ninguno). Si n es mayor que el burst alcanza con
+        el bucket lleno: queda en negativo y se paga con el tiempo.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate_per_second)
+            allowed = tokens >= min(n, self.burst)
+            if allowed:
+                tokens -= n
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.MAX_KEYS:
+                # Las llaves con el bucket lleno no aportan nada: se pueden olvidar
+                full_after = self.burst / max(self.rate_per_second, 1e-9)
+                self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < full_after}
+            return allowed
+
+
+class AdmissionController:
+    def __init__(self):
+        self.gates = {}
+        self.shed_counts = {}
+        self.rate_limited = 0
+        self.search_limiter = TokenBucketLimiter(
+            settings.SEARCH_RATE_LIMIT_PER_MINUTE, settings.SEARCH_RATE_LIMIT_BURST
+        )
+
+    def _gate(self, model: str) -> ModelGate:
+        gate = self.gates.get(model)
+        if gate is None:
+            gate = self.gates[model] = ModelGate(
+                settings.GEMINI_MAX_CONCURRENCY_PER_MODEL, settings.GEMINI_MAX_QUEUE_PER_MODEL
+            )
+        return gate
+
+    @asynccontextmanager
+    async def model_slot(self, model: str):
+        """Reserva un lugar para llamar a `model` o lanza Overloaded."""
+        try:
+            async with self._gate(model).slot(settings.GEMINI_QUEUE_TIMEOUT_SECONDS):
+                yield
+        except Overloaded as e:
+            key = f"{model}:{e.reason}"
+            self.shed_counts[key] = self.shed_counts.get(key, 0) + 1
+            raise
+
+    def allow_search(self, key: str, n: int = 1) -> bool:
+        """`n` búsquedas de una vez (ej. /search/batch): se admiten todas o ninguna."""
+        allowed = self.search_limiter.allow(key, n)
+        if not allowed:
+            self.rate_limited += 1
+        return allowed
+
+    def snapshot(self) -> dict:
+        return {
+            "models": {
+                model: {
+                    "in_flight": gate.in_flight,
+                    "queue_depth": gate.waiting,
+                    "max_concurrency": gate.max_concurrency,
+                    "max_queue": gate.max_queue,
+                }
+                for model, gate in self.gates.items()
+            },
+            "shed": dict(self.shed_counts),
+            "shed_total": sum(self.shed_counts.values()),
+            "search_rate_limited": self.rate_limited,
+        }
+
+
+admission = AdmissionController()
@@ -0,0 +1,149 @@
+import threading
+import time
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.text_utils import normalize_text
+
+# Compila los modificadores de un intent ("con gas", "sin azúcar", "cielo", "marca gloria")
+# a predicados JSONB sobre MasterProduct.attributes, para que el filtro corra en SQL contra
+# el índice GIN en vez de traer todas las variantes y descartarlas en Python.
+#   - Solo "con <llave>" / "sin <llave>" (llave booleana del catálogo) se confía entero al
+#     atributo: {"gas": true}.
+#   - Los demás ("cielo", "marca gloria", "retornable") también pueden estar solo en el nombre
+#     o un sinónimo ("Agua Cielo" sin marca cargada): en SQL van como atributo O texto, y el
+#     término sigue en el residuo para que Python decida como siempre.
+# Lo que no se puede traducir a un atributo del catálogo queda como "residuo" de texto libre
+# y se sigue filtrando como antes (substring sobre humanize_attributes).
+
+
+class AttributeVocabulary:
+    """
+    Llaves y valores de atributos que existen en el catálogo, indexados por texto normalizado.
+    Se carga con una consulta (jsonb_each) y se recarga cada ATTRIBUTE_VOCAB_TTL_SECONDS.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.bool_keys = {}    # "gas" -> "gas" (llave original)
+        self.keys = {}         # "tamano" -> "tamaño"
+        self.values = {}       # "cielo" -> {("marca", "Cielo")}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session):
+        rows = db.execute(text(
+            "SELECT DISTINCT kv.key, kv.value FROM master_products, jsonb_each(attributes) AS kv "
+            "WHERE jsonb_typeof(attributes) = 'object' "
+            "AND jsonb_typeof(kv.value) IN ('boolean', 'string', 'number')"
+        )).all()
+        bool_keys, keys, values = {}, {}, {}
+        for key, value in rows:
+            key_norm = normalize_text(key)
+            keys.setdefault(key_norm, key)
+            if isinstance(value, bool):
+                bool_keys.setdefault(key_norm, key)
+            else:
+                values.setdefault(normalize_text(str(value)), set()).add((key, value))
+        self.bool_keys, self.keys, self.values = bool_keys, keys, values
+        self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self, db: Session):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds:
+            with self._lock:
+                if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl_seconds:
+                    self._load(db)
+        return self
+
+    def invalidate(self):
+        """Se llama cuando entra un producto con atributos nuevos."""
+        self._loaded_at = None
+
+    def compile_term(self, term: str):
+        """
+        Devuelve (dict para `attributes @> ...`, exacto) o None si el término no es un atributo.
+        exacto = True solo para "con/sin <llave booleana>"; los demás pueden estar en el texto.
+        """
+        norm = " ".join(normalize_text(term).split())
+        if not norm:
+            return None
+
+        # "con gas" / "sin gas" -> {"gas": true/false}
+        first, _, rest = norm.partition(" ")
+        if first in ("con", "sin") and rest in self.bool_keys:
+            return {self.bool_keys[rest]: first == "con"}, True
+
+        # "retornable" -> {"retornable": true}
+        if norm in self.bool_keys:
+            return {self.bool_keys[norm]: True}, False
+
+        # "marca gloria" -> {"marca": "Gloria"}
+        if first in self.keys and rest:
+            matches = {(k, v) for k, v in self.values.get(rest, ()) if k == self.keys[first]}
+            if len(matches) == 1:
+                key, value = matches.pop()
+                return {key: value}, False
+
+        # "gloria" -> {"marca": "Gloria"} (solo si el valor no es ambiguo)
+        matches = self.values.get(norm, ())
+        if len(matches) == 1:
+            key, value = next(iter(matches))
+            return {key: value}, False
+        return None
+
+
+def compile_intent(intent: dict, vocabulary: AttributeVocabulary) -> dict:
+    """
+    Separa los modificadores del intent en predicados estructurados y residuo de texto:
+    {"contains": [dicts], "not_contains": [dicts], "contains_or_text": [[dict, término]],
+     "must_residue": [...], "must_not_residue": [...]}
+    contains_or_text: el producto pasa en SQL si tiene el atributo o el término en su texto;
+    el término también queda en must_residue (lo decide Python).
+    En negativo alcanza con `NOT attributes @> ...`: un producto con ese atributo tiene el
+    término en su texto de atributos, así que Python también lo descartaría.
+    """
+    compiled = {"contains": [], "not_contains": [], "contains_or_text": [], "must_residue": [], "must_not_residue": []}
+    for term in intent.get("must_contain", []) or []:
+        found = vocabulary.compile_term(term)
+        if found is None:
+            compiled["must_residue"].append(normalize_text(term))
+            continue
+        predicate, exact = found
+        if exact:
+            compiled["contains"].append(predicate)
+        else:
+            compiled["contains_or_text"].append([predicate, term])
+            compiled["must_residue"].append(normalize_text(term))
+    for term in intent.get("must_not_contain", []) or []:
+        found = vocabulary.compile_term(term)
+        if found is None:
+            compiled["must_not_residue"].append(normalize_text(term))
+            continue
+        predicate, exact = found
+        compiled["not_contains"].append(predicate)
+        if not exact:
+            compiled["must_not_residue"].append(normalize_text(term))
+    return compiled
+
+
+def sql_filters(compiled: dict) -> dict:
+    """La parte de compile_intent que va a SQL (attribute_filters de InventoryRepository)."""
+    return {key: compiled[key] for key in ("contains", "not_contains", "contains_or_text")}
+
+
+def matches_attributes(attributes: dict, compiled: dict) -> bool:
+    """
+    Mismo predicado que en SQL, sobre el dict ya cargado (para asignar la fila a su intent).
+    contains_or_text no se mira aquí: su término está en must_residue.
+    """
+    attributes = attributes or {}
+    for predicate in compiled["contains"]:
+        if any(attributes.get(k) != v for k, v in predicate.items()):
+            return False
+    for predicate in compiled["not_contains"]:
+        if all(attributes.get(k) == v for k, v in predicate.items()):
+            return False
+    return True
+
+
+attribute_vocabulary = AttributeVocabulary(ttl_seconds=settings.ATTRIBUTE_VOCAB_TTL_SECONDS)
@@ -0,0 +1,222 @@
+import gzip
+import threading
+import time
+from collections import OrderedDict, deque
+import orjson
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.repositories.catalog_repo import CatalogRepository, BODEGA_FIELDS, PRODUCT_FIELDS, INVENTORY_FIELDS
+
+# Bundles de catálogo por celda para que la app busque en el teléfono (/catalog).
+# Un bundle es el JSON de la celda ya serializado y comprimido con gzip: el snapshot
+# completo o el delta desde una versión. Se arma una sola vez y se guarda en un LRU, así
+# miles de vecinos sincronizando el mismo barrio solo cuestan una consulta barata de
+# versión (que también se cachea unos segundos).
+# `since` lo elige el cliente, así que no va tal cual en la llave del cache: se redondea
+# hacia abajo a una de las últimas versiones que este worker entregó para la celda (el
+# delta trae algunas filas de más, el cliente las aplica por llave). Así hay pocas llaves
+# por celda y se comparten. Los deltas se recortan del snapshot cacheado, sin ir a la BD.
+#
+# Las versiones salen de una secuencia: una transacción puede tomar la 100 y hacer commit
+# después de otra con la 101. Si un cliente guardara 101 como "ya tengo hasta aquí", el delta
+# siguiente (since=101) nunca le mandaría la fila 100. Por eso la versión que se entrega es a lo
+# más la marca segura (safe_version): un valor de la secuencia tal que ya terminaron todas las
+# transacciones que podían tener una versión menor. Las filas más nuevas igual viajan en el
+# bundle; el siguiente delta las repite y el cliente las aplica por llave (no pasa nada).
+
+
+class CatalogTileCache:
+    DELIVERED_PER_TILE = 8
+
+    def __init__(self, tile_deg: float, version_ttl_seconds: float, max_bundles: int):
+        self.tile_deg = tile_deg
+        self.version_ttl_seconds = version_ttl_seconds
+        self.max_bundles = max_bundles
+        self._versions = {}              # celda -> (versión, monotonic de la consulta)
+        self._snapshots = OrderedDict()  # celda -> (última versión, versión entregada, bytes gzip)
+        self._deltas = OrderedDict()     # (celda, desde, versión, última) -> bytes gzip
+        self._delivered = {}             # celda -> últimas versiones entregadas (desde dónde se piden deltas)
+        self._building = {}              # celda -> Lock, para no armar dos veces el mismo snapshot
+        self._lock = threading.Lock()
+        self._clock = deque()            # muestras (monotonic, valor de la secuencia, xmax) aún no seguras
+        self._clock_at = None
+        self._safe_version = 0
+        self._clock_lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+
+    def safe_version(self) -> int:
+        """
+        Marca segura: el valor de la secuencia de una muestra cuyo xmax ya quedó por debajo del
+        xmin actual (terminaron las transacciones de entonces) y que tiene al menos
+        version_ttl_seconds (cubre el instante entre nextval() y que la transacción tenga xid).
+        Recién iniciado el proceso vale 0 unos segundos: mientras tanto se entregan snapshots.
+        """
+        now = time.monotonic()
+        if self._clock_at is not None and now - self._clock_at < self.version_ttl_seconds:
+            return self._safe_version
+        db = SessionLocal()
+        try:
+            last_value, xmin, xmax = CatalogRepository.version_clock(db)
+        finally:
+            db.close()
+        with self._clock_lock:
+            self._clock_at = now
+            self._clock.append((now, last_value, xmax))
+            while self._clock and self._clock[0][2] <= xmin and now - self._clock[0][0] >= self.version_ttl_seconds:
+                self._safe_version = max(self._safe_version, self._clock.popleft()[1])
+            return self._safe_version
+
+    def _latest_version(self, tile: tuple) -> int:
+        """Mayor versión visible en la celda (cacheada version_ttl_seconds)."""
+        cached = self._versions.get(tile)
+        if cached and time.monotonic() - cached[1] < self.version_ttl_seconds:
+            return cached[0]
+        db = SessionLocal()
+        try:
+            version = CatalogRepository.tile_version(db, tile, self.tile_deg)
+        finally:
+            db.close()
+        self._versions[tile] = (version, time.monotonic())
+        return version
+
+    def tile_version(self, tile: tuple) -> int:
+        """Versión de la celda que se le entrega al cliente: la última, acotada a la marca segura."""
+        return min(self._latest_version(tile), self.safe_version())
+
+    def bundle(self, tile: tuple, since: int = 0) -> tuple:
+        """
+        (versión, etag, bytes gzip) del snapshot (since=0) o del delta desde `since`.
+        Trae todas las filas con versión mayor a `since` (o a una versión entregada un poco
+        anterior), pero la versión entregada es la de tile_version: el cliente vuelve a pedir
+        desde ahí. El etag también cambia si cambió algo por encima de esa versión.
+        Si el cliente viene de una versión que no existe (BD reseteada), recibe el snapshot.
+        """
+        latest = self._latest_version(tile)
+        if since > latest:
+            since = 0
+        # `since` ya la entregó como segura este u otro worker: no hace falta volver más atrás
+        version = max(min(latest, self.safe_version()), since)
+        body_version, snapshot = self._snapshot(tile, latest, version)
+
+        if since == 0:
+            body = snapshot
+            if body_version != version:
+                # La marca segura avanzó sin cambios en la celda: el snapshot queda con la versión nueva
+                body = self._from_snapshot(snapshot, 0, version)
+                with self._lock:
+                    if self._snapshots.get(tile, (None,))[0] == latest:
+                        self._snapshots[tile] = (latest, version, body)
+        else:
+            base = self._delivered_base(tile, since)
+            if base is None:
+                # Versión que este worker no entregó (viene de otro): delta exacto, sin cache
+                body = self._from_snapshot(snapshot, since, version)
+            else:
+                since = base
+                key = (tile, since, version, latest)
+                with self._lock:
+                    body = self._deltas.get(key)
+                    if body is not None:
+                        self._deltas.move_to_end(key)
+                        self.hits += 1
+                if body is None:
+                    body = self._from_snapshot(snapshot, since, version)
+                    with self._lock:
+                        self._deltas[key] = body
+                        while len(self._deltas) > self.max_bundles:
+                            self._deltas.popitem(last=False)
+
+        self._remember_delivered(tile, version)
+        return version, f"{tile[0]}:{tile[1]}:{since}:{version}:{latest}", body
+
+    def _delivered_base(self, tile: tuple, since: int):
+        """La mayor versión entregada para la celda que no pasa de `since` (None si no hay)."""
+        with self._lock:
+            return max((v for v in self._delivered.get(tile, ()) if 0 < v <= since), default=None)
+
+    def _remember_delivered(self, tile: tuple, version: int):
+        with self._lock:
+            delivered = self._delivered.setdefault(tile, deque(maxlen=self.DELIVERED_PER_TILE))
+            if version not in delivered:
+                delivered.append(version)
+
+    def _from_snapshot(self, snapshot: bytes, since: int, version: int) -> bytes:
+        payload = orjson.loads(gzip.decompress(snapshot))
+        if since:
+            self._trim_to_delta(payload, since)
+        payload.update(version=version, since=since, full=since == 0)
+        return gzip.compress(orjson.dumps(payload), compresslevel=6)
+
+    def _snapshot(self, tile: tuple, latest: int, version: int) -> tuple:
+        """(versión entregada, bytes gzip) del snapshot cacheado de la celda; se arma si cambió `latest`."""
+        with self._lock:
+            cached = self._snapshots.get(tile)
+            if cached is not None and cached[0] == latest:
+                self._snapshots.move_to_end(tile)
+                self.hits += 1
+                return cached[1], cached[2]
+            building = self._building.setdefault(tile, threading.Lock())
+
+        # Un solo hilo arma cada snapshot; los demás esperan y lo toman del cache
+        with building:
+            with self._lock:
+                cached = self._snapshots.get(tile)
+            if cached is None or cached[0] != latest:
+                cached = (latest, version, self._build(tile, version))
+                with self._lock:
+                    self._snapshots[tile] = cached
+                    self._snapshots.move_to_end(tile)
+                    while len(self._snapshots) > self.max_bundles:
+                        evicted, _ = self._snapshots.popitem(last=False)
+                        self._delivered.pop(evicted, None)
+                    self.builds += 1
+            else:
+                self.hits += 1
+        with self._lock:
+            self._building.pop(tile, None)
+        return cached[1], cached[2]
+
+    @staticmethod
+    def _trim_to_delta(payload: dict, since: int):
+        """
+        Deja en el payload del snapshot solo lo que trae CatalogRepository.tile_rows(since):
+        bodegas e inventario con versión mayor a `since` (o cuyo producto cambió) y los
+        productos que ese inventario referencia. La versión va al final de cada fila.
+        """
+        product_versions = {row[0]: row[-1] for row in payload["products"]}
+        inventory = [row for row in payload["inventory"] if row[-1] > since or product_versions.get(row[1], 0) > since]
+        product_ids = {row[1] for row in inventory}
+        payload["bodegas"] = [row for row in payload["bodegas"] if row[-1] > since]
+        payload["inventory"] = inventory
+        payload["products"] = [row for row in payload["products"] if row[0] in product_ids]
+
+    def _build(self, tile: tuple, version: int) -> bytes:
+        db = SessionLocal()
+        try:
+            rows = CatalogRepository.tile_rows(db, tile, self.tile_deg)
+        finally:
+            db.close()
+        payload = {
+            "tile": list(tile),
+            "tile_deg": self.tile_deg,
+            "version": version,
+            "since": 0,
+            "full": True,
+            "fields": {"bodegas": BODEGA_FIELDS, "products": PRODUCT_FIELDS, "inventory": INVENTORY_FIELDS},
+            **rows,
+        }
+        return gzip.compress(orjson.dumps(payload), compresslevel=6)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            size = sum(len(body) for _, _, body in self._snapshots.values())
+            size += sum(len(body) for body in self._deltas.values())
+            return {"snapshots": len(self._snapshots), "deltas": len(self._deltas), "bytes": size, "hits": self.hits, "builds": self.builds, "safe_version": self._safe_version}
+
+
+catalog_tiles = CatalogTileCache(
+    tile_deg=settings.CATALOG_TILE_DEG,
+    version_ttl_seconds=settings.CATALOG_VERSION_TTL_SECONDS,
+    max_bundles=settings.CATALOG_CACHE_MAX_BUNDLES,
+)
@@ -0,0 +1,192 @@
+import asyncio
+import threading
+from collections import deque
+from itertools import islice
+import orjson
+from app.core.config import settings
+from app.core.geo import tile_of
+from app.db.session import SessionLocal
+from app.models.tables import Bodega
+
+# Cambios en vivo por celda (/catalog/events, Server-Sent Events).
+# Los endpoints de escritura publican eventos compactos (stock, producto nuevo, estado de la
+# bodega) y el broker los reparte a los suscriptores de la celda de la bodega.
+#   - publish() no bloquea: arma el frame SSE una vez y le pasa el reparto al event loop con
+#     call_soon_threadsafe, así miles de suscriptores no frenan el UPDATE que lo originó.
+#   - Cada celda guarda sus últimos CHANGE_FEED_BUFFER_SIZE frames en un buffer circular y cada
+#     suscriptor lleva su posición: publicar es O(1) más despertar a los que estaban esperando,
+#     y cada cliente se lleva de una vez todo lo que se le acumuló.
+#   - Si un cliente lento se queda más atrás que el buffer recibe un "resync" para que pida
+#     /catalog/.../delta; los demás no se enteran.
+# El broker es por proceso y asume UN solo worker: con varios, un cliente conectado a un
+# worker no recibe los eventos de las escrituras que atendió otro. Para que igual lo note,
+# el heartbeat lleva la versión actual de cada celda (catalog_tiles.tile_version): si es
+# mayor que la última que aplicó, pide /catalog/.../delta. Al reconectar también.
+
+
+def sse_frame(event: str, data: dict, event_id=None) -> bytes:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\n".encode() + b"data: " + orjson.dumps(data) + b"\n\n"
+
+
+RESYNC_FRAME = sse_frame("resync", {"reason": "overflow"})
+
+
+class TileLog:
+    """Últimos frames de una celda; seq cuenta todos los que pasaron."""
+
+    def __init__(self, size: int):
+        self.frames = deque(maxlen=size)
+        self.seq = 0
+        self.waiting = set()   # suscriptores dormidos esperando algo de esta celda
+        self.subscribers = 0
+
+    def append(self, frame: bytes):
+        self.frames.append(frame)
+        self.seq += 1
+        for sub in self.waiting:
+            sub.wakeup.set()
+        self.waiting.clear()
+
+    def since(self, cursor: int):
+        """Frames posteriores a cursor, o None si ya salieron del buffer."""
+        missing = self.seq - cursor
+        if missing > len(self.frames):
+            return None
+        return list(islice(self.frames, len(self.frames) - missing, None))
+
+
+class Subscription:
+    def __init__(self, broker, logs: dict):
+        self.broker = broker
+        self.logs = logs                                     # celda -> TileLog
+        self.cursors = {tile: log.seq for tile, log in logs.items()}
+        self.wakeup = asyncio.Event()
+
+    async def next_frame(self, timeout: float):
+        """
+        Todo lo pendiente en un solo bloque de bytes, RESYNC_FRAME si se perdieron eventos,
+        o None si no llegó nada en `timeout` (para mandar el heartbeat).
+        """
+        while True:
+            pending, overflow = [], False
+            for tile, log in self.logs.items():
+                frames = log.since(self.cursors[tile])
+                if frames is None:
+                    overflow = True
+                else:
+                    pending.extend(frames)
+                self.cursors[tile] = log.seq
+            if overflow:
+                self.broker.resyncs += 1
+                return RESYNC_FRAME
+            if pending:
+                return b"".join(pending)
+
+            self.wakeup.clear()
+            for log in self.logs.values():
+                log.waiting.add(self)
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+            finally:
+                for log in self.logs.values():
+                    log.waiting.discard(self)
+
+
+class ChangeBroker:
+    def __init__(self, tile_deg: float, buffer_size: int, max_subscribers: int):
+        self.tile_deg = tile_deg
+        self.buffer_size = buffer_size
+        self.max_subscribers = max_subscribers
+        self._loop = None
+        self._logs = {}                       # celda -> TileLog (solo celdas con suscriptores)
+        self._count = 0
+        self._bodega_tiles = {}               # bodega_id -> celda (las bodegas no se mudan)
+        self._lock = threading.Lock()
+        self.published = 0
+        self.resyncs = 0
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    def stop(self):
+        self._loop = None
+
+    # --- Suscriptores (en el event loop) ---
+
+    def subscribe(self, tiles: list):
+        """Devuelve la suscripción o None si ya hay demasiados clientes conectados."""
+        if self._count >= self.max_subscribers:
+            return None
+        logs = {}
+        for tile in tiles:
+            log = self._logs.get(tile)
+            if log is None:
+                log = self._logs[tile] = TileLog(self.buffer_size)
+            log.subscribers += 1
+            logs[tile] = log
+        self._count += 1
+        return Subscription(self, logs)
+
+    def unsubscribe(self, sub: Subscription):
+        for tile, log in sub.logs.items():
+            log.waiting.discard(sub)
+            log.subscribers -= 1
+            if log.subscribers == 0 and self._logs.get(tile) is log:
+                del self._logs[tile]
+        self._count -= 1
+
+    def _fanout(self, tile: tuple, frame: bytes):
+        log = self._logs.get(tile)
+        if log is not None:
+            log.append(frame)
+
+    # --- Publicación (desde cualquier hilo) ---
+
+    def bodega_tile(self, bodega_id):
+        tile = self._bodega_tiles.get(bodega_id)
+        if tile is None:
+            db = SessionLocal()
+            try:
+                row = db.query(Bodega.latitude, Bodega.longitude).filter(Bodega.id == bodega_id).first()
+            finally:
+                db.close()
+            if row is None:
+                return None
+            tile = tile_of(row.latitude, row.longitude, self.tile_deg)
+            with self._lock:
+                self._bodega_tiles[bodega_id] = tile
+        return tile
+
+    def publish(self, bodega_id, event: str, data: dict, version=None):
+        """Evento de una bodega para su celda. Sin loop corriendo (scripts) no hace nada."""
+        loop = self._loop
+        if loop is None:
+            return
+        tile = self.bodega_tile(bodega_id)
+        if tile is None:
+            return
+        frame = sse_frame(event, {"bodega_id": str(bodega_id), **data, "version": version}, version)
+        self.published += 1
+        try:
+            loop.call_soon_threadsafe(self._fanout, tile, frame)
+        except RuntimeError:
+            # El loop se cerró (apagando el proceso)
+            pass
+
+    def snapshot(self) -> dict:
+        return {
+            "subscribers": self._count,
+            "tiles": len(self._logs),
+            "published": self.published,
+            "resyncs": self.resyncs,
+        }
+
+
+change_feed = ChangeBroker(
+    tile_deg=settings.CATALOG_TILE_DEG,
+    buffer_size=settings.CHANGE_FEED_BUFFER_SIZE,
+    max_subscribers=settings.CHANGE_FEED_MAX_SUBSCRIBERS,
+)
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+from collections import deque
+from datetime import datetime
+from app.core.config import settings
+from app.core.geo import tile_of
+from app.core.text_utils import normalize_text
+from app.db.session import SessionLocal
+from app.repositories.demand_repo import DemandRepository
+
+# Registro de demanda "write-behind": cada búsqueda deja un evento (intents, celda del vecino,
+# qué encontró y qué no) en un buffer en memoria y un writer en segundo plano lo inserta en
+# lotes en demand_events. El request nunca espera a la BD: si el buffer se llena (BD caída o
+# lenta) los eventos nuevos se descartan y se cuentan en /admin/metrics.
+
+
+def intent_label(intent: dict) -> str:
+    """Nombre legible de un intent: "Agua" + "con gas" -> "Agua con gas"."""
+    name = str(intent.get("product_name", "")).strip()
+    extras = " ".join(str(term) for term in intent.get("must_contain", []) or [])
+    return f"{name} {extras}".strip()
+
+
+class DemandLog:
+    def __init__(self, batch_size: int, flush_seconds: float, max_pending: int):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._loop = None
+        self._wakeup = None
+        self._task = None
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def record(self, intents: list, user_lat: float, user_lon: float, matched: set, bodegas_found: int, degraded: bool = False):
+        """Encola la búsqueda (intents y los índices de los que sí se encontraron). O(1), sin BD."""
+        if self._loop is None:
+            return
+        labels = [normalize_text(intent_label(intent)) for intent in intents]
+        tile_lat, tile_lon = tile_of(user_lat, user_lon)
+        row = {
+            "created_at": datetime.utcnow(),
+            "tile_lat": tile_lat,
+            "tile_lon": tile_lon,
+            "intents": intents,
+            "found": [label for i, label in enumerate(labels) if i in matched],
+            "missing": [label for i, label in enumerate(labels) if i not in matched],
+            "bodegas_found": bodegas_found,
+            "degraded": degraded,
+        }
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending.append(row)
+            self.recorded += 1
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    # --- Writer en segundo plano ---
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._writer())
+
+    async def stop(self):
+        """Deja de aceptar eventos y escribe lo que quedó pendiente."""
+        self._loop = None
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while await asyncio.to_thread(self._flush_batch):
+            pass
+
+    def _take_batch(self) -> list:
+        with self._lock:
+            n = min(self.batch_size, len(self._pending))
+            return [self._pending.popleft() for _ in range(n)]
+
+    def _flush_batch(self) -> int:
+        batch = self._take_batch()
+        if not batch:
+            return 0
+        db = SessionLocal()
+        try:
+            DemandRepository.insert_batch(db, batch)
+        except Exception as e:
+            # Se pierde el lote (es analítica, no vale reintentar a costa de la memoria)
+            db.rollback()
+            self.failed += len(batch)
+            print(f"⚠️ [DEMANDA] No se pudo guardar un lote de {len(batch)}: {e}")
+            return 0
+        finally:
+            db.close()
+        self.written += len(batch)
+        self.batches += 1
+        return len(batch)
+
+    async def _writer(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # Vaciamos de a lotes hasta que quede menos de un lote completo
+            while await asyncio.to_thread(self._flush_batch) >= self.batch_size:
+                pass
+
+    def snapshot(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "recorded": self.recorded,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+demand_log = DemandLog(
+    batch_size=settings.DEMAND_LOG_BATCH_SIZE,
+    flush_seconds=settings.DEMAND_LOG_FLUSH_SECONDS,
+    max_pending=settings.DEMAND_LOG_MAX_PENDING,
+)
@@ -1,9 +1,18 @@
 from google import genai
 from google.genai import types
 from app.core.config import settings
+from app.services.admission import admission, Overloaded
+from app.services.quota_ledger import QuotaLedger
+from app.services.hedging import HedgePolicy
+import asyncio
 import json
 import random
-import time
+
+
+def _is_quota_error(e: Exception) -> bool:
+    # Detectar error 429 (Resource Exhausted)
+    error_str = str(e)
+    return "429" in error_str or "RESOURCE_EXHAUSTED" in error_str
 
 class GeminiService:
     def __init__(self):
@@ -20,53 +29,149 @@ class GeminiService:
             "gemini-2.5-pro",
             "gemini-3-pro-preview"
         ]
-        self.current_model_index = 0
-
-    @property
-    def model_name(self):
-        """Devuelve el modelo actual de la rotación."""
-        return self.available_models[self.current_model_index]
-
-    def _rotate_model(self):
-        """Cambia al siguiente modelo en la lista."""
-        old_model = self.model_name
-        self.current_model_index = (self.current_model_index + 1) % len(self.available_models)
-        print(f"⚠️ [GEMINI] Cuota excedida en {old_model}. Cambiando a -> {self.model_name}")
+        # Cuotas compartidas entre todos los workers del host (archivo SQLite).
+        # Cada llamada elige de entrada un modelo con cupo en vez de descubrirlo a punta de 429.
+        self.quota = QuotaLedger(
+            path=settings.GEMINI_QUOTA_LEDGER_PATH,
+            models=self.available_models,
+            budget_per_minute=settings.GEMINI_MODEL_RPM,
+            default_budget=settings.GEMINI_DEFAULT_RPM,
+            cooldown_seconds=settings.GEMINI_EXHAUSTED_COOLDOWN_SECONDS,
+        )
+        # Presupuesto de hedging (percentil de latencias recientes) y estadísticas
+        self.hedge = HedgePolicy(
+            percentile_target=settings.GEMINI_HEDGE_PERCENTILE,
+            default_seconds=settings.GEMINI_HEDGE_DEFAULT_SECONDS,
+            min_seconds=settings.GEMINI_HEDGE_MIN_SECONDS,
+            max_seconds=settings.GEMINI_HEDGE_MAX_SECONDS,
+        )
 
     async def _execute_with_retry(self, func, *args, **kwargs):
         """
-        Ejecuta una función de Gemini. Si falla por cuota (429), rota el modelo y reintenta.
-        Intenta con TODOS los modelos disponibles antes de rendirse.
+        Ejecuta una función de Gemini con el modelo que el libro de cuotas le asigne.
+        `func` recibe el nombre del modelo como primer argumento.
+        Si falla por cuota (429), marca el modelo como agotado para todos los workers y
+        reintenta con el siguiente que tenga cupo. Sin cupo en ninguno lanza Overloaded("quota").
         """
-        attempts = 0
-        max_attempts = len(self.available_models)
+        tried = set()
 
-        while attempts < max_attempts:
+        while True:
+            # El libro es SQLite con BEGIN IMMEDIATE (puede esperar al lock): fuera del event loop
+            model = await asyncio.to_thread(self.quota.acquire, frozenset(tried))
+            if model is None:
+                break
+            tried.add(model)
             try:
-                # Ejecutamos la llamada al API
-                return func(*args, **kwargs)
-            
+                # Control de admisión: si el modelo está saturado lanza Overloaded (no reintentamos)
+                async with admission.model_slot(model):
+                    # Ejecutamos la llamada al API en un hilo para no bloquear el event loop
+                    return await asyncio.to_thread(func, model, *args, **kwargs)
+
+            except Overloaded:
+                raise
             except Exception as e:
-                error_str = str(e)
-                # Detectar error 429 (Resource Exhausted)
-                if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
-                    self._rotate_model()
-                    attempts += 1
-                    # Pequeña pausa para no saturar si rota muy rápido
-                    time.sleep(0.5) 
+                if _is_quota_error(e):
+                    await asyncio.to_thread(self.quota.mark_exhausted, model)
+                    print(f"⚠️ [GEMINI] Cuota excedida en {model}. Probando otro modelo...")
                 else:
                     # Si es otro error (ej. JSON mal formado, error de red), lanzarlo normal
                     raise e
         
         # Si probamos todos y fallaron
         print("❌ [GEMINI] Se agotaron las cuotas de TODOS los modelos disponibles.")
-        raise Exception("Servicio Gemini no disponible temporalmente (Cuota agotada).")
+        raise Overloaded("quota")
+
+    async def _call_model(self, afunc, model: str):
+        """Una llamada async (cancelable) a un modelo, con control de admisión y cuota."""
+        try:
+            async with admission.model_slot(model):
+                return await afunc(model)
+        except Overloaded:
+            raise
+        except Exception as e:
+            if _is_quota_error(e):
+                await asyncio.to_thread(self.quota.mark_exhausted, model)
+                print(f"⚠️ [GEMINI] Cuota excedida en {model}.")
+            raise
+
+    async def _execute_hedged(self, afunc):
+        """
+        Como _execute_with_retry pero con deadline y hedging:
+        - Si el primer modelo no respondió en `hedge.budget()` segundos, lanza la misma
+          llamada a otro modelo con cupo; gana la primera respuesta y la otra se cancela.
+        - Si se cumple GEMINI_HARD_TIMEOUT_SECONDS se cancela todo y se lanza
+          Overloaded("deadline") para que el endpoint responda en modo degradado.
+        - Sin cupo en ningún modelo (al empezar o tras un 429) lanza Overloaded("quota").
+        `afunc` es async y recibe el nombre del modelo.
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + settings.GEMINI_HARD_TIMEOUT_SECONDS
+        hedge_at = start + self.hedge.budget()
+        self.hedge.calls += 1
+
+        tried = set()
+        running = {}  # task -> (modelo, inicio de esa llamada)
+
+        async def launch() -> bool:
+            model = await asyncio.to_thread(self.quota.acquire, frozenset(tried))
+            if model is None:
+                return False
+            tried.add(model)
+            running[asyncio.ensure_future(self._call_model(afunc, model))] = (model, loop.time())
+            return True
 
-    async def interpret_search_intent(self, user_query: str, history: list) -> list:
+        if not await launch():
+            print("❌ [GEMINI] Se agotaron las cuotas de TODOS los modelos disponibles.")
+            raise Overloaded("quota")
+        first_model = next(iter(running.values()))[0]
+
+        hedged = False
+        last_error = None
+        try:
+            while running:
+                now = loop.time()
+                if now >= deadline:
+                    self.hedge.timeouts += 1
+                    print(f"⏱️ [GEMINI] Sin respuesta en {settings.GEMINI_HARD_TIMEOUT_SECONDS}s, modo degradado.")
+                    raise Overloaded("deadline")
+
+                wait_until = deadline if hedged else min(hedge_at, deadline)
+                done, _ = await asyncio.wait(running, timeout=wait_until - now, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    if not hedged and loop.time() >= hedge_at:
+                        hedged = True
+                        if await launch():
+                            self.hedge.hedged += 1
+                    continue
+
+                for task in done:
+                    model, started = running.pop(task)
+                    if task.exception() is None:
+                        # Latencia del intento que ganó: si ganó el hedge no cuenta la espera previa
+                        self.hedge.record_success(loop.time() - started, hedge_won=hedged and model != first_model)
+                        return task.result()
+                    last_error = task.exception()
+
+                if not running:
+                    # Todas las llamadas en vuelo fallaron: con 429 probamos otro modelo
+                    if isinstance(last_error, Overloaded) or not _is_quota_error(last_error):
+                        raise last_error
+                    if not await launch():
+                        raise Overloaded("quota")
+        finally:
+            # El perdedor (o todo, si venció el deadline) se cancela
+            for task in running:
+                task.cancel()
+
+    async def interpret_search_intent(self, user_query: str, history: list, summary: str = "") -> list:
         history_str = "\n".join([f"{msg['role']}: {msg['content']}" for msg in history[-6:]])
+        # El resumen solo va si hay algo que resumir (sesiones largas)
+        summary_str = f"\n        RESUMEN PREVIO: {summary}" if summary else ""
 
         prompt = f"""
-        Eres el cerebro de búsqueda de "Q-AIPE".
+        Eres el cerebro de búsqueda de "Q-AIPE".{summary_str}
         HISTORIAL: {history_str}
         INPUT USUARIO: "{user_query}"
         
@@ -90,16 +195,20 @@ class GeminiService:
         [{{"product_name": "Nombre", "quantity": 1, "must_contain": [], "must_not_contain": []}}]
         """
 
-        def _call_gemini():
-            response = self.client.models.generate_content(
-                model=self.model_name,
+        async def _call_gemini(model):
+            # Cliente async: si esta llamada pierde contra el hedge, se cancela de verdad
+            response = await self.client.aio.models.generate_content(
+                model=model,
                 contents=prompt,
                 config=types.GenerateContentConfig(response_mime_type="application/json")
             )
             return json.loads(response.text)
 
         try:
-            return await self._execute_with_retry(_call_gemini)
+            return await self._execute_hedged(_call_gemini)
+        except Overloaded:
+            # Que decida el endpoint: responde en modo degradado
+            raise
         except Exception as e:
             print(f"Error Gemini Intent Final: {e}")
             return []
@@ -112,38 +221,60 @@ class GeminiService:
         Reglas: Sé breve, amable, usa jerga peruana leve ("Vecino").
         """
         
-        def _call_gemini():
-            response = self.client.models.generate_content(
-                model=self.model_name, 
+        async def _call_gemini(model):
+            # Cliente async: al vencer el deadline la llamada se cancela y suelta su cupo
+            response = await self.client.aio.models.generate_content(
+                model=model,
                 contents=prompt,
                 config=types.GenerateContentConfig(response_mime_type="text/plain")
             )
             return response.text.strip()
 
         try:
-            return await self._execute_with_retry(_call_gemini)
+            # Tope duro (GEMINI_HARD_TIMEOUT_SECONDS): la respuesta del bot es opcional, los
+            # resultados ya están listos
+            return await self._execute_hedged(_call_gemini)
         except Exception:
             return "Aquí tienes los resultados, vecino."
 
-    async def process_bodeguero_audio(self, audio_file_path: str):
-        # Para archivos, la lógica es más compleja porque el archivo se sube.
-        # Por simplicidad, aquí intentamos con el modelo actual, si falla tocaría re-subir.
+    async def process_bodeguero_audio(self, audio_file_path: str, mime_type: str = None) -> dict:
+        """
+        Sube el audio UNA sola vez y lo interpreta. El archivo subido sirve para cualquier
+        modelo, así que si hay que cambiar de modelo por cuota no se vuelve a subir.
+        Devuelve {"action": "UPDATE_STOCK", "items": [{"product_name": ..., "stock": n}]}
+        o {"error": ...}. Lanza Overloaded si Gemini está saturado (el trabajo se reintenta).
+        """
+        uploaded = None
         try:
-            myfile = self.client.files.upload(path=audio_file_path)
-            prompt = """Identifica productos y cantidades. JSON: {"action": "UPDATE_STOCK", ...}"""
-            
-            def _call_gemini():
+            upload_config = types.UploadFileConfig(mime_type=mime_type) if mime_type else None
+            uploaded = await self.client.aio.files.upload(file=audio_file_path, config=upload_config)
+            prompt = """
+            Eres el asistente de inventario de una bodega peruana. El bodeguero dice por voz
+            cómo quedó su stock (ej: "me quedan 10 cocas", "se acabó el arroz", "llegaron 24 pilsen").
+            Identifica cada producto y la CANTIDAD FINAL en stock ("se acabó" = 0).
+            OUTPUT (JSON): {"action": "UPDATE_STOCK", "items": [{"product_name": "Coca Cola", "stock": 10}]}
+            """
+
+            def _call_gemini(model):
                 response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=[myfile, prompt],
+                    model=model,
+                    contents=[uploaded, prompt],
                     config=types.GenerateContentConfig(response_mime_type="application/json")
                 )
                 return json.loads(response.text)
 
             return await self._execute_with_retry(_call_gemini)
 
+        except Overloaded:
+            raise
         except Exception as e:
             print(f"Error audio: {e}")
             return {"error": "Error procesando audio"}
+        finally:
+            if uploaded is not None:
+                try:
+                    await self.client.aio.files.delete(name=uploaded.name)
+                except Exception:
+                    pass
 
 gemini_client = GeminiService()
\ No newline at end of file
@@ -0,0 +1,54 @@
+import threading
+from collections import deque
+from app.core.metrics import percentile
+
+# Política de "hedging" para las llamadas a Gemini que están en el camino del usuario.
+# Si la primera llamada no respondió dentro del presupuesto (un percentil de las latencias
+# recientes), se lanza una segunda a otro modelo rápido y gana la primera que responda.
+# Así la cola larga de latencia de un modelo no se convierte en la latencia de la búsqueda.
+
+
+class HedgePolicy:
+    WINDOW = 200
+    # Con menos muestras que esto usamos el presupuesto por defecto
+    MIN_SAMPLES = 20
+
+    def __init__(self, percentile_target: float, default_seconds: float, min_seconds: float, max_seconds: float):
+        self.percentile_target = percentile_target
+        self.default_seconds = default_seconds
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self._samples = deque(maxlen=self.WINDOW)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.primary_wins = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    def budget(self) -> float:
+        """Segundos a esperar antes de mandar la segunda llamada."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < self.MIN_SAMPLES:
+            return self.default_seconds
+        return min(self.max_seconds, max(self.min_seconds, percentile(samples, self.percentile_target)))
+
+    def record_success(self, seconds: float, hedge_won: bool):
+        with self._lock:
+            self._samples.append(seconds)
+            if hedge_won:
+                self.hedge_wins += 1
+            else:
+                self.primary_wins += 1
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_rate": round(self.hedged / self.calls, 3) if self.calls else 0.0,
+            "primary_wins": self.primary_wins,
+            "hedge_wins": self.hedge_wins,
+            "timeouts": self.timeouts,
+            "budget_ms": round(self.budget() * 1000, 1),
+        }
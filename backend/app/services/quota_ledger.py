@@ -0,0 +1,106 @@
+import sqlite3
+import threading
+import time
+
+# Libro de cuotas de Gemini compartido por todos los workers del mismo host.
+# Vive en un archivo SQLite (sin servicios externos): cada proceso reserva un request
+# en una transacción BEGIN IMMEDIATE, así dos workers nunca gastan el mismo cupo.
+# Por modelo guardamos: inicio de la ventana de 1 minuto, requests usados en esa
+# ventana y hasta cuándo está agotado (después de un 429).
+# Las llamadas bloquean (esperan el lock de SQLite hasta 5 s): desde código async se
+# llaman con asyncio.to_thread, nunca directo en el event loop.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS model_quota (
+    model TEXT PRIMARY KEY,
+    window_start REAL NOT NULL DEFAULT 0,
+    used INTEGER NOT NULL DEFAULT 0,
+    exhausted_until REAL NOT NULL DEFAULT 0
+)
+"""
+
+WINDOW_SECONDS = 60.0
+
+
+class QuotaLedger:
+    def __init__(self, path: str, models: list, budget_per_minute: dict, default_budget: int, cooldown_seconds: float):
+        self.path = path
+        self.models = list(models)
+        self.budget_per_minute = budget_per_minute
+        self.default_budget = default_budget
+        self.cooldown_seconds = cooldown_seconds
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.execute(SCHEMA)
+        conn.executemany("INSERT OR IGNORE INTO model_quota (model) VALUES (?)", [(m,) for m in self.models])
+
+    def _conn(self):
+        # Una conexión por hilo (asyncio.to_thread usa varios)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def budget(self, model: str) -> int:
+        return self.budget_per_minute.get(model, self.default_budget)
+
+    def acquire(self, exclude=()):
+        """
+        Reserva un request en el primer modelo (en orden de prioridad) que tenga cupo
+        y no esté agotado. Devuelve el nombre del modelo o None si no hay ninguno.
+        """
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = {
+                model: (window_start, used, exhausted_until)
+                for model, window_start, used, exhausted_until
+                in conn.execute("SELECT model, window_start, used, exhausted_until FROM model_quota")
+            }
+            for model in self.models:
+                if model in exclude or model not in rows:
+                    continue
+                window_start, used, exhausted_until = rows[model]
+                if exhausted_until > now:
+                    continue
+                if now - window_start >= WINDOW_SECONDS:
+                    window_start, used = now, 0
+                if used >= self.budget(model):
+                    continue
+                conn.execute(
+                    "UPDATE model_quota SET window_start = ?, used = ? WHERE model = ?",
+                    (window_start, used + 1, model)
+                )
+                conn.execute("COMMIT")
+                return model
+            conn.execute("COMMIT")
+            return None
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def mark_exhausted(self, model: str, cooldown_seconds: float = None):
+        """Un 429: todos los workers dejan de usar este modelo durante el cooldown."""
+        until = time.time() + (cooldown_seconds if cooldown_seconds is not None else self.cooldown_seconds)
+        self._conn().execute(
+            "UPDATE model_quota SET exhausted_until = MAX(exhausted_until, ?) WHERE model = ?", (until, model)
+        )
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        result = {}
+        for model, window_start, used, exhausted_until in self._conn().execute(
+            "SELECT model, window_start, used, exhausted_until FROM model_quota"
+        ):
+            in_window = now - window_start < WINDOW_SECONDS
+            result[model] = {
+                "used_this_minute": used if in_window else 0,
+                "budget_per_minute": self.budget(model),
+                "exhausted_for_seconds": max(0, round(exhausted_until - now, 1)),
+            }
+        return result
@@ -0,0 +1,66 @@
+import base64
+import heapq
+import json
+from typing import List
+from pydantic import TypeAdapter
+from app.schemas.api_schemas import Intent
+
+# Ranking y paginación de /search/smart.
+# Orden: más completa primero, luego más barata, y el bodega_id como desempate estable.
+# El cursor guarda la llave de la última bodega entregada (keyset) y los intents ya
+# interpretados, así "cargar más" no vuelve a llamar a Gemini. El cursor no va firmado:
+# los intents se validan al leerlo como si los mandara el cliente.
+
+_INTENTS = TypeAdapter(List[Intent])
+
+
+def rank_key(completeness: float, total: float, bodega_id) -> tuple:
+    return (-completeness, total, str(bodega_id))
+
+
+def encode_cursor(last_key: tuple, intents: list) -> str:
+    raw = json.dumps({"k": list(last_key), "i": intents}, separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    """Devuelve (last_key, intents) o None si el cursor no es válido."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        neg_completeness, total, bodega_id = data["k"]
+        intents = [intent.model_dump() for intent in _INTENTS.validate_python(data["i"])]
+        return (float(neg_completeness), float(total), str(bodega_id)), intents
+    except Exception:
+        return None
+
+
+def top_k_bodegas(filtered_results, n_keywords: int, limit: int, after_key: tuple = None):
+    """
+    Agrupa las filas (inv, prod, bodega, qty) por bodega calculando solo lo necesario para
+    rankear (cantidad de items y total) y selecciona las `limit` mejores con un heap acotado.
+    Devuelve (filas de la página, llave de la última bodega o None si no hay más).
+    """
+    groups = {}
+    for row in filtered_results:
+        inv, prod, bodega, qty = row
+        group = groups.get(bodega.id)
+        if group is None:
+            group = groups[bodega.id] = [[], 0.0]
+        group[0].append(row)
+        group[1] += float(inv.price) * qty
+
+    candidates = []
+    for bodega_id, (rows, total) in groups.items():
+        completeness = len(rows) / n_keywords * 100 if n_keywords else 0
+        key = rank_key(completeness, total, bodega_id)
+        if after_key is None or key > after_key:
+            candidates.append((key, rows))
+
+    # Pedimos uno extra para saber si hay siguiente página
+    page = heapq.nsmallest(limit + 1, candidates, key=lambda c: c[0])
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    page_rows = [row for _, rows in page for row in rows]
+    last_key = page[-1][0] if (page and has_more) else None
+    return page_rows, last_key
@@ -0,0 +1,122 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy.dialects.postgresql import insert
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.tables import ConversationSession
+
+# Historial de chat del lado del servidor.
+# Cada sesión guarda solo los últimos SESSION_MAX_MESSAGES mensajes; lo que se cae del
+# historial se resume en un texto corto (sin LLM) que va en el prompt como contexto.
+# El cliente solo manda el mensaje nuevo y su session_id.
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+def empty_session() -> dict:
+    return {"summary": "", "messages": []}
+
+
+def append_turn(session: dict, role: str, content: str) -> dict:
+    """Agrega un mensaje y recorta el historial, resumiendo lo que sale."""
+    session["messages"].append({"role": role, "content": content})
+    overflow = len(session["messages"]) - settings.SESSION_MAX_MESSAGES
+    if overflow > 0:
+        dropped = session["messages"][:overflow]
+        session["messages"] = session["messages"][overflow:]
+        # Del asistente no guardamos nada: lo que importa es qué pidió el vecino
+        asked = [m["content"][:60] for m in dropped if m["role"] == "user"]
+        if asked:
+            summary = "; ".join(filter(None, [session["summary"], *asked]))
+            session["summary"] = summary[-settings.SESSION_SUMMARY_MAX_CHARS:]
+    return session
+
+
+class InMemorySessionStore:
+    """LRU en memoria con expiración por TTL. Es por proceso (cada worker tiene la suya)."""
+
+    def __init__(self, max_sessions: int, ttl_seconds: int):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str):
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            expires_at, session = entry
+            if expires_at < time.monotonic():
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+            return {"summary": session["summary"], "messages": list(session["messages"])}
+
+    def save(self, session_id: str, session: dict):
+        with self._lock:
+            self._sessions[session_id] = (time.monotonic() + self.ttl_seconds, session)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+
+class DatabaseSessionStore:
+    """Sesiones persistentes en PostgreSQL (tabla conversation_sessions), compartidas entre workers."""
+
+    # Cada cuántos guardados se borran las sesiones vencidas
+    PURGE_EVERY = 500
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._saves = 0
+
+    def get(self, session_id: str):
+        db = SessionLocal()
+        try:
+            row = db.query(ConversationSession.summary, ConversationSession.messages)\
+                .filter(
+                    ConversationSession.session_id == session_id,
+                    ConversationSession.updated_at > datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+                ).first()
+            if row is None:
+                return None
+            return {"summary": row.summary or "", "messages": row.messages or []}
+        finally:
+            db.close()
+
+    def save(self, session_id: str, session: dict):
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            stmt = insert(ConversationSession).values(
+                session_id=session_id, summary=session["summary"], messages=session["messages"], updated_at=now
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[ConversationSession.session_id],
+                set_={"summary": stmt.excluded.summary, "messages": stmt.excluded.messages, "updated_at": now}
+            )
+            db.execute(stmt)
+
+            self._saves += 1
+            if self._saves % self.PURGE_EVERY == 0:
+                db.query(ConversationSession)\
+                    .filter(ConversationSession.updated_at < now - timedelta(seconds=self.ttl_seconds))\
+                    .delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+
+def build_session_store(backend: str):
+    if backend == "database":
+        return DatabaseSessionStore(ttl_seconds=settings.SESSION_TTL_SECONDS)
+    return InMemorySessionStore(max_sessions=settings.SESSION_MAX_SESSIONS, ttl_seconds=settings.SESSION_TTL_SECONDS)
+
+
+session_store = build_session_store(settings.SESSION_STORE_BACKEND)
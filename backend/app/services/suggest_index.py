@@ -0,0 +1,192 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+from collections import defaultdict
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.geo import tile_of, tiles_around
+from app.core.text_utils import normalize_text
+from app.db.session import SessionLocal
+from app.models.tables import MasterProduct, Bodega, StoreInventory
+
+# Autocompletado de productos para la caja de búsqueda (/search/suggest).
+# Todo vive en memoria: una lista ordenada de llaves normalizadas donde se busca el
+# prefijo con bisect, más contadores de disponibilidad por celda y de popularidad.
+# Por tecla no se toca la BD ni Gemini. Cada worker tiene su copia: los cambios hechos
+# en este proceso se aplican al instante y el resto llega con el refresco periódico.
+# El índice se arma en segundo plano al iniciar; hasta entonces no hay sugerencias.
+
+
+def _index_keys(text: str) -> list:
+    """Llaves de un texto: el texto completo y cada sufijo que empieza en una palabra
+    ("cerveza pilsen 620ml" -> también "pilsen 620ml" y "620ml")."""
+    norm = " ".join(re.findall(r"[a-z0-9.]+", normalize_text(text)))
+    if not norm:
+        return []
+    words = norm.split(" ")
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+class SuggestIndex:
+    def __init__(self, refresh_seconds: int, max_candidates: int):
+        self.refresh_seconds = refresh_seconds
+        self.max_candidates = max_candidates
+        self._keys = []             # [(llave, product_id)] ordenada
+        self._products = {}         # product_id -> {"name", "category"}
+        self._bodega_tiles = {}     # bodega_id -> celda
+        self._in_stock = set()      # {(bodega_id, product_id)} con stock
+        self._availability = defaultdict(lambda: defaultdict(int))  # product_id -> {celda: bodegas con stock}
+        self._popularity = defaultdict(int)  # product_id -> veces que salió en resultados
+        self._built_at = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+
+    # --- Construcción ---
+
+    def rebuild(self):
+        """Carga productos, bodegas e inventario con stock (3 consultas) y reemplaza el índice."""
+        db = SessionLocal()
+        try:
+            products = db.execute(select(MasterProduct.id, MasterProduct.name, MasterProduct.category, MasterProduct.synonyms)).all()
+            bodegas = db.execute(select(Bodega.id, Bodega.latitude, Bodega.longitude)).all()
+            offers = db.execute(
+                select(StoreInventory.bodega_id, StoreInventory.product_id)
+                .where(StoreInventory.stock_quantity > 0, StoreInventory.is_available.isnot(False))
+            ).all()
+        finally:
+            db.close()
+
+        keys = []
+        product_info = {}
+        for row in products:
+            product_info[row.id] = {"name": row.name, "category": row.category}
+            for text in [row.name, *(row.synonyms or [])]:
+                keys.extend((key, row.id) for key in _index_keys(text))
+        keys = sorted(set(keys))
+
+        bodega_tiles = {row.id: tile_of(row.latitude, row.longitude) for row in bodegas}
+        in_stock = set()
+        availability = defaultdict(lambda: defaultdict(int))
+        for bodega_id, product_id in offers:
+            in_stock.add((bodega_id, product_id))
+            availability[product_id][bodega_tiles.get(bodega_id)] += 1
+
+        with self._lock:
+            self._keys = keys
+            self._products = product_info
+            self._bodega_tiles = bodega_tiles
+            self._in_stock = in_stock
+            self._availability = availability
+            self._built_at = time.monotonic()
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception as e:
+            print(f"⚠️ No se pudo refrescar el índice de sugerencias: {e}")
+        finally:
+            self._rebuilding = False
+
+    def start_rebuild(self) -> bool:
+        """Reconstruye en un hilo si no hay otra reconstrucción en curso (una sola a la vez)."""
+        with self._lock:
+            if self._rebuilding:
+                return False
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+        return True
+
+    def _ensure_fresh(self):
+        # Nunca se construye dentro del request: al arrancar (lo lanza el lifespan) se responde
+        # sin sugerencias hasta que termine, y si está vencido se sigue con el índice actual
+        stale = self._built_at is None or time.monotonic() - self._built_at > self.refresh_seconds
+        if stale and not self._rebuilding:
+            self.start_rebuild()
+
+    # --- Cambios incrementales (los llaman los endpoints que escriben) ---
+
+    def add_product(self, product_id: int, name: str, category: str = None, synonyms: list = None):
+        with self._lock:
+            self._products[product_id] = {"name": name, "category": category}
+            # Copia y cambio de referencia: suggest() recorre self._keys sin lock y nunca
+            # tiene que ver la lista a medio insertar
+            keys = list(self._keys)
+            for text in [name, *(synonyms or [])]:
+                for key in _index_keys(text):
+                    entry = (key, product_id)
+                    pos = bisect.bisect_left(keys, entry)
+                    if pos == len(keys) or keys[pos] != entry:
+                        keys.insert(pos, entry)
+            self._keys = keys
+
+    def set_in_stock(self, bodega_id, product_id: int, in_stock: bool):
+        with self._lock:
+            pair = (bodega_id, product_id)
+            if in_stock == (pair in self._in_stock):
+                return
+            tile = self._bodega_tiles.get(bodega_id)
+            if in_stock:
+                self._in_stock.add(pair)
+                self._availability[product_id][tile] += 1
+            else:
+                self._in_stock.discard(pair)
+                self._availability[product_id][tile] -= 1
+
+    def record_hits(self, product_ids):
+        """Popularidad: cuántas veces salió el producto en resultados de búsqueda."""
+        with self._lock:
+            for product_id in product_ids:
+                self._popularity[product_id] += 1
+
+    # --- Consulta ---
+
+    def suggest(self, prefix: str, user_lat: float = None, user_lon: float = None, limit: int = 8) -> list:
+        """
+        Productos cuyo nombre o sinónimo tiene una palabra que empieza con `prefix`.
+        Orden: bodegas con stock cerca, luego bodegas con stock en total, luego popularidad.
+        """
+        norm = " ".join(re.findall(r"[a-z0-9.]+", normalize_text(prefix)))
+        if len(norm) < 2:
+            return []
+        self._ensure_fresh()
+
+        keys = self._keys
+        candidates = []
+        seen = set()
+        pos = bisect.bisect_left(keys, (norm,))
+        while pos < len(keys) and len(candidates) < self.max_candidates:
+            key, product_id = keys[pos]
+            if not key.startswith(norm):
+                break
+            if product_id not in seen:
+                seen.add(product_id)
+                candidates.append(product_id)
+            pos += 1
+
+        nearby_tiles = tiles_around(user_lat, user_lon, 1.5) if user_lat is not None and user_lon is not None else []
+
+        def score(product_id):
+            per_tile = self._availability.get(product_id, {})
+            nearby = sum(per_tile.get(tile, 0) for tile in nearby_tiles)
+            return (nearby, sum(per_tile.values()), self._popularity.get(product_id, 0), -len(self._products[product_id]["name"]))
+
+        # Los contadores cambian con set_in_stock/record_hits: se leen bajo el lock
+        # (son a lo más max_candidates productos)
+        with self._lock:
+            best = heapq.nlargest(limit, ((score(pid), pid) for pid in candidates if pid in self._products))
+            return [
+                {
+                    "product_id": product_id,
+                    "name": self._products[product_id]["name"],
+                    "category": self._products[product_id]["category"],
+                    "nearby_bodegas": nearby,
+                }
+                for (nearby, _, _, _), product_id in best
+            ]
+
+
+suggest_index = SuggestIndex(
+    refresh_seconds=settings.SUGGEST_REFRESH_SECONDS, max_candidates=settings.SUGGEST_MAX_CANDIDATES
+)
@@ -0,0 +1,202 @@
+import re
+import threading
+import time
+from typing import NamedTuple
+from sqlalchemy import select, func
+from app.core.config import settings
+from app.core.text_utils import normalize_text, product_search_texts
+from app.db.session import SessionLocal
+from app.models.tables import MasterProduct
+
+# Planificador de términos para search_products_smart.
+# Antes cada keyword se partía en palabras y se hacía OR de todas contra cuatro columnas:
+# "Coca Cola sin azúcar" traía medio catálogo por "cola" o "sin" y el filtro de Python lo
+# descartaba después. El filtro solo se queda con productos que contienen el keyword completo
+# (normalizado) en su nombre, categoría, atributos o algún sinónimo, así que aquí se resuelve
+# eso mismo en memoria y a SQL solo va la lista de product_id candidatos:
+#   - Índice invertido token -> productos, con la frecuencia de cada token en el catálogo.
+#   - Los tokens del keyword se cruzan del más selectivo al menos selectivo; los que están en
+#     más de TERM_PLANNER_MAX_DF del catálogo ("sin", "de", "cola" en un catálogo de gaseosas)
+#     no se cruzan, solo se verifican al final con el texto completo.
+#   - Si aun así quedan más de TERM_PLANNER_MAX_CANDIDATES, el keyword va por el camino de
+#     siempre (ILIKE en SQL): una lista tan grande no ahorra nada.
+# Cada worker tiene su copia. Los productos que entraron después de construir el índice
+# (version > marca de agua) se siguen buscando con ILIKE, así nunca se pierde un producto nuevo.
+# El índice se arma en segundo plano al iniciar; mientras tanto plan() devuelve None (ILIKE).
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class TermPlan(NamedTuple):
+    product_ids: list   # productos que cumplen el keyword según el índice
+    watermark: int      # versión del catálogo con la que se armó el índice
+
+
+class TermPlanner:
+    def __init__(self, refresh_seconds: int, max_df: float, max_candidates: int):
+        self.refresh_seconds = refresh_seconds
+        self.max_df = max_df
+        self.max_candidates = max_candidates
+        self._postings = {}      # token -> {product_id}
+        self._texts = {}         # product_id -> textos de product_search_texts
+        self._token_matches = {}  # token del keyword -> productos con algún token que lo contiene
+        self._watermark = 0          # productos con versión mayor van por ILIKE
+        self._indexed_version = 0    # hasta qué versión se leyó el catálogo
+        self._built_at = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self.plans = 0
+        self.fallbacks = 0
+        self.dropped_tokens = 0
+        self.candidates = 0
+
+    # --- Construcción ---
+
+    def rebuild(self):
+        """Lee el catálogo (una consulta) y reemplaza el índice."""
+        db = SessionLocal()
+        try:
+            watermark = db.execute(select(func.coalesce(func.max(MasterProduct.version), 0))).scalar()
+            products = db.execute(select(
+                MasterProduct.id, MasterProduct.name, MasterProduct.category,
+                MasterProduct.attributes, MasterProduct.synonyms,
+            ).where(MasterProduct.version <= watermark)).all()
+        finally:
+            db.close()
+
+        postings, texts = {}, {}
+        for row in products:
+            texts[row.id] = product_search_texts(row.name, row.category, row.attributes, row.synonyms)
+            for token in self._product_tokens(texts[row.id]):
+                postings.setdefault(token, set()).add(row.id)
+
+        with self._lock:
+            self._postings = postings
+            self._texts = texts
+            self._token_matches = {}
+            # Un INSERT que estaba en curso al leer puede tener una versión menor que `watermark`
+            # y no haber salido en la consulta: la marca para el ILIKE es la del índice anterior
+            # (para entonces esas transacciones ya terminaron y quedan indexadas aquí)
+            self._watermark = self._indexed_version if self._built_at is not None else watermark
+            self._indexed_version = watermark
+            self._built_at = time.monotonic()
+
+    @staticmethod
+    def _product_tokens(texts: tuple) -> set:
+        name_norm, category_norm, attrs_text, synonyms_norm, _ = texts
+        tokens = set()
+        for text in (name_norm, category_norm, attrs_text, *synonyms_norm):
+            tokens.update(_TOKEN_RE.findall(text))
+        return tokens
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception as e:
+            print(f"⚠️ No se pudo refrescar el planificador de términos: {e}")
+        finally:
+            self._rebuilding = False
+
+    def start_rebuild(self) -> bool:
+        """Reconstruye en un hilo si no hay otra reconstrucción en curso (una sola a la vez)."""
+        with self._lock:
+            if self._rebuilding:
+                return False
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+        return True
+
+    def _ensure_fresh(self):
+        # Nunca se construye dentro del request: al arrancar (lo lanza el lifespan) se usa el
+        # ILIKE hasta que termine, y si está vencido se sigue con el índice actual
+        stale = self._built_at is None or time.monotonic() - self._built_at > self.refresh_seconds
+        if stale and not self._rebuilding:
+            self.start_rebuild()
+
+    def add_product(self, product_id: int, name: str, category: str = None, attributes: dict = None, synonyms: list = None):
+        """Producto creado en este proceso: entra al índice sin esperar el refresco."""
+        if self._built_at is None:
+            return
+        texts = product_search_texts(name, category, attributes, synonyms)
+        with self._lock:
+            self._texts[product_id] = texts
+            for token in self._product_tokens(texts):
+                # Copia en vez de mutar: puede haber un plan leyendo el set en otro hilo
+                self._postings[token] = self._postings.get(token, set()) | {product_id}
+            self._token_matches = {}
+
+    # --- Planificación ---
+
+    def _matches(self, token: str) -> set:
+        """
+        Productos con algún token que contiene a `token` (el filtro compara substrings:
+        "cola" también está en "cocacola"). Se cachea por token del keyword.
+        """
+        cache = self._token_matches
+        found = cache.get(token)
+        if found is None:
+            found = set()
+            for indexed, ids in list(self._postings.items()):
+                if token in indexed:
+                    found |= ids
+            if len(cache) >= 4096:
+                cache.clear()
+            cache[token] = found
+        return found
+
+    def plan(self, keyword: str):
+        """TermPlan con los productos candidatos del keyword, o None para usar el ILIKE de siempre."""
+        self._ensure_fresh()
+        self.plans += 1
+        phrase = normalize_text(keyword)
+        tokens = set(_TOKEN_RE.findall(phrase))
+        if not tokens or not self._texts:
+            self.fallbacks += 1
+            return None
+
+        # Del token más selectivo al menos selectivo
+        n_products = len(self._texts)
+        ranked = sorted(((self._matches(token), token) for token in tokens), key=lambda pair: len(pair[0]))
+        candidates = ranked[0][0]
+        for ids, token in ranked[1:]:
+            if len(ids) > self.max_df * n_products:
+                # Poco selectivo: no vale la pena cruzarlo, lo cubre la verificación de abajo
+                self.dropped_tokens += 1
+                continue
+            candidates = candidates & ids
+            if not candidates:
+                break
+
+        # Misma regla que el filtro de /search/smart: el keyword completo en algún texto
+        texts = self._texts
+        product_ids = []
+        for product_id in candidates:
+            name_norm, category_norm, attrs_text, synonyms_norm, _ = texts[product_id]
+            if (phrase in name_norm or phrase in category_norm or phrase in attrs_text
+                    or any(phrase in s for s in synonyms_norm)):
+                product_ids.append(product_id)
+
+        if len(product_ids) > self.max_candidates:
+            self.fallbacks += 1
+            return None
+        self.candidates += len(product_ids)
+        return TermPlan(sorted(product_ids), self._watermark)
+
+    def snapshot(self) -> dict:
+        indexed = self.plans - self.fallbacks
+        return {
+            "products": len(self._texts),
+            "tokens": len(self._postings),
+            "watermark": self._watermark,
+            "plans": self.plans,
+            "fallbacks": self.fallbacks,
+            "dropped_tokens": self.dropped_tokens,
+            "avg_candidates": round(self.candidates / indexed, 1) if indexed else 0,
+        }
+
+
+term_planner = TermPlanner(
+    refresh_seconds=settings.TERM_PLANNER_REFRESH_SECONDS,
+    max_df=settings.TERM_PLANNER_MAX_DF,
+    max_candidates=settings.TERM_PLANNER_MAX_CANDIDATES,
+)
@@ -0,0 +1,204 @@
+import asyncio
+import contextlib
+import os
+import re
+from datetime import timedelta
+from sqlalchemy import update, func
+from app.core.config import settings
+from app.core.text_utils import normalize_text
+from app.db.session import SessionLocal
+from app.models.tables import VoiceJob
+from app.repositories.bodeguero_repo import BodegueroRepository
+from app.services.admission import Overloaded
+from app.services.gemini_service import gemini_client
+from app.services.suggest_index import suggest_index
+from app.services.change_feed import change_feed
+
+# Actualización de stock por voz, en segundo plano.
+# El endpoint solo guarda el audio en disco y crea la fila en voice_jobs (PENDING); un pool
+# de workers dentro del proceso lo sube una vez a Gemini, interpreta los productos y aplica
+# todos los cambios de stock en un solo UPDATE. Como el estado vive en la BD, al reiniciar
+# se retoman los trabajos pendientes (y los que quedaron a medias). Si Gemini sigue saturado
+# el trabajo se reintenta hasta VOICE_MAX_ATTEMPTS veces y después queda FAILED.
+
+
+def match_inventory_item(spoken_name: str, inventory: list):
+    """
+    Producto del inventario que mejor coincide con lo dicho ("coca cola" -> "Coca Cola 1.5L").
+    Gana el que contiene más palabras de lo dicho; en empate, el nombre más corto.
+    """
+    words = [w for w in re.findall(r"[a-z0-9.]+", normalize_text(spoken_name)) if len(w) > 2]
+    if not words:
+        return None
+    best, best_key = None, None
+    for row in inventory:
+        name_norm = normalize_text(row.name)
+        hits = sum(1 for w in words if w in name_norm)
+        if hits == 0:
+            continue
+        key = (hits, -len(name_norm))
+        if best_key is None or key > best_key:
+            best, best_key = row, key
+    return best
+
+
+def apply_voice_changes(bodega_id, parsed: dict) -> dict:
+    """Traduce lo interpretado a {product_id: stock} y lo aplica en un solo UPDATE."""
+    db = SessionLocal()
+    try:
+        inventory = BodegueroRepository.get_inventory_for_bodega(db, bodega_id)
+        changes, names, unmatched = {}, {}, []
+        for item in parsed.get("items", []) or []:
+            spoken = str(item.get("product_name", ""))
+            stock = item.get("stock", item.get("quantity"))
+            row = match_inventory_item(spoken, inventory)
+            if row is None or not isinstance(stock, (int, float)) or stock < 0:
+                unmatched.append(spoken)
+                continue
+            changes[row.product_id] = stock
+            names[row.product_id] = row.name
+
+        rows = BodegueroRepository.set_stock_many(db, bodega_id, changes)
+    finally:
+        db.close()
+
+    for row in rows:
+        suggest_index.set_in_stock(bodega_id, row.product_id, row.stock_quantity > 0)
+        change_feed.publish(bodega_id, "stock", {"product_id": row.product_id, "stock": float(row.stock_quantity)}, row.version)
+    return {
+        "applied": [
+            {"product_id": row.product_id, "name": names[row.product_id], "new_stock": float(row.stock_quantity), "version": row.version}
+            for row in rows
+        ],
+        "unmatched": unmatched,
+    }
+
+
+class VoiceJobRunner:
+    def __init__(self, workers: int, retry_seconds: float, stale_seconds: float, max_attempts: int):
+        self.workers = workers
+        self.retry_seconds = retry_seconds
+        self.stale_seconds = stale_seconds
+        self.max_attempts = max_attempts
+        self.queue = None
+        self._tasks = []
+
+    # --- BD (síncrono, se corre en hilos) ---
+
+    def _recover_pending(self) -> list:
+        """Trabajos a retomar: los PENDING y los PROCESSING que quedaron colgados."""
+        db = SessionLocal()
+        try:
+            # updated_at lo pone la BD con now(): comparamos con su reloj, no con el de Python
+            stale_before = func.now() - timedelta(seconds=self.stale_seconds)
+            db.execute(
+                update(VoiceJob)
+                .where(VoiceJob.status == "PROCESSING", VoiceJob.updated_at < stale_before)
+                .values(status="PENDING")
+            )
+            job_ids = [job_id for (job_id,) in db.query(VoiceJob.id).filter(VoiceJob.status == "PENDING").order_by(VoiceJob.created_at)]
+            db.commit()
+            return job_ids
+        finally:
+            db.close()
+
+    def _claim(self, job_id):
+        """
+        PENDING -> PROCESSING de forma atómica (otro worker/proceso no lo toma dos veces).
+        Cuenta el intento; attempts en la fila devuelta ya lo incluye.
+        """
+        db = SessionLocal()
+        try:
+            row = db.execute(
+                update(VoiceJob)
+                .where(VoiceJob.id == job_id, VoiceJob.status == "PENDING")
+                .values(status="PROCESSING", attempts=VoiceJob.attempts + 1)
+                .returning(VoiceJob.bodega_id, VoiceJob.audio_path, VoiceJob.content_type, VoiceJob.attempts)
+            ).first()
+            db.commit()
+            return row
+        finally:
+            db.close()
+
+    def _finish(self, job_id, status: str, result: dict = None, error: str = None):
+        db = SessionLocal()
+        try:
+            values = {"status": status, "result": result, "error": error}
+            if status != "PENDING":
+                values["audio_path"] = None
+            db.execute(update(VoiceJob).where(VoiceJob.id == job_id).values(**values))
+            db.commit()
+        finally:
+            db.close()
+
+    # --- Workers ---
+
+    async def start(self):
+        os.makedirs(settings.VOICE_SPOOL_DIR, exist_ok=True)
+        self.queue = asyncio.Queue()
+        for job_id in await asyncio.to_thread(self._recover_pending):
+            self.queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def enqueue(self, job_id):
+        if self.queue is not None:
+            self.queue.put_nowait(job_id)
+        # Sin workers corriendo (ej. scripts) el trabajo queda PENDING en la BD y se
+        # retoma en el próximo arranque
+
+    async def _worker(self):
+        while True:
+            job_id = await self.queue.get()
+            try:
+                await self.process(job_id)
+            except Exception as e:
+                print(f"❌ [VOZ] Error en el trabajo {job_id}: {e}")
+                await asyncio.to_thread(self._finish, job_id, "FAILED", None, str(e))
+            finally:
+                self.queue.task_done()
+
+    async def process(self, job_id):
+        job = await asyncio.to_thread(self._claim, job_id)
+        if job is None:
+            return
+
+        retry = False
+        try:
+            try:
+                parsed = await gemini_client.process_bodeguero_audio(job.audio_path, job.content_type)
+            except Overloaded as e:
+                if job.attempts < self.max_attempts:
+                    # Gemini saturado: vuelve a la cola más tarde, el audio sigue en disco
+                    retry = True
+                    await asyncio.to_thread(self._finish, job_id, "PENDING")
+                    asyncio.get_running_loop().call_later(self.retry_seconds, self.enqueue, job_id)
+                else:
+                    print(f"❌ [VOZ] Trabajo {job_id}: Gemini saturado en {job.attempts} intentos, se descarta")
+                    await asyncio.to_thread(self._finish, job_id, "FAILED", None, f"Gemini saturado ({e.reason}) en {job.attempts} intentos")
+                return
+
+            if "error" in parsed:
+                await asyncio.to_thread(self._finish, job_id, "FAILED", None, parsed["error"])
+            else:
+                result = await asyncio.to_thread(apply_voice_changes, job.bodega_id, parsed)
+                await asyncio.to_thread(self._finish, job_id, "DONE", result)
+                print(f"🎙️ [VOZ] Trabajo {job_id}: {len(result['applied'])} cambios, {len(result['unmatched'])} sin coincidencia")
+        finally:
+            # Terminado (bien o mal): el audio ya no hace falta
+            if not retry and job.audio_path:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(job.audio_path)
+
+
+voice_jobs = VoiceJobRunner(
+    workers=settings.VOICE_WORKERS,
+    retry_seconds=settings.VOICE_RETRY_SECONDS,
+    stale_seconds=settings.VOICE_STALE_SECONDS,
+    max_attempts=settings.VOICE_MAX_ATTEMPTS,
+)
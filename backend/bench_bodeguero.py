@@ -0,0 +1,82 @@
+import sys
+import os
+import time
+import argparse
+
+# Ajuste de ruta para que encuentre la carpeta 'app'
+sys.path.append(os.getcwd())
+
+from app.db.session import SessionLocal
+from app.models.tables import User, Bodega, StoreInventory, MasterProduct
+from app.repositories.bodeguero_repo import BodegueroRepository
+from app.core.metrics import percentile
+
+# Latencia de los endpoints del bodeguero contra la BD configurada:
+#   antes  -> my-inventory con 3 consultas seguidas / toggle-stock con 2 SELECT + UPDATE ORM
+#   ahora  -> bodega_id desde el token: una consulta / un UPDATE ... RETURNING
+# Usa el primer bodeguero con inventario (corre antes load_fixtures.py o reset_db.py).
+
+
+def legacy_inventory(db, user_id):
+    user = db.query(User).filter(User.id == user_id).first()
+    bodega = db.query(Bodega).filter(Bodega.owner_id == user.id).first()
+    return db.query(StoreInventory, MasterProduct)\
+        .join(MasterProduct, StoreInventory.product_id == MasterProduct.id)\
+        .filter(StoreInventory.bodega_id == bodega.id).all()
+
+
+def legacy_toggle(db, user_id, product_id, in_stock):
+    bodega = db.query(Bodega).filter(Bodega.owner_id == user_id).first()
+    item = db.query(StoreInventory).filter(
+        StoreInventory.bodega_id == bodega.id, StoreInventory.product_id == product_id
+    ).first()
+    item.stock_quantity = 50 if in_stock else 0
+    db.commit()
+
+
+def new_inventory(db, bodega_id):
+    return BodegueroRepository.get_inventory_for_bodega(db, bodega_id)
+
+
+def new_toggle(db, bodega_id, product_id, in_stock):
+    BodegueroRepository.set_stock(db, bodega_id, product_id, 50 if in_stock else 0)
+
+
+def measure(label, fn, repeat):
+    samples = []
+    for i in range(repeat):
+        db = SessionLocal()
+        try:
+            start = time.perf_counter()
+            fn(db, i)
+            samples.append(time.perf_counter() - start)
+        finally:
+            db.close()
+    samples.sort()
+    print(f"   {label:<28} p50 {percentile(samples, 50) * 1000:7.2f} ms   p95 {percentile(samples, 95) * 1000:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de los endpoints del bodeguero")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    row = db.query(Bodega.owner_id, Bodega.id, StoreInventory.product_id)\
+        .join(StoreInventory, StoreInventory.bodega_id == Bodega.id).first()
+    db.close()
+    if row is None:
+        print("❌ No hay bodegas con inventario. Carga datos primero.")
+        return
+    user_id, bodega_id, product_id = row
+
+    print("⏱️  GET /my-inventory")
+    measure("antes (3 consultas)", lambda db, i: legacy_inventory(db, user_id), args.repeat)
+    measure("ahora (1 consulta)", lambda db, i: new_inventory(db, bodega_id), args.repeat)
+    print("⏱️  POST /toggle-stock")
+    measure("antes (2 SELECT + UPDATE)", lambda db, i: legacy_toggle(db, user_id, product_id, i % 2 == 0), args.repeat)
+    measure("ahora (UPDATE ... RETURNING)", lambda db, i: new_toggle(db, bodega_id, product_id, i % 2 == 0), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import sys
+import os
+import gzip
+import time
+import argparse
+
+# Ajuste de ruta para que encuentre la carpeta 'app'
+sys.path.append(os.getcwd())
+
+from app.core.geo import tiles_around
+from app.db.bulk_loader import DEFAULT_CENTER
+from app.services.catalog_tiles import CatalogTileCache
+
+# Costo de servir el catálogo de un barrio a muchos clientes (/catalog):
+#   primera vez -> se arma el bundle (consultas + JSON + gzip) una vez por celda y versión
+#   después     -> consulta de versión cacheada + bytes ya comprimidos del LRU
+# Necesita datos: python load_fixtures.py --generate --bodegas 1000 --products 2000 --per-bodega 100 --reset
+
+USER_LAT, USER_LON = DEFAULT_CENTER
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de bundles de catálogo por celda")
+    parser.add_argument("--radius-km", type=float, default=1.5)
+    parser.add_argument("--clients", type=int, default=2000, help="Sincronizaciones simuladas del mismo barrio")
+    parser.add_argument("--tile-deg", type=float, default=0.015)
+    args = parser.parse_args()
+
+    cache = CatalogTileCache(tile_deg=args.tile_deg, version_ttl_seconds=2.0, max_bundles=512)
+    tiles = tiles_around(USER_LAT, USER_LON, args.radius_km, args.tile_deg)
+
+    start = time.perf_counter()
+    sizes = []
+    for tile in tiles:
+        _, _, body = cache.bundle(tile)
+        sizes.append((len(body), len(gzip.decompress(body))))
+    build_ms = (time.perf_counter() - start) * 1000
+    gz, raw = sum(s[0] for s in sizes), sum(s[1] for s in sizes)
+    print(f"🧱 {len(tiles)} celdas armadas en {build_ms:.1f} ms  ({raw / 1e6:.2f} MB JSON -> {gz / 1e6:.2f} MB gzip)")
+
+    start = time.perf_counter()
+    for i in range(args.clients):
+        for tile in tiles:
+            cache.bundle(tile)
+    per_client_ms = (time.perf_counter() - start) * 1000 / args.clients
+    print(f"⚡ {args.clients} clientes: {per_client_ms:.3f} ms por sincronización completa desde el cache")
+    print(f"📊 {cache.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
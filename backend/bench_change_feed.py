@@ -0,0 +1,108 @@
+import sys
+import os
+import time
+import uuid
+import asyncio
+import argparse
+import threading
+
+# Ajuste de ruta para que encuentre la carpeta 'app'
+sys.path.append(os.getcwd())
+
+from app.core.metrics import percentile
+from app.services.change_feed import ChangeBroker, RESYNC_FRAME
+
+# Prueba de carga local del reparto de cambios en vivo (/catalog/events), sin red ni BD:
+# N suscriptores en la misma celda leyendo el buffer y un hilo que publica como lo harían
+# los endpoints de escritura. Mide:
+#   - cuánto tarda publish() en el hilo del que escribe (no debe crecer con N)
+#   - latencia de entrega publish -> suscriptor (p50/p99)
+#   - que los clientes lentos (no leen nunca) reciban "resync" sin frenar al resto
+#     ("resync rápidos" debería quedar en 0)
+# Ejemplo: python bench_change_feed.py --subscribers 100 1000 5000 10000
+
+TILE = (-539, -5275)
+
+
+async def run(n_subscribers: int, n_events: int, rate: float, slow_fraction: float, buffer_size: int):
+    broker = ChangeBroker(tile_deg=0.015, buffer_size=buffer_size, max_subscribers=n_subscribers)
+    broker.start()
+    bodega_id = uuid.uuid4()
+    broker._bodega_tiles[bodega_id] = TILE
+
+    n_slow = int(n_subscribers * slow_fraction)
+    subs = [broker.subscribe([TILE]) for _ in range(n_subscribers)]
+    published_at = {}
+    delivery = []
+    resyncs = 0
+    done = asyncio.Event()
+    remaining = [n_subscribers - n_slow]
+
+    async def consume(sub):
+        nonlocal resyncs
+        received = 0
+        while received < n_events:
+            frame = await sub.next_frame(5.0)
+            if frame is None:
+                break
+            if frame is RESYNC_FRAME:
+                resyncs += 1
+                break
+            # Puede venir más de un evento juntos (todo lo acumulado desde la última lectura)
+            now = time.perf_counter()
+            for event in frame.split(b"\n\n")[:-1]:
+                delivery.append(now - published_at[event[:event.index(b"\n")]])
+                received += 1
+        remaining[0] -= 1
+        if remaining[0] == 0:
+            done.set()
+
+    consumers = [asyncio.create_task(consume(sub)) for sub in subs[n_slow:]]
+
+    publish_times = []
+
+    def writer():
+        for i in range(n_events):
+            start = time.perf_counter()
+            published_at[f"id: {i + 1}".encode()] = start
+            broker.publish(bodega_id, "stock", {"product_id": i % 50, "stock": float(i % 7)}, i + 1)
+            publish_times.append(time.perf_counter() - start)
+            time.sleep(1 / rate)
+
+    start = time.perf_counter()
+    thread = threading.Thread(target=writer)
+    thread.start()
+    await asyncio.wait_for(done.wait(), timeout=120)
+    elapsed = time.perf_counter() - start
+    thread.join()
+    for task in consumers:
+        task.cancel()
+
+    # Los lentos nunca leyeron: al despertar solo encuentran el resync
+    slow_resyncs = 0
+    for sub in subs[:n_slow]:
+        if await sub.next_frame(0.01) is RESYNC_FRAME:
+            slow_resyncs += 1
+    publish_times.sort()
+    delivery.sort()
+    print(f"   {n_subscribers:>6} subs  publish p50 {percentile(publish_times, 50) * 1e6:6.1f} µs  p99 {percentile(publish_times, 99) * 1e6:6.1f} µs  "
+          f"entrega p50 {percentile(delivery, 50) * 1000:7.2f} ms  p99 {percentile(delivery, 99) * 1000:7.2f} ms  "
+          f"{len(delivery) / elapsed:>9.0f} eventos/s  lentos con resync {slow_resyncs}/{n_slow}  resync rápidos {resyncs}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del reparto de cambios en vivo por celda")
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[100, 1000, 5000, 10000])
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=200.0, help="Eventos por segundo que publica el escritor")
+    parser.add_argument("--slow-fraction", type=float, default=0.01, help="Fracción de clientes que nunca leen")
+    parser.add_argument("--buffer-size", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"📡 {args.events} eventos a {args.rate:.0f}/s, {args.slow_fraction:.0%} de clientes lentos, buffer de {args.buffer_size} por celda")
+    for n in args.subscribers:
+        asyncio.run(run(n, args.events, args.rate, args.slow_fraction, args.buffer_size))
+
+
+if __name__ == "__main__":
+    main()
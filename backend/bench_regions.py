@@ -0,0 +1,109 @@
+import sys
+import os
+import time
+import argparse
+
+# Ajuste de ruta para que encuentre la carpeta 'app'
+sys.path.append(os.getcwd())
+
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.regions import all_regions
+from app.db.session import SessionLocal, engine
+from app.db.base import Base
+from app.db.bulk_loader import generate_fixtures, load_fixtures, DEFAULT_CENTER
+from app.db.partitions import partition_counts
+from app.repositories.inventory_repo import InventoryRepository
+
+# Costo de buscar en una ciudad a medida que se suman ciudades (BORRA la BD en cada paso).
+# Cada paso recrea las tablas con N ciudades sintéticas del mismo tamaño (regiones propias en
+# settings.REGIONS, una partición cada una) y busca desde el centro de la primera:
+#   con región -> lo que hace la app: solo las particiones que toca el radio
+#   sin región -> todas las particiones (lo mismo que leer una tabla sin particionar)
+# Los resultados tienen que ser iguales; el tiempo con región debería quedarse plano.
+# Ejemplo:
+#   python bench_regions.py --cities 1,2,4,8 --bodegas-per-city 500
+
+QUERIES = [["gaseosa"], ["arroz", "aceite"], ["agua"]]
+
+CITY_STEP_DEG = 1.0   # Separación entre ciudades sintéticas
+CITY_BOX_DEG = 0.15   # Medio lado de la caja de cada región
+
+
+def city_centers(n: int) -> list:
+    return [(DEFAULT_CENTER[0] - i * CITY_STEP_DEG, DEFAULT_CENTER[1] + i * CITY_STEP_DEG / 2) for i in range(n)]
+
+
+def load_cities(n: int, args):
+    centers = city_centers(n)
+    # Las regiones se leen de settings en cada llamada: el paso define su propio mapa
+    settings.REGIONS = {
+        f"ciudad_{i}": [lat - CITY_BOX_DEG, lat + CITY_BOX_DEG, lon - CITY_BOX_DEG, lon + CITY_BOX_DEG]
+        for i, (lat, lon) in enumerate(centers)
+    }
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        load_fixtures(db, generate_fixtures(
+            n_bodegas=args.bodegas_per_city * n, n_products=args.products,
+            per_bodega=args.per_bodega, centers=centers, seed=args.seed,
+        ))
+    finally:
+        db.close()
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE"))
+        return sum(rows for _, rows in partition_counts(conn))
+
+
+def timed_search(db, keywords, lat, lon, regions, repeat):
+    times, rows = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = InventoryRepository.search_products_smart(db, keywords, lat, lon, regions=regions)
+        times.append(time.perf_counter() - start)
+    found = {(bodega.id, prod.id) for _, prod, bodega in rows}
+    return sorted(times)[len(times) // 2] * 1000, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de búsqueda con inventario particionado por región")
+    parser.add_argument("--cities", default="1,2,4,8", help="Cantidades de ciudades a probar")
+    parser.add_argument("--bodegas-per-city", type=int, default=500)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--per-bodega", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    ok = True
+    print(f"{'ciudades':>8} {'inventario':>11} {'particiones':>11} {'con región':>11} {'sin región':>11}")
+    for n in [int(c) for c in args.cities.split(",")]:
+        inventory_rows = load_cities(n, args)
+        lat, lon = city_centers(n)[0]
+        routed = InventoryRepository.regions_near(lat, lon)
+
+        db = SessionLocal()
+        try:
+            routed_ms = all_ms = 0.0
+            for keywords in QUERIES:
+                # Una pasada para calentar caches antes de medir cualquiera de los dos modos
+                InventoryRepository.search_products_smart(db, keywords, lat, lon, regions=all_regions())
+                ms, routed_found = timed_search(db, keywords, lat, lon, None, args.repeat)
+                routed_ms += ms
+                ms, all_found = timed_search(db, keywords, lat, lon, all_regions(), args.repeat)
+                all_ms += ms
+                if routed_found != all_found:
+                    ok = False
+                    print(f"   ❌ {keywords}: {len(routed_found)} resultados con región vs {len(all_found)} sin región")
+        finally:
+            db.close()
+        print(f"{n:>8} {inventory_rows:>11} {len(routed):>4}/{len(all_regions()):<6} {routed_ms:>8.1f} ms {all_ms:>8.1f} ms")
+
+    if not ok:
+        sys.exit(1)
+    print("✅ Mismos resultados leyendo solo la región del vecino")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import sys
+import os
+import time
+import random
+import argparse
+
+# Ajuste de ruta para que encuentre la carpeta 'app'
+sys.path.append(os.getcwd())
+
+from app.db.session import SessionLocal
+from app.db.bulk_loader import DEFAULT_CENTER
+from app.schemas.api_schemas import BatchSearchItem
+from app.repositories.inventory_repo import InventoryRepository
+from app.services.attribute_filters import attribute_vocabulary, compile_intent
+from app.services.search_ranking import top_k_bodegas
+from app.services.term_planner import term_planner
+from app.api.endpoints.search import run_search_batch, filter_intent_rows, build_bodega_results
+
+# Lista de compras guardada ("lo de siempre") resuelta de dos formas, sin Gemini:
+#   separado -> una /search/smart por producto (consulta + filtro + ranking cada una)
+#   lote     -> /search/batch: una consulta para todos los keywords y distancias compartidas
+# Compara el tiempo total y que cada búsqueda devuelva las mismas bodegas con los mismos productos.
+# Necesita datos: python load_fixtures.py --generate --bodegas 1000 --products 2000 --per-bodega 100 --reset
+
+SHOPPING_LIST = [
+    [{"product_name": "Gaseosa", "quantity": 2}],
+    [{"product_name": "Arroz", "quantity": 1}],
+    [{"product_name": "Agua", "quantity": 3, "must_contain": ["sin gas"]}],
+    [{"product_name": "Leche", "quantity": 2}],
+    [{"product_name": "Cerveza", "quantity": 6}],
+    [{"product_name": "Galletas", "quantity": 1}],
+    [{"product_name": "Aceite", "quantity": 1}, {"product_name": "Azucar", "quantity": 1}],
+    [{"product_name": "Fideos", "quantity": 2}],
+]
+
+
+def separate(db, searches, resolved):
+    vocabulary = attribute_vocabulary.ensure_loaded(db)
+    out = []
+    for item, (intent_items, _) in zip(searches, resolved):
+        keywords = [intent.get("product_name", "") for intent in intent_items]
+        compiled = [compile_intent(intent, vocabulary) for intent in intent_items]
+        raw = InventoryRepository.search_products_smart(db, keywords, item.user_lat, item.user_lon, attribute_filters=compiled,
+                                                        term_plans=[term_planner.plan(k) for k in keywords])
+        filtered, matched_by_bodega = filter_intent_rows(raw, intent_items, compiled)
+        page_rows, _ = top_k_bodegas(filtered, len(keywords), item.limit)
+        results, _, _ = build_bodega_results(page_rows, len(keywords), item.user_lat, item.user_lon, matched_by_bodega=matched_by_bodega)
+        out.append(results)
+    return out
+
+
+def batched(db, searches, resolved):
+    return [entry["results"] for entry in run_search_batch(db, searches, resolved)]
+
+
+def canonical(results_per_search):
+    """Mismas bodegas, en el mismo orden, con los mismos productos (el orden de las filas que
+    devuelve Postgres no está fijado, así que el orden de found_items y el redondeo del total
+    pueden variar)."""
+    return [
+        [(r["bodega_id"], round(r["total_price"], 2), sorted(i["product_id"] for i in r["found_items"])) for r in results]
+        for results in results_per_search
+    ]
+
+
+def measure(fn, searches, resolved, repeat):
+    times, result = [], None
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            start = time.perf_counter()
+            result = fn(db, searches, resolved)
+            times.append(time.perf_counter() - start)
+        finally:
+            db.close()
+    return sorted(times)[len(times) // 2] * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de búsquedas separadas vs /search/batch")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--scatter-m", type=float, default=0.0,
+                        help="Dispersión de la ubicación entre búsquedas (0 = todas desde el mismo punto)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # En la app lo arma el lifespan en segundo plano; aquí lo necesitamos listo
+    term_planner.rebuild()
+    rng = random.Random(7)
+    deg = args.scatter_m / 111_000
+    for size in args.sizes:
+        resolved = [(SHOPPING_LIST[i % len(SHOPPING_LIST)], False) for i in range(size)]
+        searches = [
+            BatchSearchItem(intents=intents, user_lat=DEFAULT_CENTER[0] + rng.uniform(-deg, deg),
+                            user_lon=DEFAULT_CENTER[1] + rng.uniform(-deg, deg))
+            for intents, _ in resolved
+        ]
+        sep_ms, sep_results = measure(separate, searches, resolved, args.repeat)
+        batch_ms, batch_results = measure(batched, searches, resolved, args.repeat)
+        same = canonical(sep_results) == canonical(batch_results)
+        print(f"   {size:>3} búsquedas  separado {sep_ms:8.1f} ms ({sep_ms / size:6.1f}/búsqueda)  "
+              f"lote {batch_ms:8.1f} ms ({batch_ms / size:6.1f}/búsqueda)  x{sep_ms / max(batch_ms, 1e-9):.1f}  "
+              f"{'✅ mismos resultados' if same else '❌ RESULTADOS DISTINTOS'}")
+
+
+if __name__ == "__main__":
+    main()
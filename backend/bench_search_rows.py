@@ -0,0 +1,100 @@
+import sys
+import os
+import time
+import argparse
+import tracemalloc
+
+# Ajuste de ruta para que encuentre la carpeta 'app'
+sys.path.append(os.getcwd())
+
+from sqlalchemy import or_, cast, String
+from app.db.session import SessionLocal
+from app.db.bulk_loader import DEFAULT_CENTER
+from app.models.tables import StoreInventory, MasterProduct, Bodega
+from app.repositories.inventory_repo import InventoryRepository
+
+# Memoria y CPU por cada 10k filas de search_products_smart:
+#   antes  -> entidades ORM completas (StoreInventory, MasterProduct, Bodega) con identity map
+#   ahora  -> columnas proyectadas en NamedTuples, producto/bodega compartidos entre filas
+# Necesita datos: python load_fixtures.py --generate --bodegas 1000 --products 2000 --per-bodega 100 --reset
+
+KEYWORDS = ["gaseosa", "arroz", "agua", "cerveza", "leche", "galletas"]
+USER_LAT, USER_LON = DEFAULT_CENTER
+
+
+def old_search(db, keywords, max_dist_km):
+    """Réplica del camino anterior: entidades completas y distancia por fila."""
+    search_terms = set()
+    for k in keywords:
+        search_terms.add(k)
+        for word in k.split():
+            if len(word) > 2:
+                search_terms.add(word)
+    query = db.query(StoreInventory, MasterProduct, Bodega)\
+        .join(MasterProduct, StoreInventory.product_id == MasterProduct.id)\
+        .join(Bodega, StoreInventory.bodega_id == Bodega.id)\
+        .filter(or_(Bodega.manual_override == 'OPEN', Bodega.manual_override.is_(None)))
+    conditions = []
+    for term in search_terms:
+        pattern = f"%{term}%"
+        conditions.append(MasterProduct.name.ilike(pattern))
+        conditions.append(MasterProduct.category.ilike(pattern))
+        conditions.append(cast(MasterProduct.synonyms, String).ilike(pattern))
+        conditions.append(cast(MasterProduct.attributes, String).ilike(pattern))
+    query = query.filter(or_(*conditions))
+    final_results = []
+    for inv, prod, bodega in query.all():
+        if InventoryRepository.haversine(USER_LON, USER_LAT, bodega.longitude, bodega.latitude) <= max_dist_km:
+            final_results.append((inv, prod, bodega))
+    return final_results
+
+
+def new_search(db, keywords, max_dist_km):
+    return InventoryRepository.search_products_smart(db, keywords, USER_LAT, USER_LON, max_dist_km=max_dist_km)
+
+
+def measure(label, fn, repeat):
+    # CPU (sin tracemalloc, que lo distorsiona)
+    cpu = []
+    n_rows = 0
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            start = time.process_time()
+            n_rows = len(fn(db))
+            cpu.append(time.process_time() - start)
+        finally:
+            db.close()
+
+    # Memoria retenida por el resultado (incluye el identity map de la sesión)
+    db = SessionLocal()
+    try:
+        tracemalloc.start()
+        result = fn(db)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+    finally:
+        db.close()
+
+    per_10k = 10000 / max(n_rows, 1)
+    cpu_ms = sorted(cpu)[len(cpu) // 2] * 1000
+    print(f"   {label:<26} {n_rows:>7} filas  CPU {cpu_ms * per_10k:8.1f} ms/10k  "
+          f"memoria {current * per_10k / 1e6:7.2f} MB/10k  (pico {peak * per_10k / 1e6:7.2f} MB/10k)")
+    return cpu_ms * per_10k, current * per_10k
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de filas ORM vs proyectadas en la búsqueda")
+    parser.add_argument("--radius-km", type=float, default=50.0, help="Radio grande para traer muchas filas")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"🔎 Keywords: {KEYWORDS}")
+    old_cpu, old_mem = measure("antes (entidades ORM)", lambda db: old_search(db, KEYWORDS, args.radius_km), args.repeat)
+    new_cpu, new_mem = measure("ahora (NamedTuple)", lambda db: new_search(db, KEYWORDS, args.radius_km), args.repeat)
+    print(f"⚡ CPU x{old_cpu / max(new_cpu, 1e-9):.1f}, memoria x{old_mem / max(new_mem, 1e-9):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import sys
+import os
+import gzip
+import json
+import time
+import uuid
+import argparse
+from types import SimpleNamespace
+
+# Ajuste de ruta para que encuentre la carpeta 'app'
+sys.path.append(os.getcwd())
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from app.schemas.api_schemas import ProductItem, BodegaSearchResult, SmartSearchResponse
+from app.api.endpoints.search import build_bodega_results, humanize_attributes
+from app.repositories.inventory_repo import InventoryRepository
+
+# Mide tamaño del payload y CPU por respuesta de /search/smart:
+#   antes  -> ProductItem/BodegaSearchResult + re-validación por response_model + json.dumps
+#   ahora  -> dicts planos + ORJSONResponse (normal y compacto), con y sin gzip
+# No toca la BD ni Gemini: arma filas falsas con la misma forma que devuelve el repositorio.
+
+USER_LAT, USER_LON = -8.0783, -79.1180
+
+
+def fake_rows(n_bodegas: int, items_per_bodega: int):
+    rows = []
+    for b in range(n_bodegas):
+        bodega = SimpleNamespace(id=uuid.uuid4(), name=f"Bodega {b}", latitude=-8.07 - b * 0.0001, longitude=-79.11)
+        for i in range(items_per_bodega):
+            prod = SimpleNamespace(
+                id=i, name=f"Gaseosa Marca {i} 1.5L", category="Bebidas", default_unit="botella", synonyms=["gaseosa"],
+                attributes={"marca": f"Marca {i}", "gas": True, "tamaño": "1.5L", "retornable": False, "sabor": "original"},
+            )
+            inv = SimpleNamespace(price=6.5 + i * 0.1, stock_quantity=20)
+            rows.append((inv, prod, bodega, 1))
+    return rows
+
+
+def old_path(rows, n_keywords):
+    """Réplica del camino anterior: modelos Pydantic + validación de FastAPI + json.dumps."""
+    bodegas_map = {}
+    for inv, prod, bodega, qty in rows:
+        if bodega.id not in bodegas_map:
+            bodegas_map[bodega.id] = {"bodega": bodega, "items": [], "total": 0.0}
+        bodegas_map[bodega.id]["items"].append(ProductItem(
+            product_id=prod.id, name=prod.name, price=inv.price, stock=inv.stock_quantity,
+            unit=prod.default_unit or "UND", attributes=prod.attributes, requested_quantity=qty
+        ))
+        bodegas_map[bodega.id]["total"] += (float(inv.price) * qty)
+
+    response_list = []
+    for bid, data in bodegas_map.items():
+        for item in data["items"]:
+            humanize_attributes(item.attributes)
+        dist_km = InventoryRepository.haversine(USER_LON, USER_LAT, float(data["bodega"].longitude), float(data["bodega"].latitude))
+        response_list.append(BodegaSearchResult(
+            bodega_id=data["bodega"].id, name=data["bodega"].name,
+            latitude=float(data["bodega"].latitude), longitude=float(data["bodega"].longitude),
+            distance_meters=int(dist_km * 1000), is_open=True,
+            completeness_score=len(data["items"]) / n_keywords * 100, total_price=data["total"],
+            found_items=data["items"], missing_items=[]
+        ))
+    response_list.sort(key=lambda x: (-x.completeness_score, x.total_price))
+    response = SmartSearchResponse(message="Aquí tienes, vecino.", results=response_list)
+
+    # Lo que hace FastAPI con response_model: validar de nuevo y codificar
+    validated = SmartSearchResponse.model_validate(response.model_dump())
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False).encode("utf-8")
+
+
+def new_path(rows, n_keywords, compact):
+    response_list, _, product_attributes = build_bodega_results(rows, n_keywords, USER_LAT, USER_LON, compact=compact)
+    payload = {"message": "Aquí tienes, vecino.", "results": response_list}
+    if compact:
+        payload["product_attributes"] = product_attributes
+    return ORJSONResponse(content=payload).body
+
+
+def measure(label, fn, repeat):
+    body = fn()
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    cpu_ms = (time.process_time() - start) * 1000 / repeat
+    gz = len(gzip.compress(body))
+    print(f"   {label:<22} {len(body):>9,} bytes  {gz:>8,} gzip  {cpu_ms:8.2f} ms CPU/respuesta")
+    return cpu_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de serialización de /search/smart")
+    parser.add_argument("--bodegas", type=int, default=30)
+    parser.add_argument("--items", type=int, default=10, help="Items por bodega")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = fake_rows(args.bodegas, args.items)
+    n_keywords = args.items
+    print(f"📏 {args.bodegas} bodegas x {args.items} items ({len(rows)} filas)")
+    before = measure("antes (pydantic x2)", lambda: old_path(rows, n_keywords), args.repeat)
+    after = measure("ahora (orjson)", lambda: new_path(rows, n_keywords, False), args.repeat)
+    compact = measure("ahora (compacto)", lambda: new_path(rows, n_keywords, True), args.repeat)
+    print(f"⚡ Speedup CPU: x{before / max(after, 1e-9):.1f} (normal), x{before / max(compact, 1e-9):.1f} (compacto)")
+
+
+if __name__ == "__main__":
+    main()
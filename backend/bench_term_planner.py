@@ -0,0 +1,88 @@
+import sys
+import os
+import time
+import argparse
+
+# Ajuste de ruta para que encuentre la carpeta 'app'
+sys.path.append(os.getcwd())
+
+from app.db.session import SessionLocal
+from app.db.bulk_loader import DEFAULT_CENTER
+from app.repositories.inventory_repo import InventoryRepository
+from app.services.attribute_filters import attribute_vocabulary, compile_intent
+from app.services.term_planner import term_planner
+from app.api.endpoints.search import filter_intent_rows
+
+# Filas que cruzan de Postgres a Python por búsqueda, con y sin el planificador de términos:
+#   antes -> OR de cada palabra del keyword (ILIKE en cuatro columnas)
+#   ahora -> product_id de los candidatos del índice invertido
+# Para cada consulta verifica que el filtro de /search/smart se quede con lo mismo (o más:
+# el índice compara sin tildes, el ILIKE no) y nunca con menos.
+# Necesita datos: python load_fixtures.py --generate --bodegas 1000 --products 2000 --per-bodega 100 --reset
+
+USER_LAT, USER_LON = DEFAULT_CENTER
+
+QUERIES = [
+    [{"product_name": "Coca Cola sin azúcar"}],
+    [{"product_name": "Gaseosa Coca Cola"}],
+    [{"product_name": "Agua de Mesa", "must_contain": ["sin gas"]}],
+    [{"product_name": "Leche Gloria"}],
+    [{"product_name": "Papel Higienico"}],
+    [{"product_name": "Arroz"}, {"product_name": "Aceite Primor"}],
+    [{"product_name": "cerveza pilsen 1L"}],
+    [{"product_name": "atun"}],
+    [{"product_name": "Inca Kola 500ml"}],
+]
+
+
+def run(db, intents, planned: bool):
+    vocabulary = attribute_vocabulary.ensure_loaded(db)
+    keywords = [intent.get("product_name", "") for intent in intents]
+    compiled = [compile_intent(intent, vocabulary) for intent in intents]
+    plans = [term_planner.plan(k) for k in keywords] if planned else None
+    start = time.perf_counter()
+    raw = InventoryRepository.search_products_smart(db, keywords, USER_LAT, USER_LON,
+                                                    attribute_filters=compiled, term_plans=plans)
+    filtered, _ = filter_intent_rows(raw, intents, compiled)
+    elapsed = time.perf_counter() - start
+    kept = {(bodega.id, prod.id) for _, prod, bodega, _ in filtered}
+    return len(raw), kept, elapsed
+
+
+def median_run(db, intents, planned, repeat):
+    runs = [run(db, intents, planned) for _ in range(repeat)]
+    n_raw, kept, _ = runs[0]
+    return n_raw, kept, sorted(r[2] for r in runs)[len(runs) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del planificador de términos de búsqueda")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        term_planner.rebuild()
+        print(f"🧭 Índice armado en {(time.perf_counter() - start) * 1000:.0f} ms: {term_planner.snapshot()}")
+        total_old = total_new = 0
+        ok = True
+        for intents in QUERIES:
+            label = " + ".join(intent["product_name"] + "".join(f" [{t}]" for t in intent.get("must_contain", [])) for intent in intents)
+            old_raw, old_kept, old_ms = median_run(db, intents, False, args.repeat)
+            new_raw, new_kept, new_ms = median_run(db, intents, True, args.repeat)
+            total_old += old_ms
+            total_new += new_ms
+            lost = old_kept - new_kept
+            ok = ok and not lost
+            print(f"   {label:<34} filas {old_raw:>6} -> {new_raw:>6}  resultados {len(old_kept):>5} -> {len(new_kept):>5}  "
+                  f"{old_ms:7.1f} -> {new_ms:6.1f} ms  {'✅' if not lost else f'❌ perdió {len(lost)}'}")
+        print(f"⚡ Total {total_old:.0f} ms -> {total_new:.0f} ms (x{total_old / max(total_new, 1e-9):.1f})  {term_planner.snapshot()}")
+        if not ok:
+            sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,78 @@
 import sys
 import os
+import argparse
 
 # Ajuste de ruta para que encuentre la carpeta 'app'
 sys.path.append(os.getcwd())
 
+from sqlalchemy import func
 from app.db.session import SessionLocal
-from app.models.tables import MasterProduct, Bodega, StoreInventory
+from app.models.tables import MasterProduct
+from app.services.admin_stats import iter_stats
 
-db = SessionLocal()
+# Diagnóstico de la BD con SQL agregado (lo mismo que GET /admin/stats): cada sección se
+# imprime apenas termina, con una muestra corta de filas para ir a revisar. Ya no carga
+# tablas completas ni hace consultas por fila, así que sirve con millones de filas.
+# Ejemplos:
+#   python check_db.py
+#   python check_db.py --sample 3 --price-factor 3 --search arroz
+
+TITLES = {
+    "tables": "📋 FILAS POR TABLA",
+    "bodegas_without_inventory": "🏪 BODEGAS SIN INVENTARIO",
+    "products_without_stores": "📦 PRODUCTOS QUE NINGUNA BODEGA VENDE",
+    "price_outliers": "💸 PRECIOS FUERA DE RANGO",
+    "inventory_anomalies": "📊 STOCK Y PRECIOS RAROS",
+    "orphans": "🧩 FILAS HUÉRFANAS",
+}
+
+
+def print_section(entry: dict):
+    print(f"\n{TITLES.get(entry['section'], entry['section'])}  ({entry['ms']:.0f} ms)")
+    if "error" in entry:
+        print(f"   ❌ {entry['error']}")
+        return
+    data = dict(entry["data"])
+    sample = data.pop("sample", None)
+    for key, value in data.items():
+        print(f"   - {key}: {value}")
+    for row in sample or []:
+        print("     · " + " | ".join(f"{k}: {v:.2f}" if isinstance(v, float) else f"{k}: {v}" for k, v in row.items()))
+
+
+def search_probe(term: str, limit: int):
+    """Cuántos productos tienen `term` en el nombre (el viejo "PRUEBA DE BÚSQUEDA")."""
+    db = SessionLocal()
+    try:
+        pattern = f"%{term}%"
+        total = db.query(func.count(MasterProduct.id)).filter(MasterProduct.name.ilike(pattern)).scalar()
+        names = db.query(MasterProduct.name).filter(MasterProduct.name.ilike(pattern)).order_by(MasterProduct.id).limit(limit).all()
+    finally:
+        db.close()
+    print(f"\n🕵️ PRUEBA DE BÚSQUEDA '{term}': {total} productos")
+    for (name,) in names:
+        print(f"     · {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diagnóstico agregado de la base de datos")
+    parser.add_argument("--sample", type=int, default=None, help="Filas de muestra por hallazgo")
+    parser.add_argument("--price-factor", type=float, default=None, help="Veces la mediana para marcar un precio")
+    parser.add_argument("--max-stock", type=float, default=None, help="Stock a partir del cual se marca")
+    parser.add_argument("--timeout-ms", type=int, default=None, help="Tiempo máximo por sección")
+    parser.add_argument("--search", help="Además, cuántos productos tienen este texto en el nombre")
+    args = parser.parse_args()
 
-def diagnostico():
     print("📋 --- DIAGNÓSTICO DE BASE DE DATOS ---")
-    
-    # 1. VERIFICAR BODEGAS
-    bodegas = db.query(Bodega).all()
-    print(f"\n🏪 BODEGAS ENCONTRADAS: {len(bodegas)}")
-    for b in bodegas:
-        print(f"   - ID: {b.id} | Nombre: {b.name} | Estado: {b.manual_override}")
-        print(f"     📍 Coordenadas: {b.latitude}, {b.longitude}")
-
-    # 2. VERIFICAR PRODUCTOS
-    productos = db.query(MasterProduct).all()
-    print(f"\n📦 PRODUCTOS MAESTROS: {len(productos)}")
-    for p in productos:
-        print(f"   - ID: {p.id} | Nombre: '{p.name}' | Sinónimos: {p.synonyms}")
-
-    # 3. VERIFICAR INVENTARIO (La relación)
-    stock = db.query(StoreInventory).all()
-    print(f"\n📊 STOCK DISPONIBLE: {len(stock)}")
-    for s in stock:
-        # Buscamos nombres para mostrar claro
-        prod_name = db.query(MasterProduct.name).filter(MasterProduct.id == s.product_id).scalar()
-        bodega_name = db.query(Bodega.name).filter(Bodega.id == s.bodega_id).scalar()
-        print(f"   - {bodega_name} tiene: {prod_name} (Precio: S/{s.price})")
-
-    # 4. PRUEBA DE BÚSQUEDA "ARROZ" (Simulando lo que falla)
-    print("\n🕵️ PRUEBA DE BÚSQUEDA 'Arroz':")
-    term = "%Arroz%"
-    found = db.query(MasterProduct).filter(MasterProduct.name.ilike(term)).all()
-    print(f"   -> Buscando '%Arroz%' en nombres: Encontrados {len(found)}")
-    for f in found:
-        print(f"      - Coincidencia: {f.name}")
+    for entry in iter_stats(args.sample, args.price_factor, args.max_stock, args.timeout_ms):
+        print_section(entry)
+        sys.stdout.flush()
+    if args.search:
+        search_probe(args.search, args.sample if args.sample is not None else 10)
+
 
 if __name__ == "__main__":
     try:
-        diagnostico()
+        main()
     except Exception as e:
         print(f"❌ Error leyendo la BD: {e}")
-    finally:
-        db.close()
\ No newline at end of file
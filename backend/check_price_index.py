@@ -0,0 +1,103 @@
+import sys
+import os
+import time
+import threading
+
+# Ajuste de ruta para que encuentre la carpeta 'app'
+sys.path.append(os.getcwd())
+
+from sqlalchemy import text
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.repositories.price_index_repo import PriceIndexRepository
+
+# Prueba de concurrencia del refresh incremental del índice de precios (necesita datos cargados).
+# Dos sesiones refrescan el mismo (producto, celda) desde dos bodegas de esa celda:
+#   - la primera refresca y deja su transacción abierta HOLD_SECONDS
+#   - la segunda refresca mientras tanto: tiene que esperar y entrar después del commit
+# Sin el lock por celda la segunda insertaba las mismas filas que la primera (llave duplicada).
+# Al final la celda tiene que quedar igual que antes y con a lo más PRICE_INDEX_TOP_N ofertas.
+# No cambia datos: los refresh recalculan lo mismo que ya había.
+
+HOLD_SECONDS = 1.0
+
+_SHARED_TILE = """
+SELECT si.product_id, floor(b.latitude / :deg)::int AS tile_lat, floor(b.longitude / :deg)::int AS tile_lon,
+       array_agg(b.id ORDER BY b.id) AS bodega_ids
+FROM store_inventory si
+JOIN bodegas b ON b.id = si.bodega_id AND b.region = si.region
+GROUP BY 1, 2, 3
+HAVING count(*) >= 2
+ORDER BY count(*) DESC, 1
+LIMIT 1
+"""
+
+_TILE_ROWS = """
+SELECT bodega_id, price, stock_quantity FROM price_index
+WHERE product_id = :product_id AND tile_lat = :tile_lat AND tile_lon = :tile_lon
+ORDER BY price, bodega_id
+"""
+
+
+def tile_rows(db, case) -> list:
+    return [tuple(row) for row in db.execute(text(_TILE_ROWS), case)]
+
+
+def second_refresh(bodega_id, product_id, outcome):
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        PriceIndexRepository.refresh_for_bodega(db, bodega_id, [product_id])
+        db.commit()
+        outcome["waited"] = time.perf_counter() - start
+    except Exception as e:
+        db.rollback()
+        outcome["error"] = e
+    finally:
+        db.close()
+
+
+def main():
+    print("🔒 --- PRUEBA DE CONCURRENCIA DEL ÍNDICE DE PRECIOS ---")
+    db = SessionLocal()
+    try:
+        found = db.execute(text(_SHARED_TILE), {"deg": settings.PRICE_INDEX_TILE_DEG}).mappings().first()
+        if found is None:
+            print("⚠️ No hay dos bodegas con el mismo producto en una celda (¿cargaste datos?)")
+            sys.exit(1)
+        case = {"product_id": found["product_id"], "tile_lat": found["tile_lat"], "tile_lon": found["tile_lon"]}
+        first_bodega, second_bodega = found["bodega_ids"][:2]
+        before = tile_rows(db, case)
+        print(f"   - Producto {case['product_id']}, bodegas {first_bodega} y {second_bodega}: {len(before)} ofertas en la celda")
+
+        # Sesión 1: refresca y se queda con la transacción abierta
+        PriceIndexRepository.refresh_for_bodega(db, first_bodega, [case["product_id"]])
+        outcome = {}
+        worker = threading.Thread(target=second_refresh, args=(second_bodega, case["product_id"], outcome))
+        worker.start()
+        time.sleep(HOLD_SECONDS)
+        db.commit()
+        worker.join()
+        after = tile_rows(db, case)
+    finally:
+        db.close()
+
+    ok = True
+    if "error" in outcome:
+        ok = False
+        print(f"❌ La segunda sesión falló: {outcome['error']}")
+    else:
+        waited = outcome["waited"]
+        if waited < HOLD_SECONDS * 0.8:
+            ok = False
+        print(f"   - La segunda sesión esperó {waited:.2f}s (la primera tuvo el lock {HOLD_SECONDS:.2f}s)")
+    if after != before or len(after) > settings.PRICE_INDEX_TOP_N:
+        ok = False
+        print(f"❌ La celda quedó distinta: {len(before)} ofertas antes, {len(after)} después")
+
+    print("✅ Refresh concurrentes en fila, sin llaves duplicadas" if ok else "❌ El refresh concurrente no quedó serializado")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
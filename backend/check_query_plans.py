@@ -0,0 +1,352 @@
+import sys
+import os
+import json
+import argparse
+
+# Ajuste de ruta para que encuentre la carpeta 'app'
+sys.path.append(os.getcwd())
+
+from sqlalchemy import event, text
+from app.db.session import SessionLocal, engine
+from app.db.base import Base
+from app.db.migrations import run_migrations
+from app.db.bulk_loader import generate_fixtures, load_fixtures, DEFAULT_CENTER
+from app.models.tables import Bodega, StoreInventory, User
+from app.repositories.inventory_repo import InventoryRepository
+from app.repositories.bodeguero_repo import BodegueroRepository
+from app.repositories.price_index_repo import PriceIndexRepository
+from app.repositories.catalog_repo import CatalogRepository
+from app.services.term_planner import term_planner
+from app.core.geo import tile_of
+from app.api.deps import _lookup_owner, invalidate_owner
+
+# Guardia de planes de consulta: corre cada consulta de los repositorios, captura los
+# statements que emite SQLAlchemy y los pasa por EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON).
+#   - Falla si un índice esperado no aparece, si hay Seq Scan en una tabla prohibida o si la
+#     estimación de filas se aleja demasiado de lo real.
+#   - Compara buffers y tiempo contra la línea base guardada en query_plans/ (un JSON por
+#     caso, pensado para versionarlo y ver el diff entre commits).
+#   - Las particiones (store_inventory_<región>) y sus índices se leen como la tabla e índice
+#     padre; aparte se cuenta cuántas particiones toca cada statement.
+# Ejemplos:
+#   python check_query_plans.py --load            (recrea la BD con datos sintéticos; BORRA todo)
+#   python check_query_plans.py                   (compara contra query_plans/)
+#   python check_query_plans.py --update          (guarda una nueva línea base)
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "query_plans")
+
+# Dataset de referencia: las líneas base solo se comparan contra este mismo tamaño y semilla
+DATASET = {"n_bodegas": 1000, "n_products": 2000, "per_bodega": 100, "spread_km": 3.0, "seed": 42}
+
+USER_LAT, USER_LON = DEFAULT_CENTER
+CATALOG_DEG = 0.015
+USER_TILE = tile_of(USER_LAT, USER_LON, CATALOG_DEG)
+
+
+def load_dataset():
+    print(f"💥 Recreando tablas y cargando dataset sintético {DATASET}...")
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        load_fixtures(db, generate_fixtures(**DATASET))
+    finally:
+        db.close()
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE"))
+
+
+def pick_fixtures(db):
+    """IDs estables del dataset para parametrizar los casos."""
+    bodega_id, owner_id = db.query(Bodega.id, Bodega.owner_id).order_by(Bodega.id).first()
+    product_id = db.query(StoreInventory.product_id)\
+        .filter(StoreInventory.bodega_id == bodega_id)\
+        .order_by(StoreInventory.product_id).first()[0]
+    return {"bodega_id": bodega_id, "owner_id": str(owner_id), "product_id": product_id}
+
+
+# Cada caso: función que ejecuta la consulta real + expectativas sobre su plan.
+#   indexes:        índices que deben aparecer en algún statement del caso
+#   no_seq_scan:    tablas que nunca deben leerse completas
+#   max_misestimate: factor máximo entre filas estimadas y reales en la raíz del plan
+#   max_partitions: particiones que puede leer cada statement (las búsquedas, solo su región)
+CASES = [
+    {
+        "name": "search_smart_keyword",
+        "run": lambda db, f: InventoryRepository.search_products_smart(db, ["gaseosa"], USER_LAT, USER_LON),
+        "indexes": [],
+        "no_seq_scan": [],
+        "max_misestimate": 20,
+        "max_partitions": 1,
+    },
+    {
+        "name": "search_smart_attributes",
+        "run": lambda db, f: InventoryRepository.search_products_smart(
+            db, ["agua"], USER_LAT, USER_LON,
+            attribute_filters=[{"contains": [{"gas": True}, {"marca": "Cielo"}], "not_contains": []}]
+        ),
+        "indexes": ["ix_master_products_attributes", "ix_store_inventory_product_id"],
+        "no_seq_scan": ["store_inventory"],
+        "max_misestimate": 20,
+        "max_partitions": 1,
+    },
+    {
+        "name": "search_smart_planned",
+        # Con el planificador de términos: solo los productos candidatos, por índice
+        "run": lambda db, f: InventoryRepository.search_products_smart(
+            db, ["gaseosa coca cola"], USER_LAT, USER_LON, term_plans=[term_planner.plan("gaseosa coca cola")]
+        ),
+        "indexes": ["ix_store_inventory_product_id"],
+        "no_seq_scan": ["store_inventory"],
+        "max_misestimate": 20,
+        "max_partitions": 1,
+    },
+    {
+        "name": "bodeguero_inventory",
+        "run": lambda db, f: BodegueroRepository.get_inventory_for_bodega(db, f["bodega_id"]),
+        "indexes": ["store_inventory_pkey"],
+        "no_seq_scan": ["store_inventory"],
+        "max_misestimate": 10,
+    },
+    {
+        "name": "bodeguero_set_stock",
+        "run": lambda db, f: BodegueroRepository.set_stock(db, f["bodega_id"], f["product_id"], 50),
+        "indexes": ["store_inventory_pkey", "price_index_pkey"],
+        "no_seq_scan": ["store_inventory", "price_index"],
+        "max_misestimate": 10,
+    },
+    {
+        "name": "owner_lookup",
+        # Sin cache, para medir la consulta real de las apps que mandan ?user_id=
+        "run": lambda db, f: (invalidate_owner(f["owner_id"]), _lookup_owner(db, f["owner_id"])),
+        "indexes": ["users_pkey"],
+        "no_seq_scan": ["users"],
+        "max_misestimate": 10,
+    },
+    {
+        "name": "cheapest_near",
+        "run": lambda db, f: PriceIndexRepository.cheapest_near(db, f["product_id"], USER_LAT, USER_LON),
+        "indexes": ["price_index_pkey"],
+        "no_seq_scan": ["price_index"],
+        "max_misestimate": 20,
+    },
+    {
+        "name": "search_batch",
+        # Lista de compras desde dos puntos del barrio: una consulta de productos y una de inventario
+        "run": lambda db, f: InventoryRepository.search_products_batch(
+            db, [("gaseosa", None), ("arroz", None), ("agua", {"contains": [{"gas": False}], "not_contains": []})],
+            [(USER_LAT, USER_LON), (USER_LAT + 0.004, USER_LON - 0.004)]
+        ),
+        # Las cajas de 1.5 km cubren casi todo el barrio sintético (3 km): recorrer bodegas es
+        # razonable; el inventario sí tiene que entrar por producto
+        "indexes": ["ix_store_inventory_product_id"],
+        "no_seq_scan": ["store_inventory"],
+        "max_misestimate": 20,
+        "max_partitions": 1,
+    },
+    {
+        "name": "catalog_tile_snapshot",
+        "run": lambda db, f: (
+            CatalogRepository.tile_version(db, USER_TILE, CATALOG_DEG),
+            CatalogRepository.tile_rows(db, USER_TILE, CATALOG_DEG),
+        ),
+        # La celda del centro tiene ~9% del inventario sintético: ahí un Seq Scan de
+        # store_inventory es razonable, lo que no puede pasar es recorrer todas las bodegas
+        "indexes": ["ix_bodegas_lat_lon"],
+        "no_seq_scan": ["bodegas"],
+        "max_misestimate": 20,
+        "max_partitions": 1,
+    },
+]
+
+
+def capture_statements(fn):
+    """Ejecuta fn y devuelve los (statement, parámetros) que mandó a PostgreSQL."""
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "INSERT", "DELETE", "WITH")):
+            return
+        captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return captured
+
+
+def explain_all(statements):
+    """
+    EXPLAIN ANALYZE de los statements en orden, en una sola transacción que se deshace
+    al final (los UPDATE/DELETE no quedan y cada uno ve lo que hizo el anterior).
+    """
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        plans = []
+        for statement, parameters in statements:
+            cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters)
+            plans.append(cursor.fetchone()[0][0])
+        raw.rollback()
+        return plans
+    finally:
+        raw.close()
+
+
+def partition_parents() -> dict:
+    """{partición o índice de partición: tabla o índice padre}."""
+    with engine.connect() as conn:
+        return dict(conn.execute(text(
+            "SELECT c.relname, p.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent"
+        )).all())
+
+
+def summarize(statement, plan, parents):
+    nodes, indexes, seq_scans, partitions = [], set(), set(), set()
+
+    def walk(node, depth):
+        label = node["Node Type"]
+        if node.get("Actual Loops") == 0:
+            # Podado al ejecutar (p. ej. particiones de otra región): no lee nada
+            nodes.append("  " * depth + label + " (never executed)")
+            return
+        if "Index Name" in node:
+            index = parents.get(node["Index Name"], node["Index Name"])
+            indexes.add(index)
+            label += f" using {index}"
+        if "Relation Name" in node:
+            relation = node["Relation Name"]
+            if relation in parents:
+                partitions.add(relation)
+                relation = parents[relation]
+            label += f" on {relation}"
+            if node["Node Type"] == "Seq Scan":
+                seq_scans.add(relation)
+        nodes.append("  " * depth + label)
+        for child in node.get("Plans", []):
+            walk(child, depth + 1)
+
+    root = plan["Plan"]
+    walk(root, 0)
+    plan_rows = root.get("Plan Rows", 0)
+    actual_rows = root.get("Actual Rows", 0) * root.get("Actual Loops", 1)
+    misestimate = max(plan_rows, 1) / max(actual_rows, 1)
+    return {
+        "sql": " ".join(statement.split())[:200],
+        "nodes": nodes,
+        "indexes": sorted(indexes),
+        "seq_scans": sorted(seq_scans),
+        "partitions": sorted(partitions),
+        "buffers": root.get("Shared Hit Blocks", 0) + root.get("Shared Read Blocks", 0),
+        "execution_ms": round(plan.get("Execution Time", 0.0), 3),
+        "plan_rows": plan_rows,
+        "actual_rows": actual_rows,
+        "misestimate": round(max(misestimate, 1 / misestimate), 2),
+    }
+
+
+def check_case(case, fixtures, baseline, args):
+    # Los casos que escriben hacen commit adentro (set_stock): la sesión va sobre una
+    # transacción externa y sus commit solo cierran savepoints, así el rollback deshace todo.
+    # Se deshace antes del EXPLAIN, que usa otra conexión (y los mismos locks).
+    with engine.connect() as conn:
+        outer = conn.begin()
+        db = SessionLocal(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            # Una pasada para calentar caches y otra capturando
+            case["run"](db, fixtures)
+            statements = capture_statements(lambda: case["run"](db, fixtures))
+        finally:
+            db.close()
+            outer.rollback()
+
+    parents = partition_parents()
+    summaries = [summarize(stmt, plan, parents) for (stmt, _), plan in zip(statements, explain_all(statements))]
+    failures = []
+
+    used = {idx for s in summaries for idx in s["indexes"]}
+    for idx in case["indexes"]:
+        if idx not in used:
+            failures.append(f"no usa el índice {idx}")
+    for s in summaries:
+        for table in s["seq_scans"]:
+            if table in case["no_seq_scan"]:
+                failures.append(f"Seq Scan en {table}: {s['sql'][:80]}")
+        if "max_partitions" in case and len(s["partitions"]) > case["max_partitions"]:
+            failures.append(f"lee {len(s['partitions'])} particiones {s['partitions']}: {s['sql'][:80]}")
+        if s["misestimate"] > case["max_misestimate"]:
+            failures.append(f"estimación de filas x{s['misestimate']} (plan {s['plan_rows']} vs real {s['actual_rows']})")
+
+    if baseline and not args.update:
+        if len(baseline["statements"]) != len(summaries):
+            failures.append(f"cambió la cantidad de statements: {len(baseline['statements'])} -> {len(summaries)}")
+        for before, after in zip(baseline["statements"], summaries):
+            if after["buffers"] > before["buffers"] * args.buffer_tolerance + 10:
+                failures.append(f"buffers {before['buffers']} -> {after['buffers']}: {after['sql'][:80]}")
+            if after["execution_ms"] > before["execution_ms"] * args.time_tolerance + args.time_slack_ms:
+                failures.append(f"tiempo {before['execution_ms']} ms -> {after['execution_ms']} ms: {after['sql'][:80]}")
+
+    total_ms = sum(s["execution_ms"] for s in summaries)
+    total_buffers = sum(s["buffers"] for s in summaries)
+    status = "❌" if failures else "✅"
+    print(f"{status} {case['name']:<26} {len(summaries)} stmt  {total_buffers:>7} buffers  {total_ms:9.3f} ms")
+    for failure in failures:
+        print(f"      - {failure}")
+    return summaries, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Guardia de planes de consulta de los repositorios")
+    parser.add_argument("--load", action="store_true", help="Recrea la BD con el dataset sintético (borra todo)")
+    parser.add_argument("--update", action="store_true", help="Guarda los resultados como nueva línea base")
+    parser.add_argument("--only", help="Correr solo este caso")
+    parser.add_argument("--baseline-dir", default=BASELINE_DIR)
+    parser.add_argument("--buffer-tolerance", type=float, default=1.5, help="Factor máximo de buffers vs la línea base")
+    parser.add_argument("--time-tolerance", type=float, default=3.0, help="Factor máximo de tiempo vs la línea base")
+    parser.add_argument("--time-slack-ms", type=float, default=5.0, help="Margen fijo de tiempo (ruido de la máquina)")
+    args = parser.parse_args()
+
+    if args.load:
+        load_dataset()
+
+    db = SessionLocal()
+    try:
+        if db.query(User.id).first() is None:
+            print("❌ La BD está vacía: corre con --load primero")
+            sys.exit(1)
+        fixtures = pick_fixtures(db)
+    finally:
+        db.close()
+    # search_smart_planned necesita el índice armado (en la app lo arma el lifespan en un hilo)
+    term_planner.rebuild()
+
+    os.makedirs(args.baseline_dir, exist_ok=True)
+    any_failure = False
+    for case in CASES:
+        if args.only and case["name"] != args.only:
+            continue
+        path = os.path.join(args.baseline_dir, f"{case['name']}.json")
+        baseline = None
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                baseline = json.load(f)
+
+        summaries, failures = check_case(case, fixtures, baseline, args)
+        any_failure = any_failure or bool(failures)
+        if args.update or baseline is None:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"case": case["name"], "dataset": DATASET, "statements": summaries}, f, indent=2, ensure_ascii=False)
+                f.write("\n")
+
+    if any_failure:
+        print("\n❌ Hay regresiones en los planes de consulta")
+        sys.exit(1)
+    print("\n✅ Planes de consulta OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import sys
+import os
+import tempfile
+import multiprocessing
+
+# Ajuste de ruta para que encuentre la carpeta 'app'
+sys.path.append(os.getcwd())
+
+from app.services.quota_ledger import QuotaLedger
+
+# Prueba multi-proceso del libro de cuotas de Gemini (simula varios workers de uvicorn):
+#   1. N procesos piden cupo a la vez: nunca se entregan más requests que el presupuesto.
+#   2. Un proceso marca un modelo como agotado (429): los demás dejan de usarlo.
+
+MODELS = ["modelo-rapido", "modelo-respaldo"]
+BUDGETS = {"modelo-rapido": 20, "modelo-respaldo": 10}
+WORKERS = 8
+REQUESTS_PER_WORKER = 10
+
+
+def make_ledger(path):
+    return QuotaLedger(path, MODELS, BUDGETS, default_budget=0, cooldown_seconds=60)
+
+
+def worker(path, queue):
+    ledger = make_ledger(path)
+    granted = [ledger.acquire() for _ in range(REQUESTS_PER_WORKER)]
+    queue.put(granted)
+
+
+def mark_worker(path):
+    make_ledger(path).mark_exhausted("modelo-rapido")
+
+
+def check_budget(path):
+    queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=worker, args=(path, queue)) for _ in range(WORKERS)]
+    for p in procs:
+        p.start()
+    grants = [g for _ in procs for g in queue.get()]
+    for p in procs:
+        p.join()
+
+    counts = {m: grants.count(m) for m in MODELS}
+    denied = grants.count(None)
+    print(f"   - Entregados: {counts} | Rechazados: {denied} (de {WORKERS * REQUESTS_PER_WORKER})")
+    return counts == BUDGETS and denied == WORKERS * REQUESTS_PER_WORKER - sum(BUDGETS.values())
+
+
+def check_exhaustion(path):
+    p = multiprocessing.Process(target=mark_worker, args=(path,))
+    p.start()
+    p.join()
+    model = make_ledger(path).acquire()
+    print(f"   - Después del 429 en otro proceso, este proceso eligió: {model}")
+    return model == "modelo-respaldo"
+
+
+if __name__ == "__main__":
+    print("📒 --- PRUEBA DEL LIBRO DE CUOTAS (multi-proceso) ---")
+    with tempfile.TemporaryDirectory() as tmp:
+        ok_budget = check_budget(os.path.join(tmp, "budget.sqlite3"))
+        print("✅ Presupuesto respetado entre procesos" if ok_budget else "❌ Se entregó más cupo del permitido")
+        ok_exhausted = check_exhaustion(os.path.join(tmp, "exhausted.sqlite3"))
+        print("✅ Agotamiento compartido entre procesos" if ok_exhausted else "❌ El agotamiento no se compartió")
+    sys.exit(0 if (ok_budget and ok_exhausted) else 1)
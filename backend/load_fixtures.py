@@ -0,0 +1,66 @@
+import sys
+import os
+import time
+import argparse
+
+# Ajuste de ruta para que encuentre la carpeta 'app'
+sys.path.append(os.getcwd())
+
+from app.db.session import SessionLocal, engine
+from app.db.base import Base
+from app.db.bulk_loader import generate_fixtures, read_fixture_file, load_fixtures
+
+# Ejemplos:
+#   python load_fixtures.py --file fixtures/barrio.json --reset
+#   python load_fixtures.py --generate --bodegas 1000 --products 2000 --per-bodega 100 --reset
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga masiva de fixtures con COPY")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--file", help="Archivo JSON de fixtures")
+    source.add_argument("--generate", action="store_true", help="Generar un barrio sintético")
+    parser.add_argument("--bodegas", type=int, default=100)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--per-bodega", type=int, default=50, help="Productos en inventario por bodega")
+    parser.add_argument("--spread-km", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--method", choices=["copy", "insert"], default="copy")
+    parser.add_argument("--reset", action="store_true", help="Borra y recrea las tablas antes de cargar")
+    args = parser.parse_args()
+
+    if args.reset:
+        print("💥 Recreando tablas...")
+        Base.metadata.drop_all(bind=engine)
+        Base.metadata.create_all(bind=engine)
+
+    start = time.perf_counter()
+    if args.file:
+        fixtures = read_fixture_file(args.file)
+    else:
+        fixtures = generate_fixtures(
+            n_bodegas=args.bodegas, n_products=args.products, per_bodega=args.per_bodega,
+            spread_km=args.spread_km, seed=args.seed
+        )
+    print(f"🧪 Fixtures listos en {time.perf_counter() - start:.2f}s")
+
+    db = SessionLocal()
+    try:
+        report = load_fixtures(db, fixtures, method=args.method)
+    except Exception as e:
+        print(f"❌ Error cargando fixtures: {e}")
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+
+    total_rows = 0
+    total_secs = 0.0
+    for table, rows, secs in report:
+        total_rows += rows
+        total_secs += secs
+        print(f"   - {table:<18} {rows:>9} filas  {secs:7.3f}s  {rows / max(secs, 1e-9):>12,.0f} filas/s")
+    print(f"✅ Total: {total_rows} filas en {total_secs:.2f}s ({total_rows / max(total_secs, 1e-9):,.0f} filas/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import sys
+import os
+import time
+import argparse
+
+# Ajuste de ruta para que encuentre la carpeta 'app'
+sys.path.append(os.getcwd())
+
+from sqlalchemy import text
+from app.db.session import engine
+from app.db.base import Base
+from app.db.migrations import run_migrations
+from app.db.partitions import is_partitioned, partition_counts, region_case_sql
+from app.models.tables import StoreInventory
+
+# Pasa store_inventory a particiones por región (una vez, en bases anteriores a las regiones)
+# y muestra cómo quedó el reparto. Al iniciar, la app ya agrega la columna region, crea las
+# particiones nuevas y re-etiqueta bodegas si cambia settings.REGIONS; lo que no hace sola es
+# reescribir una tabla sin particionar, porque bloquea el inventario mientras copia.
+#   1. Renombra la tabla vieja (y su PK e índice) a store_inventory_legacy
+#   2. Crea la tabla particionada con sus particiones (mismo DDL que create_all)
+#   3. Copia todas las filas con un INSERT ... SELECT y borra la vieja (salvo --keep-legacy)
+# Todo en una transacción: si algo falla, queda como estaba.
+# Ejemplos:
+#   python migrate_regions.py --dry-run
+#   python migrate_regions.py
+
+INVENTORY_COLUMNS = ["bodega_id", "product_id", "region", "price", "stock_quantity", "is_available", "version"]
+
+
+def report_regions(conn):
+    print("🗺️ Bodegas por región (según settings.REGIONS):")
+    for region, total in conn.execute(text(f"SELECT {region_case_sql()} AS r, count(*) FROM bodegas GROUP BY r ORDER BY r")):
+        print(f"   - {region:<16} {total:>8}")
+
+
+def convert(conn, keep_legacy: bool) -> int:
+    conn.execute(text("LOCK TABLE store_inventory IN ACCESS EXCLUSIVE MODE"))
+    conn.execute(text("ALTER TABLE store_inventory RENAME TO store_inventory_legacy"))
+    # Los nombres de índices son únicos en el esquema: la tabla nueva usa los mismos
+    conn.execute(text("ALTER TABLE store_inventory_legacy RENAME CONSTRAINT store_inventory_pkey TO store_inventory_legacy_pkey"))
+    conn.execute(text("ALTER INDEX IF EXISTS ix_store_inventory_product_id RENAME TO ix_store_inventory_legacy_product_id"))
+
+    StoreInventory.__table__.create(conn)
+    columns = ", ".join(INVENTORY_COLUMNS)
+    copied = conn.execute(text(f"INSERT INTO store_inventory ({columns}) SELECT {columns} FROM store_inventory_legacy")).rowcount
+    if not keep_legacy:
+        conn.execute(text("DROP TABLE store_inventory_legacy"))
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Particiona store_inventory por región")
+    parser.add_argument("--dry-run", action="store_true", help="Solo mostrar el estado, sin cambiar nada")
+    parser.add_argument("--keep-legacy", action="store_true", help="No borrar store_inventory_legacy")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        report_regions(conn)
+        partitioned = is_partitioned(conn)
+    print(f"📦 store_inventory {'ya está' if partitioned else 'NO está'} particionada")
+    if args.dry_run:
+        return
+
+    # Columnas region, particiones que falten y re-etiquetado (lo mismo que al iniciar la app)
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    if not partitioned:
+        start = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                copied = convert(conn, args.keep_legacy)
+        except Exception as e:
+            print(f"❌ Error particionando store_inventory (no se cambió nada): {e}")
+            sys.exit(1)
+        print(f"✅ {copied} filas copiadas a la tabla particionada en {time.perf_counter() - start:.2f}s")
+
+    with engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE store_inventory"))
+        for name, rows in partition_counts(conn):
+            print(f"   - {name:<32} {rows:>9} filas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import sys
+import os
+import time
+
+# Ajuste de ruta para que encuentre la carpeta 'app'
+sys.path.append(os.getcwd())
+
+from app.db.session import SessionLocal, engine
+from app.db.base import Base
+from app.db.migrations import run_migrations
+from app.repositories.price_index_repo import PriceIndexRepository
+
+# Reconstruye el índice "lo más barato cerca" desde cero. Hace falta una sola vez en
+# bases que ya tenían inventario antes de que existiera la tabla price_index; después
+# el índice se mantiene solo con cada cambio de stock o producto nuevo.
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        rows = PriceIndexRepository.rebuild(db)
+        db.commit()
+        print(f"✅ Índice de precios: {rows} ofertas en {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        print(f"❌ Error reconstruyendo el índice: {e}")
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -76,12 +76,12 @@ def seed_db():
 
     # 4. LLENAR STOCK (Inventario)
     # Don Lucho tiene todo
-    inv1 = StoreInventory(bodega_id=bodega_lucho.id, product_id=pilsen.id, price=8.50, stock_quantity=24)
-    inv2 = StoreInventory(bodega_id=bodega_lucho.id, product_id=coca.id, price=7.00, stock_quantity=10)
+    inv1 = StoreInventory(bodega_id=bodega_lucho.id, region=bodega_lucho.region, product_id=pilsen.id, price=8.50, stock_quantity=24)
+    inv2 = StoreInventory(bodega_id=bodega_lucho.id, region=bodega_lucho.region, product_id=coca.id, price=7.00, stock_quantity=10)
     
     # Tío Pepe tiene chela más barata pero no tiene arroz
-    inv3 = StoreInventory(bodega_id=bodega_pepe.id, product_id=pilsen.id, price=8.00, stock_quantity=50)
-    inv4 = StoreInventory(bodega_id=bodega_pepe.id, product_id=arroz.id, price=4.50, stock_quantity=20)
+    inv3 = StoreInventory(bodega_id=bodega_pepe.id, region=bodega_pepe.region, product_id=pilsen.id, price=8.00, stock_quantity=50)
+    inv4 = StoreInventory(bodega_id=bodega_pepe.id, region=bodega_pepe.region, product_id=arroz.id, price=4.50, stock_quantity=20)
 
     db.add_all([inv1, inv2, inv3, inv4])
     db.commit()